@@ -82,6 +82,7 @@ arguments = {
     "ignore-ghost": {"args": "ig", "type": "bool", "help": "Run ignoring ghost logging"},
     "delete-collections": {"args": ["dc", "delete", "delete-collection"], "type": "bool", "help": "Deletes all Collections in the Plex Library before running"},
     "delete-labels": {"args": ["dl", "delete-label"], "type": "bool", "help": "Deletes all Labels in the Plex Library before running"},
+    "clean-overlay-backups": {"args": ["cob", "clean-overlay-backup"], "type": "bool", "help": "Deletes Original Poster Backups no longer referenced by any item before running"},
     "resume": {"args": "re", "type": "str", "help": "Resume collection run from a specific collection"},
     "no-countdown": {"args": "nc", "type": "bool", "help": "Run without displaying the countdown"},
     "no-missing": {"args": "nm", "type": "bool", "help": "Run without running the missing section"},
@@ -722,6 +723,15 @@ def run_libraries(config):
                             logger.error(f"{item.title[:25]:<25} | Labels Failed to be Removed")
                 library_status[library.name]["All Labels Deleted"] = str(datetime.now() - time_start).split('.')[0]
 
+            if run_args["clean-overlay-backups"]:
+                time_start = datetime.now()
+                logger.info("")
+                logger.separator(f"Cleaning Original Poster Backups for the {library.name} Library", space=False, border=False)
+                logger.info("")
+                removed, freed = library.overlay_backups.clean()
+                logger.info(f"{removed} Unused Backups Removed ({freed / 1048576:.1f} MB Freed)")
+                library_status[library.name]["Overlay Backups Cleaned"] = str(datetime.now() - time_start).split('.')[0]
+
             time_start = datetime.now()
             temp_items = None
             list_key = None
@@ -737,6 +747,7 @@ def run_libraries(config):
                 logger.separator(f"Mapping {library.original_mapping_name} Library", space=False, border=False)
                 logger.info("")
                 library.map_guids(temp_items)
+            library.load_incremental()
             library_status[library.name]["Library Loading and Mapping"] = str(datetime.now() - time_start).split('.')[0]
 
             runs = {
@@ -805,8 +816,11 @@ def run_libraries(config):
                     library_status[library.name]["Library Operations"] = library.Operations.run_operations()
                 elif run_type == "overlays" and runs[run_type] and (library.overlay_files or (library.remove_overlays and not config.requested_files)):
                     library_status[library.name]["Library Overlay Files"] = library.Overlays.run_overlays()
+            if not config.requested_files and not config.requested_collections and not run_args["resume"] and library.incremental_complete():
+                library.save_incremental()
             #logger.remove_library_handler(library.mapping_name)
         except Exception as e:
+            library.overlay_backups.flush()
             library.notify(e)
             logger.stacktrace()
             logger.critical(e)
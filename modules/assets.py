@@ -0,0 +1,79 @@
+import os
+from modules import util
+
+logger = util.logger
+
+class AssetIndex:
+    def __init__(self):
+        self._folders = {}
+        self._files = {}
+
+    def _mtime(self, path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _scan(self, path):
+        try:
+            with os.scandir(path) as it:
+                return [(e.name, e.path, e.is_dir()) for e in it if not e.name.startswith(".")]
+        except OSError:
+            return []
+
+    def _folder_index(self, asset_directory, depth):
+        key = (asset_directory, depth)
+        mtime = self._mtime(asset_directory)
+        if key in self._folders and self._folders[key][0] == mtime:
+            return self._folders[key][1]
+        index = {}
+        level = [asset_directory]
+        for n in range(depth + 1):
+            next_level = []
+            for parent in level:
+                for name, path, is_dir in self._scan(parent):
+                    if is_dir:
+                        if n > 0:
+                            index.setdefault(os.path.normcase(name), path)
+                        if n < depth:
+                            next_level.append(path)
+            level = next_level
+        logger.trace(f"Asset Index: {len(index)} folders found in {asset_directory}")
+        self._folders[key] = (mtime, index)
+        return index
+
+    def _file_index(self, directory):
+        mtime = self._mtime(directory)
+        if directory in self._files and self._files[directory][0] == mtime:
+            return self._files[directory][1]
+        files = []
+        stems = {}
+        for name, path, is_dir in self._scan(directory):
+            if is_dir or "." not in name:
+                continue
+            files.append(path)
+            for i, c in enumerate(name):
+                if c == "." and i > 0:
+                    stems.setdefault(os.path.normcase(name[:i]), []).append(path)
+        self._files[directory] = (mtime, (files, stems))
+        return files, stems
+
+    def find_folder(self, asset_directory, folder_name, depth):
+        if os.path.isdir(os.path.join(asset_directory, folder_name)):
+            return os.path.join(asset_directory, folder_name)
+        if depth > 0:
+            match = self._folder_index(asset_directory, depth).get(os.path.normcase(folder_name))
+            if match:
+                return os.path.abspath(match)
+
+    def find_file(self, directory, file_name):
+        _, stems = self._file_index(directory)
+        matches = stems.get(os.path.normcase(file_name))
+        return matches[0] if matches else None
+
+    def files(self, directory):
+        files, _ = self._file_index(directory)
+        return list(files)
+
+    def invalidate(self, directory):
+        self._files.pop(directory, None)
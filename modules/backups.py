@@ -0,0 +1,141 @@
+import hashlib, json, os, threading
+from modules import util
+from PIL import Image
+
+logger = util.logger
+
+legacy_extensions = ["png", "jpg", "webp"]
+flush_every = 100
+
+class BackupStore:
+    def __init__(self, library):
+        self.library = library
+        self.cache = library.config.Cache
+        self.directory = library.overlay_backup
+        self.blobs = os.path.join(self.directory, "blobs")
+        self.table_name = f"{library.image_table_name}_overlay_backups" if self.cache else None
+        self.index_path = os.path.join(self.directory, "index.json")
+        self._lock = threading.RLock()
+        self._index = None
+        self._pending = 0
+
+    def load(self):
+        with self._lock:
+            if self._index is None:
+                if self.cache:
+                    self._index = self.cache.query_overlay_backups(self.table_name)
+                elif os.path.exists(self.index_path):
+                    with open(self.index_path, "r", encoding="utf-8") as f:
+                        self._index = json.load(f)
+                else:
+                    self._index = {}
+                self._migrate()
+            return self._index
+
+    def _migrate(self):
+        legacy = []
+        if os.path.isdir(self.directory):
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    stem, _, ext = entry.name.rpartition(".")
+                    if entry.is_file() and stem.isdigit() and ext in legacy_extensions:
+                        legacy.append((stem, entry.path))
+        if legacy:
+            logger.info(f"Migrating {len(legacy)} Overlay Backups to the Backup Store")
+            migrated = {}
+            for rating_key, path in legacy:
+                try:
+                    migrated[rating_key] = self._store(rating_key, path)
+                except OSError as e:
+                    logger.error(f"Overlay Backup Error: {path} failed to migrate: {e}")
+            self._update(migrated)
+            self.flush()
+
+    def _update(self, changes):
+        for rating_key, blob in changes.items():
+            if blob is None:
+                self._index.pop(rating_key, None)
+            else:
+                self._index[rating_key] = blob
+        if self.cache:
+            self.cache.update_overlay_backups(self.table_name, changes)
+        else:
+            self._pending += len(changes)
+            if self._pending >= flush_every:
+                self.flush()
+
+    def flush(self):
+        with self._lock:
+            if self.cache or not self._pending:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            temp_path = f"{self.index_path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(self._index, f)
+            os.replace(temp_path, self.index_path)
+            self._pending = 0
+
+    def _store(self, rating_key, path):
+        with open(path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        filetype = self.library.overlay_backup_filetype
+        ext = "webp" if filetype.startswith("webp") else path.rpartition(".")[2]
+        blob = f"{digest[:2]}/{digest}.{ext}"
+        blob_path = os.path.join(self.blobs, blob)
+        if os.path.exists(blob_path):
+            os.remove(path)
+            return blob
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        temp_path = f"{blob_path}.{rating_key}.tmp"
+        if filetype == "original":
+            os.replace(path, temp_path)
+        else:
+            with Image.open(path) as image:
+                if filetype == "webp_lossless":
+                    image.save(temp_path, format="WEBP", lossless=True)
+                else:
+                    image.save(temp_path, format="WEBP", quality=self.library.overlay_artwork_quality or 90)
+            os.remove(path)
+        os.replace(temp_path, blob_path)
+        return blob
+
+    def get(self, rating_key):
+        with self._lock:
+            blob = self.load().get(str(rating_key))
+        if blob:
+            path = os.path.join(self.blobs, blob)
+            if os.path.exists(path):
+                return path
+            self.remove(rating_key)
+
+    def add(self, rating_key, path):
+        blob = self._store(rating_key, path)
+        with self._lock:
+            self.load()
+            self._update({str(rating_key): blob})
+        return os.path.join(self.blobs, blob)
+
+    def remove(self, rating_key):
+        with self._lock:
+            if str(rating_key) in self.load():
+                self._update({str(rating_key): None})
+
+    def clean(self):
+        with self._lock:
+            referenced = {os.path.normcase(os.path.join(self.blobs, b)) for b in self.load().values()}
+        removed = 0
+        freed = 0
+        if os.path.isdir(self.blobs):
+            for folder in os.listdir(self.blobs):
+                folder_path = os.path.join(self.blobs, folder)
+                if not os.path.isdir(folder_path):
+                    continue
+                for name in os.listdir(folder_path):
+                    blob_path = os.path.join(folder_path, name)
+                    if os.path.normcase(blob_path) not in referenced:
+                        freed += os.path.getsize(blob_path)
+                        os.remove(blob_path)
+                        removed += 1
+                if not os.listdir(folder_path):
+                    os.rmdir(folder_path)
+        return removed, freed
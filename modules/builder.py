@@ -1,5 +1,6 @@
 import os, re, time
 from arrapi import ArrException
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 from modules import anidb, anilist, icheckmovies, imdb, letterboxd, mal, mojo, plex, radarr, reciperr, sonarr, tautulli, tmdb, trakt, tvdb, mdblist, util
@@ -8,7 +9,7 @@ from modules.overlay import Overlay
 from modules.poster import KometaImage
 from modules.request import quote
 from plexapi.audio import Artist, Album, Track
-from plexapi.exceptions import NotFound
+from plexapi.exceptions import BadRequest, NotFound
 from plexapi.video import Movie, Show, Season, Episode
 from tmdbapis.tmdb import discover_movie_sort_options, discover_tv_sort_options
 
@@ -597,9 +598,12 @@ class CollectionBuilder:
         self.added_to_sonarr = []
         self.builders = []
         self.filters = []
+        self.compiled_filters = None
+        self.filter_reload = True
         self.has_tmdb_filters = False
         self.has_imdb_filters = False
         self.found_items = []
+        self.found_keys = set()
         self.filtered_items = []
         self.filtered_keys = {}
         self.run_again_movies = []
@@ -2286,6 +2290,40 @@ class CollectionBuilder:
             self.config.Cache.update_list_ids(list_key, ids)
         return ids
 
+    def fetch_items(self, entries):
+        items = []
+        chunk_size = min(self.library.page_size, plex.FULL_ITEM_CACHE_SIZE)
+        for i in range(0, len(entries), chunk_size):
+            chunk = entries[i:i + chunk_size]
+            self.library.reload_many([rk for rk in chunk if isinstance(rk, int)], chunk_size=chunk_size)
+            for entry in chunk:
+                if not isinstance(entry, int):
+                    items.append(entry)
+                    continue
+                try:
+                    item = self.library.fetch_item(entry)
+                    if self.playlist and isinstance(item, (Show, Season)):
+                        items.extend(item.episodes())
+                    elif self.builder_level == "movie" and not isinstance(item, Movie):
+                        logger.info(f"Item: {item} is not an Movie")
+                    elif self.builder_level == "show" and not isinstance(item, Show):
+                        logger.info(f"Item: {item} is not an Show")
+                    elif self.builder_level == "episode" and not isinstance(item, Episode):
+                        logger.info(f"Item: {item} is not an Episode")
+                    elif self.builder_level == "season" and not isinstance(item, Season):
+                        logger.info(f"Item: {item} is not a Season")
+                    elif self.builder_level == "artist" and not isinstance(item, Artist):
+                        logger.info(f"Item: {item} is not an Artist")
+                    elif self.builder_level == "album" and not isinstance(item, Album):
+                        logger.info(f"Item: {item} is not an Album")
+                    elif self.builder_level == "track" and not isinstance(item, Track):
+                        logger.info(f"Item: {item} is not a Track")
+                    else:
+                        items.append(item)
+                except Failed as e:
+                    logger.error(e)
+        return items
+
     def filter_and_save_items(self, ids):
         items = []
         if len(ids) > 0:
@@ -2305,9 +2343,10 @@ class CollectionBuilder:
                         if input_id not in self.ignore_imdb_ids:
                             found = False
                             for pl_library in self.libraries:
-                                if input_id in pl_library.imdb_map:
+                                found_keys = pl_library.rating_keys_from_id("imdb", input_id)
+                                if found_keys:
                                     found = True
-                                    rating_keys = pl_library.imdb_map[input_id]
+                                    rating_keys = found_keys
                                     break
                             if not found:
                                 try:
@@ -2333,9 +2372,10 @@ class CollectionBuilder:
                                                 logger.error(f"{e}{ee}")
                                                 continue
                                         for pl_library in self.libraries:
-                                            if tvdb_id in pl_library.show_map:
+                                            show_keys = pl_library.rating_keys_from_id("tvdb", tvdb_id)
+                                            if show_keys:
                                                 found = True
-                                                show_item = pl_library.fetch_item(pl_library.show_map[tvdb_id][0])
+                                                show_item = pl_library.fetch_item(show_keys[0])
                                                 try:
                                                     items.append(show_item.episode(season=int(season_num), episode=int(episode_num)))
                                                 except NotFound:
@@ -2354,8 +2394,8 @@ class CollectionBuilder:
                                         if tvdb_id not in self.ignore_ids:
                                             found_keys = None
                                             for pl_library in self.libraries:
-                                                if tvdb_id in pl_library.show_map:
-                                                    found_keys = pl_library.show_map[tvdb_id]
+                                                found_keys = pl_library.rating_keys_from_id("tvdb", tvdb_id)
+                                                if found_keys:
                                                     break
                                             if found_keys:
                                                 rating_keys = found_keys
@@ -2372,9 +2412,10 @@ class CollectionBuilder:
                             if in_id not in self.ignore_ids:
                                 found = False
                                 for pl_library in self.libraries:
-                                    if in_id in pl_library.movie_map:
+                                    found_keys = pl_library.rating_keys_from_id("tmdb", in_id)
+                                    if found_keys:
                                         found = True
-                                        rating_keys = pl_library.movie_map[in_id]
+                                        rating_keys = found_keys
                                         break
                                 if not found and in_id not in self.missing_movies:
                                     self.missing_movies.append(in_id)
@@ -2383,9 +2424,10 @@ class CollectionBuilder:
                         tvdb_id = int(tvdb_id)
                         found = False
                         for pl_library in self.libraries:
-                            if tvdb_id in pl_library.show_map:
+                            show_keys = pl_library.rating_keys_from_id("tvdb", tvdb_id)
+                            if show_keys:
                                 found = True
-                                show_item = pl_library.fetch_item(pl_library.show_map[tvdb_id][0])
+                                show_item = pl_library.fetch_item(show_keys[0])
                                 try:
                                     season_obj = show_item.season(season=int(season_num))
                                     if self.playlist:
@@ -2402,9 +2444,10 @@ class CollectionBuilder:
                         tvdb_id = int(tvdb_id)
                         found = False
                         for pl_library in self.libraries:
-                            if tvdb_id in pl_library.show_map:
+                            show_keys = pl_library.rating_keys_from_id("tvdb", tvdb_id)
+                            if show_keys:
                                 found = True
-                                show_item = pl_library.fetch_item(pl_library.show_map[tvdb_id][0])
+                                show_item = pl_library.fetch_item(show_keys[0])
                                 try:
                                     items.append(show_item.episode(season=int(season_num), episode=int(episode_num)))
                                 except NotFound:
@@ -2431,8 +2474,8 @@ class CollectionBuilder:
                         if tvdb_id not in self.ignore_ids:
                             found_keys = None
                             for pl_library in self.libraries:
-                                if tvdb_id in pl_library.show_map:
-                                    found_keys = pl_library.show_map[tvdb_id]
+                                found_keys = pl_library.rating_keys_from_id("tvdb", tvdb_id)
+                                if found_keys:
                                     break
                             if not found_keys and tvdb_id not in self.missing_shows:
                                 self.missing_shows.append(tvdb_id)
@@ -2456,33 +2499,12 @@ class CollectionBuilder:
                         continue
                     if not isinstance(rating_keys, list):
                         rating_keys = [rating_keys]
-                    for rk in rating_keys:
-                        try:
-                            item = self.library.fetch_item(rk)
-                            if self.playlist and isinstance(item, (Show, Season)):
-                                items.extend(item.episodes())
-                            elif self.builder_level == "movie" and not isinstance(item, Movie):
-                                logger.info(f"Item: {item} is not an Movie")
-                            elif self.builder_level == "show" and not isinstance(item, Show):
-                                logger.info(f"Item: {item} is not an Show")
-                            elif self.builder_level == "episode" and not isinstance(item, Episode):
-                                logger.info(f"Item: {item} is not an Episode")
-                            elif self.builder_level == "season" and not isinstance(item, Season):
-                                logger.info(f"Item: {item} is not a Season")
-                            elif self.builder_level == "artist" and not isinstance(item, Artist):
-                                logger.info(f"Item: {item} is not an Artist")
-                            elif self.builder_level == "album" and not isinstance(item, Album):
-                                logger.info(f"Item: {item} is not an Album")
-                            elif self.builder_level == "track" and not isinstance(item, Track):
-                                logger.info(f"Item: {item} is not a Track")
-                            else:
-                                items.append(item)
-                        except Failed as e:
-                            logger.error(e)
+                    items.extend([int(rk) for rk in rating_keys])
                 except Exception as e:
                     logger.stacktrace()
                     logger.error(e)
                     logger.info(input_data)
+            items = self.fetch_items(items)
             logger.exorcise()
         if not items:
             return None
@@ -2492,12 +2514,14 @@ class CollectionBuilder:
         if self.filters and (self.details["show_filtered"] is True or self.details["show_unfiltered"] is True):
             logger.info("")
             logger.info("Filtering Builders:")
+        if self.filters and not self.details["only_filter_missing"] and self.compiled_filters is None:
+            self.compile_filters()
         filtered_items = []
-        for i, item in enumerate(items, 1):
+        for i, item in enumerate(self.library.prefetch(items) if self.filters and not self.details["only_filter_missing"] and self.filter_reload else items, 1):
             if not isinstance(item, (Movie, Show, Season, Episode, Artist, Album, Track)):
                 logger.error(f"{self.Type} Error: Item: {item} is an invalid type")
                 continue
-            if item not in self.found_items:
+            if item.ratingKey not in self.found_keys:
                 if item.ratingKey in self.filtered_keys:
                     if self.details["show_filtered"] is True:
                         logger.info(f"{name} {self.Type} | X | {self.filtered_keys[item.ratingKey]}")
@@ -2505,6 +2529,7 @@ class CollectionBuilder:
                     current_title = util.item_title(item)
                     if self.check_filters(item, f"{(' ' * (max_length - len(str(i))))}{i}/{total}"):
                         self.found_items.append(item)
+                        self.found_keys.add(item.ratingKey)
                         if self.details["show_unfiltered"] is True:
                             logger.info(f"{name} {self.Type} | = | {current_title}")
                     else:
@@ -2894,21 +2919,29 @@ class CollectionBuilder:
         logger.info("")
         logger.separator(f"Adding to {self.name} {self.Type}", space=False, border=False)
         logger.info("")
-        name, collection_items = self.library.get_collection_name_and_items(self.obj if self.obj else self.name, self.smart_label_collection)
+        if self.obj and (self.sync or self.playlist):
+            name = self.obj.title
+            collection_keys = set(self.remove_item_map)
+        else:
+            name, collection_items = self.library.get_collection_name_and_items(self.obj if self.obj else self.name, self.smart_label_collection)
+            collection_keys = {i.ratingKey for i in collection_items}
         total = self.limit if self.limit and len(self.found_items) > self.limit else len(self.found_items)
         spacing = len(str(total)) * 2 + 1
         amount_added = 0
         amount_unchanged = 0
+        amount_pending = sum(1 for r in self.remove_item_map.values() if r is not None)
         items_added = []
         for i, item in enumerate(self.found_items, 1):
-            if self.limit and amount_added + self.beginning_count - len([r for _, r in self.remove_item_map.items() if r is not None]) >= self.limit:
+            if self.limit and amount_added + self.beginning_count - amount_pending >= self.limit:
                 logger.info(f"{self.Type} Limit reached")
                 self.found_items = self.found_items[:i - 1]
                 break
-            current_operation = "=" if item in collection_items else "+"
+            in_collection = item.ratingKey in collection_keys
             number_text = f"{i}/{total}"
-            logger.info(f"{number_text:>{spacing}} | {name} {self.Type} | {current_operation} | {util.item_title(item)}")
-            if item in collection_items:
+            logger.info(f"{number_text:>{spacing}} | {name} {self.Type} | {'=' if in_collection else '+'} | {util.item_title(item)}")
+            if in_collection:
+                if self.remove_item_map.get(item.ratingKey) is not None:
+                    amount_pending -= 1
                 self.remove_item_map[item.ratingKey] = None
                 amount_unchanged += 1
             else:
@@ -3024,29 +3057,38 @@ class CollectionBuilder:
                     final_return = True
         return final_return
 
+    def compile_filters(self):
+        self.compiled_filters = []
+        for filter_list in self.filters:
+            tmdb_f = []
+            tvdb_f = []
+            imdb_f = []
+            plex_f = []
+            for k, v in filter_list:
+                if k.split(".")[0] in tmdb_filters:
+                    tmdb_f.append((k, v))
+                elif k.split(".")[0] in tvdb_filters:
+                    tvdb_f.append((k, v))
+                elif k.split(".")[0] in imdb_filters:
+                    imdb_f.append((k, v))
+                else:
+                    plex_f.append((k, v))
+            self.compiled_filters.append((tmdb_f, tvdb_f, imdb_f, self.library.compile_filters(plex_f, pushdown=self.builder_level == self.library.Plex.TYPE)))
+        self.filter_reload = any(not f.pushdown for _, _, _, plex_f in self.compiled_filters for f in plex_f)
+
     def check_filters(self, item, display):
         final_return = True
         if self.filters and not self.details["only_filter_missing"]:
             logger.ghost(f"Filtering {display} {item.title}")
-            item = self.library.reload(item)
+            if self.compiled_filters is None:
+                self.compile_filters()
+            if self.filter_reload:
+                item = self.library.reload(item)
             final_return = False
             tmdb_item = None
             tvdb_item = None
             imdb_info = None
-            for filter_list in self.filters:
-                tmdb_f = []
-                tvdb_f = []
-                imdb_f = []
-                plex_f = []
-                for k, v in filter_list:
-                    if k.split(".")[0] in tmdb_filters:
-                        tmdb_f.append((k, v))
-                    elif k.split(".")[0] in tvdb_filters:
-                        tvdb_f.append((k, v))
-                    elif k.split(".")[0] in imdb_filters:
-                        imdb_f.append((k, v))
-                    else:
-                        plex_f.append((k, v))
+            for tmdb_f, tvdb_f, imdb_f, plex_f in self.compiled_filters:
                 or_result = True
                 if tmdb_f:
                     if not tmdb_item and isinstance(item, (Movie, Show)):
@@ -3249,15 +3291,30 @@ class CollectionBuilder:
 
         tmdb_paths = []
         tvdb_paths = []
-        for item in self.items:
+        tag_edits = {}
+        edition_items = []
+        all_items = []
+        for item in self.library.prefetch(self.items):
             item = self.library.reload(item)
+            all_items.append(item)
             current_labels = [la.tag for la in self.library.item_labels(item)]
             if "item_assets" in self.item_details and self.asset_directory and "Overlay" not in current_labels:
                 self.library.find_and_upload_assets(item, current_labels, asset_directory=self.asset_directory)
-            self.library.edit_tags("label", item, add_tags=add_tags, remove_tags=remove_tags, sync_tags=sync_tags)
-            self.library.edit_tags("genre", item, add_tags=add_genres, remove_tags=remove_genres, sync_tags=sync_genres)
+            for attr, _add_tags, _remove_tags, _sync_tags in [
+                ("label", add_tags, remove_tags, sync_tags),
+                ("genre", add_genres, remove_genres, sync_genres)
+            ]:
+                if _add_tags or _remove_tags or _sync_tags is not None:
+                    item, _add, _remove = self.library.tag_changes(attr, item, add_tags=_add_tags, remove_tags=_remove_tags, sync_tags=_sync_tags)
+                    if _add:
+                        tag_edits.setdefault((attr, False, tuple(_add)), []).append(item)
+                    if _remove:
+                        tag_edits.setdefault((attr, True, tuple(_remove)), []).append(item)
+                    if _add or _remove:
+                        display = ", ".join([f"+{t}" for t in _add] + [f"-{t}" for t in _remove])
+                        logger.info(f"{item.title[:25]:<25} | {attr.title()} | {display}")
             if "item_edition" in self.item_details and item.editionTitle != self.item_details["item_edition"]:
-                self.library.query_data(item.editEditionTitle, self.item_details["item_edition"])
+                edition_items.append(item)
                 logger.info(f"{item.title[:25]:<25} | Edition | {self.item_details['item_edition']}")
             path = None
             if "item_radarr_tag" in self.item_details or self.radarr_details["add_existing"] or "item_sonarr_tag" in self.item_details or self.sonarr_details["add_existing"]:
@@ -3301,14 +3358,30 @@ class CollectionBuilder:
                 except Failed as e:
                     logger.error(e)
 
-            # Locking should come before refreshing since refreshing can change metadata (i.e. if specified to both lock
-            # background/poster and also refreshing, assume that the item background/poster should be kept)
-            if "item_lock_background" in self.item_details:
-                self.library.query(item.lockArt if self.item_details["item_lock_background"] else item.unlockArt)
-            if "item_lock_poster" in self.item_details:
-                self.library.query(item.lockPoster if self.item_details["item_lock_poster"] else item.unlockPoster)
-            if "item_lock_title" in self.item_details:
-                self.library.edit_query(item, {"title.locked": 1 if self.item_details["item_lock_title"] else 0})
+        for (attr, remove, tags), items in tag_edits.items():
+            self.library.clear_tags(attr)
+            try:
+                self.library.batch_edit(items, "editTags", attr, list(tags), remove=remove)
+            except BadRequest as e:
+                logger.error(f"Plex Error: {attr.title()} Batch Edit Failed: {e}")
+        if edition_items:
+            try:
+                self.library.batch_edit(edition_items, "editField", "editionTitle", self.item_details["item_edition"])
+            except BadRequest as e:
+                logger.error(f"Plex Error: Edition Batch Edit Failed: {e}")
+
+        # Locking should come before refreshing since refreshing can change metadata (i.e. if specified to both lock
+        # background/poster and also refreshing, assume that the item background/poster should be kept)
+        lock_edits = {}
+        for lock_key, attr in [("item_lock_background", "art"), ("item_lock_poster", "thumb"), ("item_lock_title", "title")]:
+            if lock_key in self.item_details:
+                lock_edits[f"{attr}.locked"] = 1 if self.item_details[lock_key] else 0
+        if lock_edits and all_items:
+            try:
+                self.library.batch_edit(all_items, "_edit", **lock_edits)
+            except BadRequest as e:
+                logger.error(f"Plex Error: Lock Batch Edit Failed: {e}")
+        for item in all_items:
             if "item_refresh" in self.item_details:
                 delay = self.item_details["item_refresh_delay"] if "item_refresh_delay" in self.item_details else self.library.item_refresh_delay
                 if delay > 0:
@@ -3531,24 +3604,15 @@ class CollectionBuilder:
         self.collection_poster = self.library.pick_image(self.obj.title, self.posters, self.library.prioritize_assets, self.library.download_url_assets, asset_location)
         self.collection_background = self.library.pick_image(self.obj.title, self.backgrounds, self.library.prioritize_assets, self.library.download_url_assets, asset_location, image_type="background")
 
-        clean_temp = False
         if isinstance(self.collection_poster, KometaImage):
-            clean_temp = True
             item_vars = {"title": self.name, "titleU": self.name.upper(), "titleL": self.name.lower()}
-            self.collection_poster = self.collection_poster.save(item_vars)
+            self.collection_poster = self.collection_poster.save(item_vars, debug=self.library.save_rendered_artwork)
 
         if self.collection_poster or self.collection_background:
             pu, bu, lu = self.library.upload_images(self.obj, poster=self.collection_poster, background=self.collection_background)
             if pu or bu:
                 updated_details.append("Image")
 
-        if clean_temp:
-            code_base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            posters_dir = os.path.join(code_base, "defaults", "posters")
-            for filename in os.listdir(posters_dir):
-                if "temp" in filename:
-                    os.remove(os.path.join(posters_dir, filename))
-
         if self.url_theme:  # TODO: cache theme path to not constantly upload
             self.library.upload_theme(self.obj, url=self.url_theme)
         elif self.file_theme:
@@ -3578,12 +3642,16 @@ class CollectionBuilder:
                 else:
                     raise Failed(str(e))
             items = self.library.fetchItems(search_data[2])
+        sort_keys = {item.ratingKey for item in items}
+        items = list(items) + [item for item in self.items if item.ratingKey not in sort_keys]
+        current_positions = {item.ratingKey: i for i, item in enumerate(self.items)}
+        in_place = util.longest_increasing_subsequence([current_positions.get(item.ratingKey) for item in items])
         total_items = len(items)
         previous = None
         sort_edit = False
         for i, item in enumerate(items, 0):
             try:
-                if len(self.items) <= i or item.ratingKey != self.items[i].ratingKey:
+                if i not in in_place:
                     text = f"after {util.item_title(previous)}" if previous else "to the beginning"
                     self.library.moveItem(self.obj, item, previous)
                     logger.info(f"({i + 1}/{total_items}) Moving {util.item_title(item)} {text}")
@@ -3654,14 +3722,11 @@ class CollectionBuilder:
             logger.info("")
             logger.separator(f"Syncing Playlist to Users", space=False, border=False)
             logger.info("")
-            for user in self.valid_users:
-                try:
-                    self.library.delete_user_playlist(self.obj.title, user)
-                except Failed:
-                    pass
-                if user != self.library.account.username:
-                    self.obj.copyToUser(user).editSummary(summary=self.obj.summary).reload()
-                    logger.info(f"Playlist: {self.name} synced to {user}")
+            items = self.library.query(self.obj.items)
+            with ThreadPoolExecutor(max_workers=self.library.user_workers) as executor:
+                for user, synced in zip(self.valid_users, executor.map(lambda u: self.library.sync_user_playlist(self.obj, items, u), self.valid_users)):
+                    if synced:
+                        logger.info(f"Playlist: {self.name} synced to {user}")
 
     def exclude_admin_from_playlist(self):
         if self.obj and (self.exclude_users is not None and self.library.account.username in self.exclude_users):
@@ -3705,12 +3770,10 @@ class CollectionBuilder:
         self.added_to_radarr = []
         self.added_to_sonarr = []
         for mm in self.run_again_movies:
-            if mm in self.library.movie_map:
-                rating_keys.extend(self.library.movie_map[mm])
+            rating_keys.extend(self.library.rating_keys_from_id("tmdb", mm))
         if self.library.is_show:
             for sm in self.run_again_shows:
-                if sm in self.library.show_map:
-                    rating_keys.extend(self.library.show_map[sm])
+                rating_keys.extend(self.library.rating_keys_from_id("tvdb", sm))
         if len(rating_keys) > 0:
             for rating_key in rating_keys:
                 try:
@@ -3737,7 +3800,7 @@ class CollectionBuilder:
         if len(self.run_again_movies) > 0:
             logger.info("")
             for missing_id in self.run_again_movies:
-                if missing_id not in self.library.movie_map:
+                if not self.library.rating_keys_from_id("tmdb", missing_id):
                     try:
                         movie = self.config.TMDb.get_movie(missing_id)
                     except Failed as e:
@@ -3752,7 +3815,7 @@ class CollectionBuilder:
         if len(self.run_again_shows) > 0 and self.library.is_show:
             logger.info("")
             for missing_id in self.run_again_shows:
-                if missing_id not in self.library.show_map:
+                if not self.library.rating_keys_from_id("tvdb", missing_id):
                     try:
                         title = self.config.TVDb.get_tvdb_obj(missing_id).title
                     except Failed as e:
@@ -1,7 +1,7 @@
 import json, os, random, sqlite3
 from contextlib import closing
 from datetime import datetime, timedelta
-from modules import util
+from modules import idgraph, util
 
 logger = util.logger
 
@@ -34,6 +34,14 @@ class Cache:
                     media_type TEXT,
                     expiration_date TEXT)"""
                 )
+                cursor.execute(
+                    """CREATE TABLE IF NOT EXISTS library_watermarks (
+                    key INTEGER PRIMARY KEY,
+                    library TEXT UNIQUE,
+                    updated_at INTEGER,
+                    added_at INTEGER,
+                    config_hash TEXT)"""
+                )
                 cursor.execute(
                     """CREATE TABLE IF NOT EXISTS imdb_to_tmdb_map (
                     key INTEGER PRIMARY KEY,
@@ -442,6 +450,46 @@ class Cache:
                     sql = f"UPDATE {map_name} SET {val2_name} = ?, expiration_date = ?, media_type = ? WHERE {val1_name} = ?"
                     cursor.execute(sql, (val2, expiration_date.strftime("%Y-%m-%d"), media_type, val1))
 
+    def query_id_graph(self):
+        edges = []
+        with sqlite3.connect(self.cache_path) as connection:
+            connection.row_factory = sqlite3.Row
+            with closing(connection.cursor()) as cursor:
+                def not_expired(row):
+                    if not row["expiration_date"]:
+                        return False
+                    return (datetime.now() - datetime.strptime(row["expiration_date"], "%Y-%m-%d")).days <= self.expiration
+
+                def cast_id(_id):
+                    try:
+                        return int(_id)
+                    except ValueError:
+                        return _id
+
+                cursor.execute("SELECT * FROM guids_map")
+                for row in cursor:
+                    if not not_expired(row) or not row["media_type"]:
+                        continue
+                    t_type = "tmdb" if "movie" in row["media_type"] else "tvdb"
+                    edges.append(("guid", row["plex_guid"], "guid_type", row["media_type"], "guid"))
+                    for t_id in util.get_list(row["t_id"], int_list=True):
+                        edges.append(("guid", row["plex_guid"], t_type, t_id, "guid"))
+                    for i_id in util.get_list(row["imdb_id"]):
+                        edges.append(("guid", row["plex_guid"], "imdb", i_id, "guid"))
+                cursor.execute("SELECT * FROM imdb_to_tmdb_map")
+                for row in cursor:
+                    if row["imdb_id"] and row["tmdb_id"] and row["media_type"] in idgraph.tmdb_media_types and not_expired(row):
+                        edges.append(("imdb", row["imdb_id"], idgraph.tmdb_media_types[row["media_type"]], cast_id(row["tmdb_id"]), "convert"))
+                cursor.execute("SELECT * FROM tmdb_to_tvdb_map2")
+                for row in cursor:
+                    if row["tmdb_id"] and row["tvdb_id"] and not_expired(row):
+                        edges.append(("tmdb_show", cast_id(row["tmdb_id"]), "tvdb", cast_id(row["tvdb_id"]), "convert"))
+                cursor.execute("SELECT * FROM imdb_to_tvdb_map2")
+                for row in cursor:
+                    if row["imdb_id"] and row["tvdb_id"] and not_expired(row):
+                        edges.append(("imdb", row["imdb_id"], "tvdb", cast_id(row["tvdb_id"]), "convert"))
+        return edges
+
     def query_omdb(self, imdb_id, expiration):
         omdb_dict = {}
         expired = None
@@ -871,6 +919,24 @@ class Cache:
                         compare TEXT,
                         location TEXT)"""
                     )
+                    cursor.execute(
+                        f"""CREATE TABLE IF NOT EXISTS {table_name}_fingerprints (
+                        key INTEGER PRIMARY KEY,
+                        rating_key TEXT UNIQUE,
+                        fingerprint TEXT)"""
+                    )
+                    cursor.execute(
+                        f"""CREATE TABLE IF NOT EXISTS {table_name}_overlay_fingerprints (
+                        key INTEGER PRIMARY KEY,
+                        rating_key TEXT UNIQUE,
+                        fingerprint TEXT)"""
+                    )
+                    cursor.execute(
+                        f"""CREATE TABLE IF NOT EXISTS {table_name}_overlay_backups (
+                        key INTEGER PRIMARY KEY,
+                        rating_key TEXT UNIQUE,
+                        blob TEXT)"""
+                    )
                 else:
                     cursor.execute("INSERT OR IGNORE INTO image_maps(library) VALUES(?)", (library,))
                     cursor.execute(f"SELECT * FROM image_maps WHERE library = ?", (library,))
@@ -909,6 +975,24 @@ class Cache:
                             compare TEXT,
                             location TEXT)"""
                         )
+                        cursor.execute(
+                            f"""CREATE TABLE IF NOT EXISTS {table_name}_fingerprints (
+                            key INTEGER PRIMARY KEY,
+                            rating_key TEXT UNIQUE,
+                            fingerprint TEXT)"""
+                        )
+                        cursor.execute(
+                            f"""CREATE TABLE IF NOT EXISTS {table_name}_overlay_fingerprints (
+                            key INTEGER PRIMARY KEY,
+                            rating_key TEXT UNIQUE,
+                            fingerprint TEXT)"""
+                        )
+                        cursor.execute(
+                            f"""CREATE TABLE IF NOT EXISTS {table_name}_overlay_backups (
+                            key INTEGER PRIMARY KEY,
+                            rating_key TEXT UNIQUE,
+                            blob TEXT)"""
+                        )
         return table_name
 
     def query_image_map(self, rating_key, table_name):
@@ -928,6 +1012,52 @@ class Cache:
                 cursor.execute(f"INSERT OR IGNORE INTO {table_name}(rating_key) VALUES(?)", (rating_key,))
                 cursor.execute(f"UPDATE {table_name} SET location = ?, compare = ?, overlay = ? WHERE rating_key = ?", (location, compare, overlay, rating_key))
 
+    def query_library_watermark(self, library):
+        with sqlite3.connect(self.cache_path) as connection:
+            connection.row_factory = sqlite3.Row
+            with closing(connection.cursor()) as cursor:
+                cursor.execute("SELECT * FROM library_watermarks WHERE library = ?", (library,))
+                row = cursor.fetchone()
+                if row:
+                    return row["updated_at"], row["added_at"], row["config_hash"]
+        return None, None, None
+
+    def update_library_watermark(self, library, updated_at, added_at, config_hash):
+        with sqlite3.connect(self.cache_path) as connection:
+            connection.row_factory = sqlite3.Row
+            with closing(connection.cursor()) as cursor:
+                cursor.execute("INSERT OR IGNORE INTO library_watermarks(library) VALUES(?)", (library,))
+                cursor.execute("UPDATE library_watermarks SET updated_at = ?, added_at = ?, config_hash = ? WHERE library = ?", (updated_at, added_at, config_hash, library))
+
+    def query_item_fingerprints(self, table_name):
+        with sqlite3.connect(self.cache_path) as connection:
+            connection.row_factory = sqlite3.Row
+            with closing(connection.cursor()) as cursor:
+                cursor.execute(f"SELECT * FROM {table_name}")
+                return {row["rating_key"]: row["fingerprint"] for row in cursor.fetchall()}
+
+    def update_item_fingerprints(self, table_name, fingerprints, replace=False):
+        with sqlite3.connect(self.cache_path) as connection:
+            connection.row_factory = sqlite3.Row
+            with closing(connection.cursor()) as cursor:
+                if replace:
+                    cursor.execute(f"DELETE FROM {table_name}")
+                cursor.executemany(f"INSERT OR REPLACE INTO {table_name}(rating_key, fingerprint) VALUES(?, ?)", [(str(k), v) for k, v in fingerprints.items()])
+
+    def query_overlay_backups(self, table_name):
+        with sqlite3.connect(self.cache_path) as connection:
+            connection.row_factory = sqlite3.Row
+            with closing(connection.cursor()) as cursor:
+                cursor.execute(f"SELECT * FROM {table_name}")
+                return {row["rating_key"]: row["blob"] for row in cursor.fetchall()}
+
+    def update_overlay_backups(self, table_name, backups):
+        with sqlite3.connect(self.cache_path) as connection:
+            connection.row_factory = sqlite3.Row
+            with closing(connection.cursor()) as cursor:
+                cursor.executemany(f"DELETE FROM {table_name} WHERE rating_key = ?", [(str(k),) for k, v in backups.items() if v is None])
+                cursor.executemany(f"INSERT OR REPLACE INTO {table_name}(rating_key, blob) VALUES(?, ?)", [(str(k), v) for k, v in backups.items() if v is not None])
+
     def query_radarr_adds(self, tmdb_id, library):
         return self.query_arr_adds(tmdb_id, library, "radarr", "tmdb_id")
 
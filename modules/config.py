@@ -1,8 +1,9 @@
-import os, re
+import hashlib, json, os, re
 from datetime import datetime
 from modules import util, radarr, sonarr, operations
 from modules.anidb import AniDB
 from modules.anilist import AniList
+from modules.assets import AssetIndex
 from modules.cache import Cache
 from modules.convert import Convert
 from modules.ergast import Ergast
@@ -27,6 +28,7 @@ from modules.tautulli import Tautulli
 from modules.tmdb import TMDb
 from modules.trakt import Trakt
 from modules.tvdb import TVDb
+from modules.upload import HostLimiter
 from modules.util import Failed, NotScheduled, NotScheduledRange
 from modules.webhooks import Webhooks
 
@@ -46,6 +48,11 @@ filetype_list = {
     "webp_lossy": "Use Lossy WEBP files for saving Overlays",
     "webp_lossless": "Use Lossless WEBP files for saving Overlays"
 }
+backup_filetype_list = {
+    "original": "Keep Original Poster Backups in the format they were downloaded",
+    "webp_lossy": "Re-encode Original Poster Backups as Lossy WEBP files",
+    "webp_lossless": "Re-encode Original Poster Backups as Lossless WEBP files"
+}
 imdb_label_options = {
     "remove": "Remove All IMDb Parental Labels",
     "none": "Add IMDb Parental Labels for None, Mild, Moderate, or Severe",
@@ -197,7 +204,9 @@ class ConfigFile:
         self.overlays_only = attrs["overlays_only"] if "overlays_only" in attrs else False
         self.env_plex_url = attrs["plex_url"] if "plex_url" in attrs else ""
         self.env_plex_token = attrs["plex_token"] if "plex_token" in attrs else ""
-        self.tpdb_timer = None
+        self.HostLimiter = HostLimiter()
+        self.plex_servers = {}
+        self.Assets = AssetIndex()
         current_time = datetime.now()
 
         with open(self.config_path, encoding="utf-8") as fp:
@@ -490,6 +499,8 @@ class ConfigFile:
             "default_collection_order": check_for_attribute(self.data, "default_collection_order", parent="settings", default_is_none=True),
             "minimum_items": check_for_attribute(self.data, "minimum_items", parent="settings", var_type="int", default=1),
             "item_refresh_delay": check_for_attribute(self.data, "item_refresh_delay", parent="settings", var_type="int", default=0),
+            "incremental": check_for_attribute(self.data, "incremental", parent="settings", var_type="bool", default=False),
+            "incremental_reconcile": check_for_attribute(self.data, "incremental_reconcile", parent="settings", default_is_none=True),
             "delete_below_minimum": check_for_attribute(self.data, "delete_below_minimum", parent="settings", var_type="bool", default=False),
             "delete_not_scheduled": check_for_attribute(self.data, "delete_not_scheduled", parent="settings", var_type="bool", default=False),
             "run_again_delay": check_for_attribute(self.data, "run_again_delay", parent="settings", var_type="int", default=0),
@@ -502,6 +513,7 @@ class ConfigFile:
             "show_options": check_for_attribute(self.data, "show_options", parent="settings", var_type="bool", default=False),
             "show_missing": check_for_attribute(self.data, "show_missing", parent="settings", var_type="bool", default=True),
             "save_report": check_for_attribute(self.data, "save_report", parent="settings", var_type="bool", default=False),
+            "save_rendered_artwork": check_for_attribute(self.data, "save_rendered_artwork", parent="settings", var_type="bool", default=False),
             "tvdb_language": check_for_attribute(self.data, "tvdb_language", parent="settings", default="default"),
             "ignore_ids": check_for_attribute(self.data, "ignore_ids", parent="settings", var_type="int_list", default_is_none=True),
             "ignore_imdb_ids": check_for_attribute(self.data, "ignore_imdb_ids", parent="settings", var_type="lower_list", default_is_none=True),
@@ -512,6 +524,8 @@ class ConfigFile:
             "custom_repo": check_for_attribute(self.data, "custom_repo", parent="settings", default_is_none=True),
             "overlay_artwork_filetype": check_for_attribute(self.data, "overlay_artwork_filetype", parent="settings", test_list=filetype_list, translations={"webp": "webp_lossy"}, default="webp_lossy"),
             "overlay_artwork_quality": check_for_attribute(self.data, "overlay_artwork_quality", parent="settings", var_type="int", default=90, int_min=1, int_max=100),
+            "overlay_backup_filetype": check_for_attribute(self.data, "overlay_backup_filetype", parent="settings", test_list=backup_filetype_list, default="original"),
+            "overlay_workers": check_for_attribute(self.data, "overlay_workers", parent="settings", var_type="int", default=os.cpu_count() or 1, int_min=1),
             "assets_for_all": check_for_attribute(self.data, "assets_for_all", parent="settings", var_type="bool", default=False, save=False, do_print=False),
             "assets_for_all_collections": check_for_attribute(self.data, "assets_for_all_collections", parent="settings", var_type="bool", default=False, save=False, do_print=False)
         }
@@ -817,7 +831,11 @@ class ConfigFile:
                 "token": check_for_attribute(self.data, "token", parent="plex", default_is_none=True),
                 "timeout": check_for_attribute(self.data, "timeout", parent="plex", var_type="int", default=60),
                 "verify_ssl": check_for_attribute(self.data, "verify_ssl", parent="plex", var_type="bool", default_is_none=True),
-                "db_cache": check_for_attribute(self.data, "db_cache", parent="plex", var_type="int", default_is_none=True)
+                "db_cache": check_for_attribute(self.data, "db_cache", parent="plex", var_type="int", default_is_none=True),
+                "page_size": check_for_attribute(self.data, "page_size", parent="plex", var_type="int", default_is_none=True, int_min=1),
+                "page_workers": check_for_attribute(self.data, "page_workers", parent="plex", var_type="int", default=4, int_min=1),
+                "upload_workers": check_for_attribute(self.data, "upload_workers", parent="plex", var_type="int", default=4, int_min=1),
+                "user_workers": check_for_attribute(self.data, "user_workers", parent="plex", var_type="int", default=8, int_min=1)
             }
             for attr in ["clean_bundles", "empty_trash", "optimize"]:
                 try:
@@ -899,6 +917,7 @@ class ConfigFile:
                 params["show_missing"] = check_for_attribute(lib, "show_missing", parent="settings", var_type="bool", default=self.general["show_missing"], do_print=False, save=False)
                 params["show_missing_assets"] = check_for_attribute(lib, "show_missing_assets", parent="settings", var_type="bool", default=self.general["show_missing_assets"], do_print=False, save=False)
                 params["save_report"] = check_for_attribute(lib, "save_report", parent="settings", var_type="bool", default=self.general["save_report"], do_print=False, save=False)
+                params["save_rendered_artwork"] = check_for_attribute(lib, "save_rendered_artwork", parent="settings", var_type="bool", default=self.general["save_rendered_artwork"], do_print=False, save=False)
                 params["missing_only_released"] = check_for_attribute(lib, "missing_only_released", parent="settings", var_type="bool", default=self.general["missing_only_released"], do_print=False, save=False)
                 params["only_filter_missing"] = check_for_attribute(lib, "only_filter_missing", parent="settings", var_type="bool", default=self.general["only_filter_missing"], do_print=False, save=False)
                 params["create_asset_folders"] = check_for_attribute(lib, "create_asset_folders", parent="settings", var_type="bool", default=self.general["create_asset_folders"], do_print=False, save=False)
@@ -910,6 +929,19 @@ class ConfigFile:
                 params["show_asset_not_needed"] = check_for_attribute(lib, "show_asset_not_needed", parent="settings", var_type="bool", default=self.general["show_asset_not_needed"], do_print=False, save=False)
                 params["minimum_items"] = check_for_attribute(lib, "minimum_items", parent="settings", var_type="int", default=self.general["minimum_items"], do_print=False, save=False)
                 params["item_refresh_delay"] = check_for_attribute(lib, "item_refresh_delay", parent="settings", var_type="int", default=self.general["item_refresh_delay"], do_print=False, save=False)
+                params["incremental"] = check_for_attribute(lib, "incremental", parent="settings", var_type="bool", default=self.general["incremental"], do_print=False, save=False)
+                params["incremental_reconcile"] = False
+                params["incremental_hash"] = hashlib.sha256(json.dumps(lib, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+                incremental_reconcile = check_for_attribute(lib, "incremental_reconcile", parent="settings", default=self.general["incremental_reconcile"], default_is_none=True, do_print=False, save=False)
+                if params["incremental"] and incremental_reconcile:
+                    if self.ignore_schedules:
+                        params["incremental_reconcile"] = True
+                    else:
+                        try:
+                            util.schedule_check("incremental_reconcile", incremental_reconcile, current_time, self.run_hour)
+                            params["incremental_reconcile"] = True
+                        except NotScheduled:
+                            pass
                 params["delete_below_minimum"] = check_for_attribute(lib, "delete_below_minimum", parent="settings", var_type="bool", default=self.general["delete_below_minimum"], do_print=False, save=False)
                 params["delete_not_scheduled"] = check_for_attribute(lib, "delete_not_scheduled", parent="settings", var_type="bool", default=self.general["delete_not_scheduled"], do_print=False, save=False)
                 params["ignore_ids"] = check_for_attribute(lib, "ignore_ids", parent="settings", var_type="int_list", default_is_none=True, do_print=False, save=False)
@@ -918,6 +950,8 @@ class ConfigFile:
                 params["ignore_imdb_ids"].extend([i for i in self.general["ignore_imdb_ids"] if i not in params["ignore_imdb_ids"]])
                 params["overlay_artwork_filetype"] = check_for_attribute(lib, "overlay_artwork_filetype", parent="settings", test_list=filetype_list, translations={"webp": "webp_lossy"}, default=self.general["overlay_artwork_filetype"], do_print=False, save=False)
                 params["overlay_artwork_quality"] = check_for_attribute(lib, "overlay_artwork_quality", parent="settings", var_type="int", default=self.general["overlay_artwork_quality"], default_is_none=True, int_min=1, int_max=100, do_print=False, save=False)
+                params["overlay_backup_filetype"] = check_for_attribute(lib, "overlay_backup_filetype", parent="settings", test_list=backup_filetype_list, default=self.general["overlay_backup_filetype"], do_print=False, save=False)
+                params["overlay_workers"] = check_for_attribute(lib, "overlay_workers", parent="settings", var_type="int", default=self.general["overlay_workers"], int_min=1, do_print=False, save=False)
                 params["changes_webhooks"] = check_for_attribute(lib, "changes", parent="webhooks", var_type="list", default=self.webhooks["changes"], do_print=False, save=False, default_is_none=True)
                 params["report_path"] = None
                 if lib and "report_path" in lib and lib["report_path"]:
@@ -925,6 +959,7 @@ class ConfigFile:
                         params["report_path"] = lib["report_path"]
                     else:
                         logger.error(f"Config Error: Folder {os.path.dirname(os.path.abspath(lib['report_path']))} does not exist")
+                params["operations_skipped"] = False
                 if lib and "operations" in lib and lib["operations"]:
                     final_operations = {}
                     logger.separator("Operation Configuration", space=False, border=False)
@@ -943,6 +978,7 @@ class ConfigFile:
                                     util.schedule_check("schedule", config_op["schedule"], current_time, self.run_hour)
                                 except NotScheduled:
                                     logger.info(f"Skipping Operation Not Scheduled for {config_op['schedule']}")
+                                    params["operations_skipped"] = True
                                     continue
                         if "delete_collections" not in config_op and ("delete_unmanaged_collections" in config_op or "delete_collections_with_less" in config_op):
                             config_op["delete_collections"] = {}
@@ -1114,6 +1150,7 @@ class ConfigFile:
                 old_reset = None
                 old_schedule = None
                 params["overlay_files"] = []
+                params["overlays_skipped"] = False
                 params["remove_overlays"] = False
                 params["reapply_overlays"] = False
                 params["reset_overlays"] = None
@@ -1192,6 +1229,7 @@ class ConfigFile:
                             logger.info("")
                             logger.info(f"Overlay Schedule:{err}\n\nOverlays not scheduled to run")
                             params["overlay_files"] = []
+                            params["overlays_skipped"] = True
                             params["remove_overlays"] = False
 
                 if lib and "overlay_files" in lib and not params["overlay_files"] and params["remove_overlays"] is False and params["reset_overlays"] is False:
@@ -1217,7 +1255,11 @@ class ConfigFile:
                         "token": check_for_attribute(lib, "token", parent="plex", default=self.general["plex"]["token"], req_default=True, save=False),
                         "timeout": check_for_attribute(lib, "timeout", parent="plex", var_type="int", default=self.general["plex"]["timeout"], save=False),
                         "verify_ssl": check_for_attribute(lib, "verify_ssl", parent="plex", var_type="bool", default=self.general["plex"]["verify_ssl"], default_is_none=True, save=False),
-                        "db_cache": check_for_attribute(lib, "db_cache", parent="plex", var_type="int", default=self.general["plex"]["db_cache"], default_is_none=True, save=False)
+                        "db_cache": check_for_attribute(lib, "db_cache", parent="plex", var_type="int", default=self.general["plex"]["db_cache"], default_is_none=True, save=False),
+                        "page_size": check_for_attribute(lib, "page_size", parent="plex", var_type="int", default=self.general["plex"]["page_size"], default_is_none=True, int_min=1, save=False),
+                        "page_workers": check_for_attribute(lib, "page_workers", parent="plex", var_type="int", default=self.general["plex"]["page_workers"], int_min=1, save=False),
+                        "upload_workers": check_for_attribute(lib, "upload_workers", parent="plex", var_type="int", default=self.general["plex"]["upload_workers"], int_min=1, save=False),
+                        "user_workers": check_for_attribute(lib, "user_workers", parent="plex", var_type="int", default=self.general["plex"]["user_workers"], int_min=1, save=False)
                     }
                     for attr in ["clean_bundles", "empty_trash", "optimize"]:
                         try:
@@ -1,5 +1,6 @@
 import re
 from modules import util
+from modules.idgraph import IDGraph, tmdb_media_types
 from modules.util import Failed, NonExisting
 from modules.request import urlparse
 from plexapi.exceptions import BadRequest
@@ -7,6 +8,7 @@ from requests.exceptions import ConnectionError
 
 logger = util.logger
 
+reverse_tmdb_media_types = {v: k for k, v in tmdb_media_types.items()}
 anime_lists_url = "https://raw.githubusercontent.com/Kometa-Team/Anime-IDs/master/anime_ids.json"
 
 class Convert:
@@ -14,110 +16,100 @@ class Convert:
         self.requests = requests
         self.cache = cache
         self.tmdb = tmdb
-        self._anidb_ids = {}
-        self._mal_to_anidb = {}
-        self._anidb_to_mal = {}
-        self._anilist_to_anidb = {}
-        self._anidb_to_imdb = {}
-        self._anidb_to_tvdb = {}
-        self._anidb_to_tmdb_movie = {}
-        self._anidb_to_tmdb_show = {}
-        self._tmdb_movie_to_anidb = {}
-        self._tmdb_show_to_anidb = {}
-        self._imdb_to_anidb = {}
-        self._tvdb_to_anidb = {}
-        self._anidb_ids = self.requests.get_json(anime_lists_url)
-        for anidb_id, ids in self._anidb_ids.items():
+        self.graph = IDGraph()
+        self._anidb_ids = set()
+        for anidb_id, ids in self.requests.get_json(anime_lists_url).items():
             anidb_id = int(anidb_id)
+            self._anidb_ids.add(anidb_id)
             if "mal_id" in ids:
                 for mal_id in util.get_list(ids["mal_id"], int_list=True):
-                    self._mal_to_anidb[mal_id] = anidb_id
-                    if anidb_id not in self._anidb_to_mal:
-                        self._anidb_to_mal[anidb_id] = mal_id
+                    self.graph.add("anidb", anidb_id, "mal", mal_id, edge="anime")
             if "anilist_id" in ids:
                 for anilist_id in util.get_list(ids["anilist_id"], int_list=True):
-                    self._anilist_to_anidb[anilist_id] = anidb_id
+                    self.graph.add("anidb", anidb_id, "anilist", anilist_id, edge="anime")
             if "imdb_id" in ids and str(ids["imdb_id"]).startswith("tt"):
-                self._anidb_to_imdb[anidb_id] = util.get_list(ids["imdb_id"])
-                for im_id in self._anidb_to_imdb[anidb_id]:
-                    self._imdb_to_anidb[im_id] = anidb_id
+                for im_id in util.get_list(ids["imdb_id"]):
+                    self.graph.add("anidb", anidb_id, "imdb", im_id, edge="anime")
             if "tvdb_id" in ids:
-                self._anidb_to_tvdb[anidb_id] = int(ids["tvdb_id"])
+                self.graph.add("anidb", anidb_id, "tvdb", int(ids["tvdb_id"]), edge="anime", both=False)
                 if "tvdb_season" in ids and ids["tvdb_season"] in [1, -1] and ids["tvdb_epoffset"] == 0:
-                    self._tvdb_to_anidb[int(ids["tvdb_id"])] = anidb_id
+                    self.graph.add("tvdb", int(ids["tvdb_id"]), "anidb", anidb_id, edge="anime", both=False)
             if "tmdb_movie_id" in ids:
-                self._anidb_to_tmdb_movie[anidb_id] = util.get_list(ids["tmdb_movie_id"], int_list=True)
-                for tm_id in self._anidb_to_tmdb_movie[anidb_id]:
-                    self._tmdb_movie_to_anidb[tm_id] = anidb_id
+                for tm_id in util.get_list(ids["tmdb_movie_id"], int_list=True):
+                    self.graph.add("anidb", anidb_id, "tmdb", tm_id, edge="anime")
             if "tmdb_show_id" in ids:
-                self._anidb_to_tmdb_show[anidb_id] = util.get_list(ids["tmdb_show_id"], int_list=True)
-                for tm_id in self._anidb_to_tmdb_show[anidb_id]:
-                    self._tmdb_show_to_anidb[tm_id] = anidb_id
+                for tm_id in util.get_list(ids["tmdb_show_id"], int_list=True):
+                    self.graph.add("anidb", anidb_id, "tmdb_show", tm_id, edge="anime")
+        if self.cache:
+            self.graph.load(self.cache)
 
     def imdb_to_anidb(self, imdb_id):
-        if imdb_id in self._imdb_to_anidb:
-            return self._imdb_to_anidb[imdb_id]
+        anidb_id = self.graph.first("imdb", imdb_id, "anidb")
+        if anidb_id:
+            return anidb_id
         else:
             raise Failed(f"AniDB ID not found for IMDb ID: {imdb_id}")
 
     def tvdb_to_anidb(self, tvdb_id):
-        if int(tvdb_id) in self._tvdb_to_anidb:
-            return self._tvdb_to_anidb[int(tvdb_id)]
+        anidb_id = self.graph.first("tvdb", int(tvdb_id), "anidb")
+        if anidb_id:
+            return anidb_id
         else:
             raise Failed(f"AniDB ID not found for TVDb ID: {tvdb_id}")
 
     def ids_to_anidb(self, library, rating_key, tvdb_id, imdb_id, tmdb_id):
-        if rating_key in library.reverse_anidb:
-            return library.reverse_anidb[rating_key]
-        elif tvdb_id and int(tvdb_id) in self._tvdb_to_anidb:
-            return self._tvdb_to_anidb[int(tvdb_id)]
-        else:
-            tmdb_show_id = self.tvdb_to_tmdb(tvdb_id) if tvdb_id else None
-            if tmdb_show_id and int(tmdb_show_id) in self._tmdb_show_to_anidb:
-                return self._tmdb_show_to_anidb[int(tmdb_show_id)]
-            elif imdb_id in self._imdb_to_anidb:
-                return self._imdb_to_anidb[imdb_id]
-            elif tmdb_id and int(tmdb_id) in self._tmdb_movie_to_anidb:
-                return self._tmdb_movie_to_anidb[int(tmdb_id)]
-            else:
-                return None
+        anidb_ids = library.ids_from_rating_key(rating_key, "anidb")
+        if anidb_ids:
+            return anidb_ids[0]
+        anidb_id = self.graph.first("tvdb", int(tvdb_id), "anidb") if tvdb_id else None
+        if anidb_id:
+            return anidb_id
+        tmdb_show_id = self.tvdb_to_tmdb(tvdb_id) if tvdb_id else None
+        if tmdb_show_id:
+            anidb_id = self.graph.first("tmdb_show", int(tmdb_show_id), "anidb")
+        if not anidb_id and imdb_id:
+            anidb_id = self.graph.first("imdb", imdb_id, "anidb")
+        if not anidb_id and tmdb_id:
+            anidb_id = self.graph.first("tmdb", int(tmdb_id), "anidb")
+        return anidb_id
 
     def anidb_to_mal(self, anidb_id):
-        if anidb_id not in self._anidb_to_mal:
+        mal_id = self.graph.first("anidb", anidb_id, "mal")
+        if not mal_id:
             raise Failed(f"Convert Warning: No MyAnimeList Found for AniDB ID: {anidb_id}")
-        return self._anidb_to_mal[anidb_id]
+        return mal_id
 
     def anidb_to_ids(self, anidb_ids, library):
         ids = []
         anidb_list = anidb_ids if isinstance(anidb_ids, list) else [anidb_ids]
         for anidb_id in anidb_list:
-            if anidb_id in library.anidb_map:
-                ids.append((library.anidb_map[anidb_id], "ratingKey"))
-            elif anidb_id in self._anidb_to_imdb:
+            rating_keys = library.rating_keys_from_id("anidb", anidb_id)
+            anidb_imdb = self.graph.get("anidb", anidb_id, "imdb")
+            anidb_tvdb = self.graph.first("anidb", anidb_id, "tvdb")
+            anidb_tmdb_movie = self.graph.get("anidb", anidb_id, "tmdb")
+            anidb_tmdb_show = self.graph.get("anidb", anidb_id, "tmdb_show")
+            if rating_keys:
+                ids.extend([(rk, "ratingKey") for rk in rating_keys])
+            elif anidb_imdb:
                 added = False
-                for imdb in self._anidb_to_imdb[anidb_id]:
+                for imdb in anidb_imdb:
                     tmdb, tmdb_type = self.imdb_to_tmdb(imdb)
                     if tmdb and tmdb_type == "movie":
                         ids.append((tmdb, "tmdb"))
                         added = True
-                if added is False and anidb_id in self._anidb_to_tvdb:
-                    ids.append((self._anidb_to_tvdb[anidb_id], "tvdb"))
-            elif anidb_id in self._anidb_to_tmdb_movie:
-                added = False
-                for tmdb_id in self._anidb_to_tmdb_movie[anidb_id]:
-                    ids.append((tmdb_id, "tmdb"))
-                    added = True
-                if added is False and anidb_id in self._anidb_to_tvdb:
-                    ids.append((self._anidb_to_tvdb[anidb_id], "tvdb"))
-            elif anidb_id in self._anidb_to_tvdb:
-                ids.append((self._anidb_to_tvdb[anidb_id], "tvdb"))
-            elif anidb_id in self._anidb_to_tmdb_show:
-                for tmdb_id in self._anidb_to_tmdb_show[anidb_id]:
+                if added is False and anidb_tvdb:
+                    ids.append((anidb_tvdb, "tvdb"))
+            elif anidb_tmdb_movie:
+                ids.extend([(tmdb_id, "tmdb") for tmdb_id in anidb_tmdb_movie])
+            elif anidb_tvdb:
+                ids.append((anidb_tvdb, "tvdb"))
+            elif anidb_tmdb_show:
+                for tmdb_id in anidb_tmdb_show:
                     try:
                         ids.append((int(self.tmdb_to_tvdb(tmdb_id, fail=True)), "tvdb"))
                     except Failed:
                         pass
-            elif str(anidb_id) in self._anidb_ids:
+            elif anidb_id in self._anidb_ids:
                 logger.warning(f"Convert Warning: No TVDb ID or IMDb ID found for AniDB ID: {anidb_id}")
             else:
                 logger.error(f"AniDB Error: No Anime found for AniDB ID: {anidb_id}")
@@ -126,8 +118,9 @@ class Convert:
     def anilist_to_ids(self, anilist_ids, library):
         anidb_ids = []
         for anilist_id in anilist_ids:
-            if anilist_id in self._anilist_to_anidb:
-                anidb_ids.append(self._anilist_to_anidb[anilist_id])
+            anidb_id = self.graph.first("anilist", anilist_id, "anidb")
+            if anidb_id:
+                anidb_ids.append(anidb_id)
             else:
                 logger.warning(f"Convert Warning: No AniDB ID Found for AniList ID: {anilist_id}")
         return self.anidb_to_ids(anidb_ids, library)
@@ -135,24 +128,31 @@ class Convert:
     def myanimelist_to_ids(self, mal_ids, library):
         ids = []
         for mal_id in mal_ids:
-            if int(mal_id) in library.mal_map:
-                ids.append((library.mal_map[int(mal_id)], "ratingKey"))
-            elif int(mal_id) in self._mal_to_anidb:
-                ids.extend(self.anidb_to_ids(self._mal_to_anidb[int(mal_id)], library))
+            rating_keys = library.rating_keys_from_id("mal", int(mal_id))
+            anidb_id = self.graph.first("mal", int(mal_id), "anidb")
+            if rating_keys:
+                ids.extend([(rk, "ratingKey") for rk in rating_keys])
+            elif anidb_id:
+                ids.extend(self.anidb_to_ids(anidb_id, library))
             else:
                 logger.warning(f"Convert Warning: No AniDB ID Found for MyAnimeList ID: {mal_id}")
         return ids
 
     def tmdb_to_imdb(self, tmdb_id, is_movie=True, fail=False):
         media_type = "movie" if is_movie else "show"
+        imdb_id = self.graph.first(tmdb_media_types[media_type], tmdb_id, "imdb")
+        if imdb_id:
+            return imdb_id
         expired = False
         if self.cache and is_movie:
             cache_id, expired = self.cache.query_imdb_to_tmdb_map(tmdb_id, imdb=False, media_type=media_type)
             if cache_id and not expired:
+                self.graph.add(tmdb_media_types[media_type], tmdb_id, "imdb", cache_id)
                 return cache_id
         try:
             imdb_id = self.tmdb.convert_from(tmdb_id, "imdb_id", is_movie)
             if imdb_id:
+                self.graph.add(tmdb_media_types[media_type], tmdb_id, "imdb", imdb_id)
                 if self.cache:
                     self.cache.update_imdb_to_tmdb_map(media_type, expired, imdb_id, tmdb_id)
                 return imdb_id
@@ -164,14 +164,18 @@ class Convert:
             return None
 
     def imdb_to_tmdb(self, imdb_id, fail=False):
+        for tmdb_id, tmdb_type in self.graph.find("imdb", imdb_id, list(tmdb_media_types.values())):
+            return tmdb_id, reverse_tmdb_media_types[tmdb_type]
         expired = False
         if self.cache:
             cache_id, cache_type, expired = self.cache.query_imdb_to_tmdb_map(imdb_id, imdb=True, return_type=True)
             if cache_id and not expired:
+                self.graph.add("imdb", imdb_id, tmdb_media_types[cache_type], cache_id)
                 return cache_id, cache_type
         try:
             tmdb_id, tmdb_type = self.tmdb.convert_imdb_to(imdb_id)
             if tmdb_id:
+                self.graph.add("imdb", imdb_id, tmdb_media_types[tmdb_type], tmdb_id)
                 if self.cache:
                     self.cache.update_imdb_to_tmdb_map(tmdb_type, expired, imdb_id, tmdb_id)
                 return tmdb_id, tmdb_type
@@ -183,14 +187,19 @@ class Convert:
             return None, None
 
     def tmdb_to_tvdb(self, tmdb_id, fail=False):
+        tvdb_id = self.graph.first("tmdb_show", tmdb_id, "tvdb", edge="convert")
+        if tvdb_id:
+            return tvdb_id
         expired = False
         if self.cache:
             cache_id, expired = self.cache.query_tmdb_to_tvdb_map(tmdb_id, tmdb=True)
             if cache_id and not expired:
+                self.graph.add("tmdb_show", tmdb_id, "tvdb", cache_id)
                 return cache_id
         try:
             tvdb_id = self.tmdb.convert_from(tmdb_id, "tvdb_id", False)
             if tvdb_id:
+                self.graph.add("tmdb_show", tmdb_id, "tvdb", tvdb_id)
                 if self.cache:
                     self.cache.update_tmdb_to_tvdb_map(expired, tmdb_id, tvdb_id)
                 return tvdb_id
@@ -202,14 +211,19 @@ class Convert:
             return None
 
     def tvdb_to_tmdb(self, tvdb_id, fail=False):
+        tmdb_id = self.graph.first("tvdb", tvdb_id, "tmdb_show", edge="convert")
+        if tmdb_id:
+            return tmdb_id
         expired = False
         if self.cache:
             cache_id, expired = self.cache.query_tmdb_to_tvdb_map(tvdb_id, tmdb=False)
             if cache_id and not expired:
+                self.graph.add("tvdb", tvdb_id, "tmdb_show", cache_id)
                 return cache_id
         try:
             tmdb_id = self.tmdb.convert_tvdb_to(tvdb_id)
             if tmdb_id:
+                self.graph.add("tvdb", tvdb_id, "tmdb_show", tmdb_id)
                 if self.cache:
                     self.cache.update_tmdb_to_tvdb_map(expired, tmdb_id, tvdb_id)
                 return tmdb_id
@@ -221,14 +235,19 @@ class Convert:
             return None
 
     def tvdb_to_imdb(self, tvdb_id, fail=False):
+        imdb_id = self.graph.first("tvdb", tvdb_id, "imdb", edge="convert")
+        if imdb_id:
+            return imdb_id
         expired = False
         if self.cache:
             cache_id, expired = self.cache.query_imdb_to_tvdb_map(tvdb_id, imdb=False)
             if cache_id and not expired:
+                self.graph.add("imdb", cache_id, "tvdb", tvdb_id)
                 return cache_id
         try:
             imdb_id = self.tmdb_to_imdb(self.tvdb_to_tmdb(tvdb_id, fail=True), is_movie=False, fail=True)
             if imdb_id:
+                self.graph.add("imdb", imdb_id, "tvdb", tvdb_id)
                 if self.cache:
                     self.cache.update_imdb_to_tvdb_map(expired, imdb_id, tvdb_id)
                 return imdb_id
@@ -240,16 +259,21 @@ class Convert:
             return None
 
     def imdb_to_tvdb(self, imdb_id, fail=False):
+        tvdb_id = self.graph.first("imdb", imdb_id, "tvdb", edge="convert")
+        if tvdb_id:
+            return tvdb_id
         expired = False
         if self.cache:
             cache_id, expired = self.cache.query_imdb_to_tvdb_map(imdb_id, imdb=True)
             if cache_id and not expired:
+                self.graph.add("imdb", imdb_id, "tvdb", cache_id)
                 return cache_id
         try:
             tmdb_id, tmdb_type = self.imdb_to_tmdb(imdb_id, fail=True)
             if tmdb_type == "show":
                 tvdb_id = self.tmdb_to_tvdb(tmdb_id, fail=True)
                 if tvdb_id:
+                    self.graph.add("imdb", imdb_id, "tvdb", tvdb_id)
                     if self.cache:
                         self.cache.update_imdb_to_tvdb_map(expired, imdb_id, tvdb_id)
                     return tvdb_id
@@ -260,20 +284,36 @@ class Convert:
         else:
             return None
 
+    def query_guid(self, guid):
+        media_type = self.graph.first("guid", guid, "guid_type")
+        if media_type:
+            id_type = "tmdb" if "movie" in media_type else "tvdb"
+            return self.graph.get("guid", guid, id_type, edge="guid"), self.graph.get("guid", guid, "imdb", edge="guid"), media_type, False
+        if not self.cache:
+            return None, None, None, None
+        cache_ids, imdb_ids, media_type, expired = self.cache.query_guid_map(guid)
+        if (cache_ids or imdb_ids) and not expired:
+            self.add_guid(guid, cache_ids, imdb_ids, media_type)
+        return cache_ids, imdb_ids, media_type, expired
+
+    def add_guid(self, guid, cache_ids, imdb_ids, media_type):
+        id_type = "tmdb" if "movie" in media_type else "tvdb"
+        self.graph.add("guid", guid, "guid_type", media_type, edge="guid")
+        for cache_id in cache_ids or []:
+            self.graph.add("guid", guid, id_type, cache_id, edge="guid")
+        for imdb_id in imdb_ids or []:
+            self.graph.add("guid", guid, "imdb", imdb_id, edge="guid")
+
     def ids_from_cache(self, rating_key, guid, item_type, check_id, library):
         media_id_type = None
-        cache_id = None
-        imdb_check = None
-        expired = None
-        if self.cache:
-            cache_id, imdb_check, media_type, expired = self.cache.query_guid_map(guid)
-            if (cache_id or imdb_check) and not expired:
-                media_id_type = "movie" if "movie" in media_type else "show"
-                if item_type == "hama" and check_id.startswith("anidb"):
-                    anidb_id = int(re.search("-(.*)", check_id).group(1))
-                    library.anidb_map[anidb_id] = rating_key
-                elif item_type == "myanimelist":
-                    library.mal_map[int(check_id)] = rating_key
+        cache_id, imdb_check, media_type, expired = self.query_guid(guid)
+        if (cache_id or imdb_check) and not expired:
+            media_id_type = "movie" if "movie" in media_type else "show"
+            if item_type == "hama" and check_id.startswith("anidb"):
+                anidb_id = int(re.search("-(.*)", check_id).group(1))
+                library.map_id("anidb", anidb_id, rating_key)
+            elif item_type == "myanimelist":
+                library.map_id("mal", int(check_id), rating_key)
         return media_id_type, cache_id, imdb_check, expired
 
     def scan_guid(self, guid_str):
@@ -302,11 +342,11 @@ class Convert:
                         except ValueError:
                             pass
                 except ConnectionError:
-                    library.query(item.refresh)
+                    library.query(library.reload(item).refresh)
                     logger.stacktrace()
                     raise Failed("No External GUIDs found")
                 if not tvdb_id and not imdb_id and not tmdb_id:
-                    library.query(item.refresh)
+                    library.query(library.reload(item).refresh)
                     raise Failed("Refresh Metadata")
             elif item_type == "imdb":                       imdb_id.append(check_id)
             elif item_type == "thetvdb":                    tvdb_id.append(int(check_id))
@@ -327,31 +367,32 @@ class Convert:
                 elif check_id.startswith("anidb"):
                     anidb_str = str(re.search("-(.*)", check_id).group(1))
                     anidb_id = int(anidb_str[1:] if anidb_str[0] == "a" else anidb_str)
-                    library.anidb_map[anidb_id] = item.ratingKey
+                    library.map_id("anidb", anidb_id, item.ratingKey)
                 else:
                     raise Failed(f"Hama Agent ID: {check_id} not supported")
             elif item_type == "myanimelist":
-                library.mal_map[int(check_id)] = item.ratingKey
-                if int(check_id) in self._mal_to_anidb:
-                    anidb_id = self._mal_to_anidb[int(check_id)]
-                else:
+                library.map_id("mal", int(check_id), item.ratingKey)
+                anidb_id = self.graph.first("mal", int(check_id), "anidb")
+                if not anidb_id:
                     raise Failed(f"AniDB ID not found for MyAnimeList ID: {check_id}")
             elif item_type == "local":                      raise NonExisting("No match in Plex")
             else:                                           raise NonExisting(f"Agent {item_type} not supported")
 
             if anidb_id:
-                if anidb_id in self._anidb_to_imdb:
+                anidb_imdb = self.graph.get("anidb", anidb_id, "imdb")
+                anidb_tvdb = self.graph.first("anidb", anidb_id, "tvdb")
+                if anidb_imdb:
                     added = False
-                    for imdb in self._anidb_to_imdb[anidb_id]:
+                    for imdb in anidb_imdb:
                         tmdb, tmdb_type = self.imdb_to_tmdb(imdb)
                         if tmdb and tmdb_type == "movie":
                             imdb_id.append(imdb)
                             tmdb_id.append(int(tmdb))
                             added = True
-                    if added is False and anidb_id in self._anidb_to_tvdb:
-                        tvdb_id.append(int(self._anidb_to_tvdb[anidb_id]))
-                elif anidb_id in self._anidb_to_tvdb:
-                    tvdb_id.append(int(self._anidb_to_tvdb[anidb_id]))
+                    if added is False and anidb_tvdb:
+                        tvdb_id.append(int(anidb_tvdb))
+                elif anidb_tvdb:
+                    tvdb_id.append(int(anidb_tvdb))
                 else:
                     raise Failed(f"AniDB: {anidb_id} not found")
             else:
@@ -382,6 +423,7 @@ class Convert:
                         imdb_id.append(imdb)
 
             def update_cache(cache_ids, id_type, imdb_in, guid_type):
+                self.add_guid(item.guid, cache_ids, imdb_in, guid_type)
                 if self.cache:
                     cache_ids = ",".join([str(c) for c in cache_ids])
                     imdb_in = ",".join([str(i) for i in imdb_in]) if imdb_in else None
@@ -0,0 +1,79 @@
+from modules import util
+
+logger = util.logger
+
+edge_types = ["guid", "anime", "convert"]
+tmdb_media_types = {"movie": "tmdb", "show": "tmdb_show", "episode": "tmdb_episode"}
+one_way_types = ["guid_type"]
+
+class IDGraph:
+    def __init__(self):
+        self._types = {}
+        self._type_names = []
+        self._nodes = {}
+        self._keys = []
+        self._edges = []
+        self._edge_types = {e: i for i, e in enumerate(edge_types)}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _type(self, id_type):
+        if id_type not in self._types:
+            self._types[id_type] = len(self._type_names)
+            self._type_names.append(id_type)
+        return self._types[id_type]
+
+    def _node(self, id_type, _id, create=False):
+        if isinstance(_id, str) and _id.isdigit():
+            _id = int(_id)
+        key = (self._type(id_type), _id)
+        if key in self._nodes:
+            return self._nodes[key]
+        if create:
+            node = len(self._keys)
+            self._nodes[key] = node
+            self._keys.append(key)
+            self._edges.append({})
+            return node
+
+    def add(self, from_type, from_id, to_type, to_id, edge="convert", both=True):
+        if from_id is None or to_id is None:
+            return
+        from_node = self._node(from_type, from_id, create=True)
+        to_node = self._node(to_type, to_id, create=True)
+        if to_node not in self._edges[from_node]:
+            self._edges[from_node][to_node] = self._edge_types[edge]
+        if both and to_type not in one_way_types and from_node not in self._edges[to_node]:
+            self._edges[to_node][from_node] = self._edge_types[edge]
+
+    def has(self, id_type, _id):
+        node = self._node(id_type, _id)
+        return node is not None and len(self._edges[node]) > 0
+
+    def get(self, id_type, _id, to_type, edge=None):
+        return [v for v, _ in self.find(id_type, _id, [to_type], edge=edge)]
+
+    def first(self, id_type, _id, to_type, edge=None):
+        for v, _ in self.find(id_type, _id, [to_type], edge=edge):
+            return v
+
+    def find(self, id_type, _id, to_types, edge=None):
+        node = self._node(id_type, _id)
+        if node is None:
+            return []
+        type_ids = {self._types[t]: t for t in to_types if t in self._types}
+        edge_id = self._edge_types[edge] if edge else None
+        found = []
+        for neighbor, edge_type in self._edges[node].items():
+            type_id, value = self._keys[neighbor]
+            if type_id in type_ids and (edge_id is None or edge_id == edge_type):
+                found.append((value, type_ids[type_id]))
+        return found
+
+    def load(self, cache):
+        logger.info("")
+        logger.info("Loading ID Graph from cache")
+        for from_type, from_id, to_type, to_id, edge in cache.query_id_graph():
+            self.add(from_type, from_id, to_type, to_id, edge=edge)
+        logger.info(f"ID Graph loaded with {len(self)} IDs")
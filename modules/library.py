@@ -1,13 +1,65 @@
-import os, time
+import hashlib, json, os, time
 from abc import ABC, abstractmethod
+from collections import namedtuple
 from modules import util
+from modules.backups import BackupStore
 from modules.meta import MetadataFile, OverlayFile
 from modules.poster import ImageData
 from modules.util import Failed, NotScheduled
 from PIL import Image
+from plexapi.base import PlexPartialObject
 
 logger = util.logger
 
+GuidTag = namedtuple("GuidTag", ["id"])
+LabelTag = namedtuple("LabelTag", ["tag"])
+
+class ItemRecord:
+    __slots__ = ("_library", "ratingKey", "key", "guid", "guids", "title", "titleSort", "year", "type", "librarySectionID", "locations", "labels", "thumb", "updatedAt", "addedAt")
+
+    def __init__(self, item, library=None):
+        self._library = library
+        self.update(item)
+
+    def update(self, item):
+        auto_reload = item._autoReload
+        item._autoReload = False
+        try:
+            self.ratingKey = item.ratingKey
+            self.key = item.key
+            self.guid = item.guid
+            self.guids = tuple(GuidTag(g.id) for g in getattr(item, "guids", None) or ())
+            self.title = item.title
+            self.titleSort = getattr(item, "titleSort", None) or item.title
+            self.year = getattr(item, "year", None)
+            self.type = item.type
+            self.librarySectionID = item.librarySectionID
+            self.locations = tuple(getattr(item, "locations", None) or ())
+            self.labels = tuple(LabelTag(label.tag) for label in getattr(item, "labels", None) or ())
+            self.thumb = getattr(item, "thumb", None)
+            self.updatedAt = item.updatedAt
+            self.addedAt = item.addedAt
+        finally:
+            item._autoReload = auto_reload
+
+    def __eq__(self, other):
+        if isinstance(other, (ItemRecord, PlexPartialObject)):
+            return self.ratingKey == other.ratingKey
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.ratingKey)
+
+    def __repr__(self):
+        return f"<ItemRecord:{self.ratingKey}:{self.title}>"
+
+    def full(self):
+        return self._library.reload(self)
+
+    @property
+    def fingerprint(self):
+        return "|".join([str(self.guid), str(self.title), str(self.year), ",".join(self.locations), ",".join(sorted([la.tag for la in self.labels])), str(util.timestamp(self.updatedAt))])
+
 class Library(ABC):
     def __init__(self, config, params):
         self.session = None
@@ -29,13 +81,6 @@ class Library(ABC):
         self.metadata_files = []
         self.overlay_files = []
         self.images_files = []
-        self.movie_map = {}
-        self.show_map = {}
-        self.imdb_map = {}
-        self.anidb_map = {}
-        self.reverse_anidb = {}
-        self.mal_map = {}
-        self.reverse_mal = {}
         self.movie_rating_key_map = {}
         self.show_rating_key_map = {}
         self.imdb_rating_key_map = {}
@@ -45,6 +90,7 @@ class Library(ABC):
         self.config = config
         self.name = params["name"]
         self.original_mapping_name = params["mapping_name"]
+        self.rating_key_type = f"ratingKey:{self.original_mapping_name}"
         self.scanned_collection_files = params["collection_files"]
         self.scanned_metadata_files = params["metadata_files"]
         self.scanned_overlay_files = params["overlay_files"]
@@ -57,6 +103,7 @@ class Library(ABC):
         self.image_table_name = self.config.Cache.get_image_table_name(self.original_mapping_name) if self.config.Cache else None
         self.overlay_folder = os.path.join(self.config.default_dir, "overlays")
         self.overlay_backup = os.path.join(self.overlay_folder, f"{self.mapping_name} Original Posters")
+        self.overlay_rendered = os.path.join(self.overlay_folder, f"{self.mapping_name} Rendered Posters")
         self.report_path = params["report_path"] if params["report_path"] else os.path.join(self.default_dir, f"{self.mapping_name}_report.yml")
         self.report_data = {}
         self.run_order = params["run_order"]
@@ -72,6 +119,15 @@ class Library(ABC):
         self.default_collection_order = params["default_collection_order"]
         self.minimum_items = params["minimum_items"]
         self.item_refresh_delay = params["item_refresh_delay"]
+        self.incremental = params["incremental"]
+        self.incremental_reconcile = params["incremental_reconcile"]
+        self.incremental_hash = params["incremental_hash"]
+        self.incremental_keys = None
+        self.edited_keys = set()
+        self.operations_skipped = params["operations_skipped"]
+        self.overlays_skipped = params["overlays_skipped"]
+        self.operations_ran = False
+        self.overlays_ran = False
         self.delete_below_minimum = params["delete_below_minimum"]
         self.delete_not_scheduled = params["delete_not_scheduled"]
         self.missing_only_released = params["missing_only_released"]
@@ -88,6 +144,10 @@ class Library(ABC):
         self.ignore_imdb_ids = params["ignore_imdb_ids"]
         self.overlay_artwork_quality = params["overlay_artwork_quality"]
         self.overlay_artwork_filetype = params["overlay_artwork_filetype"]
+        self.overlay_backup_filetype = params["overlay_backup_filetype"]
+        self.overlay_backups = BackupStore(self)
+        self.overlay_workers = params["overlay_workers"]
+        self.save_rendered_artwork = params["save_rendered_artwork"]
         self.assets_for_all = params["assets_for_all"]
         self.assets_for_all_collections = params["assets_for_all_collections"]
         self.delete_collections = params["delete_collections"]
@@ -207,8 +267,9 @@ class Library(ABC):
                     _, image_compare, _ = self.config.Cache.query_image_map(item.ratingKey, self.image_table_name)
                 if not image_compare or str(poster.compare) != str(image_compare):
                     if overlay:
-                        self.reload(item, force=True)
+                        item = self.reload(item, force=True)
                         if overlay and "Overlay" in [la.tag for la in self.item_labels(item)]:
+                            self.clear_tags("label")
                             item.removeLabel("Overlay")
                     poster_uploaded = self._upload_image(item, poster)
                     logger.info(f"Metadata: {poster.attribute} updated {poster.message}")
@@ -258,6 +319,15 @@ class Library(ABC):
 
         return poster_uploaded, background_uploaded, logo_uploaded
 
+    def map_id(self, id_type, _id, rating_key):
+        self.config.Convert.graph.add(id_type, _id, self.rating_key_type, rating_key, edge="guid")
+
+    def rating_keys_from_id(self, id_type, _id):
+        return self.config.Convert.graph.get(id_type, _id, self.rating_key_type, edge="guid")
+
+    def ids_from_rating_key(self, rating_key, id_type):
+        return self.config.Convert.graph.get(self.rating_key_type, rating_key, id_type, edge="guid")
+
     def get_id_from_maps(self, key):
         key = int(key)
         if key in self.movie_rating_key_map:
@@ -324,10 +394,37 @@ class Library(ABC):
     def reload(self, item, force=False):
         pass
 
+    @abstractmethod
+    def reload_many(self, items, chunk_size=None, force=False):
+        pass
+
+    def mark_edited(self, items):
+        self.edited_keys.update([i.ratingKey for i in (items if isinstance(items, list) else [items]) if hasattr(i, "ratingKey")])
+
+    def prefetch(self, items, chunk_size=None):
+        items = items if isinstance(items, list) else [items]
+        chunk_size = chunk_size if chunk_size else self.page_size
+        for i in range(0, len(items), chunk_size):
+            chunk = items[i:i + chunk_size]
+            self.reload_many(chunk, chunk_size=chunk_size)
+            yield from chunk
+
     @abstractmethod
     def edit_tags(self, attr, obj, add_tags=None, remove_tags=None, sync_tags=None, do_print=True, locked=True, is_locked=None):
         pass
 
+    @abstractmethod
+    def clear_tags(self, attr):
+        pass
+
+    @abstractmethod
+    def tag_changes(self, key, obj, add_tags=None, remove_tags=None, sync_tags=None):
+        pass
+
+    @abstractmethod
+    def batch_edit(self, items, method, *args, **kwargs):
+        pass
+
     @abstractmethod
     def item_labels(self, item):
         pass
@@ -406,9 +503,57 @@ class Library(ABC):
         logger.info("")
         items = self.get_all()
         for item in items:
-            self.cached_items[item.ratingKey] = (item, False)
+            self.cached_items[item.ratingKey] = item
         return items
 
+    def get_incremental_hash(self):
+        files = []
+        for file in self.collection_files + self.metadata_files + self.images_files + self.overlay_files + self.config.playlist_files:
+            files.append([file.get_file_name(), file.temp_vars] + [getattr(file, attr, None) for attr in ["templates", "collections", "metadata", "overlays", "playlists"]])
+        data = json.loads(json.dumps([self.incremental_hash, self.config.data.get("settings"), files], default=str))
+        return hashlib.sha256(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def incremental_complete(self):
+        operations = self.operations_ran or not (self.library_operation or self.operations_skipped)
+        overlays = self.overlays_ran or not (self.overlay_files or self.remove_overlays or self.overlays_skipped)
+        return operations and overlays
+
+    def load_incremental(self):
+        self.incremental_keys = None
+        self.edited_keys = set()
+        if not self.incremental or not self.config.Cache:
+            return
+        updated_at, added_at, config_hash = self.config.Cache.query_library_watermark(self.original_mapping_name)
+        logger.info("")
+        if self.incremental_reconcile:
+            logger.info("Incremental Run: Full Reconcile Scheduled")
+        elif updated_at is None:
+            logger.info("Incremental Run: No Watermark Found, Running Full Library")
+        elif config_hash != self.get_incremental_hash():
+            logger.info("Incremental Run: Library Configuration Changed, Running Full Library")
+        else:
+            fingerprints = self.config.Cache.query_item_fingerprints(f"{self.image_table_name}_fingerprints")
+            self.incremental_keys = set()
+            for rating_key, record in self.cached_items.items():
+                if util.timestamp(record.updatedAt) > updated_at or util.timestamp(record.addedAt) > added_at or fingerprints.get(str(rating_key)) != record.fingerprint:
+                    self.incremental_keys.add(rating_key)
+            logger.info(f"Incremental Run: {len(self.incremental_keys)} of {len(self.cached_items)} Items Changed Since Last Run")
+
+    def save_incremental(self):
+        if not self.incremental or not self.config.Cache:
+            return
+        edited = {k for k in self.edited_keys if k in self.cached_items}
+        refresh = edited if self.incremental_keys is None else edited | self.incremental_keys
+        if refresh:
+            self.reload_many([self.cached_items[k] for k in refresh], force=True)
+        keys = self.cached_items if self.incremental_keys is None else refresh
+        self.config.Cache.update_item_fingerprints(f"{self.image_table_name}_fingerprints", {k: self.cached_items[k].fingerprint for k in keys}, replace=self.incremental_keys is None)
+        records = self.cached_items.values()
+        self.config.Cache.update_library_watermark(self.original_mapping_name,
+                                                   max([util.timestamp(r.updatedAt) for r in records], default=0),
+                                                   max([util.timestamp(r.addedAt) for r in records], default=0),
+                                                   self.get_incremental_hash())
+
     def map_guids(self, items):
         for i, item in enumerate(items, 1):
             if isinstance(item, tuple):
@@ -436,7 +581,8 @@ class Library(ABC):
                                     pass
                         else:
                             self.movie_rating_key_map[key] = main_id[0]
-                        util.add_dict_list(main_id, key, self.movie_map)
+                        for _id in main_id:
+                            self.map_id("tmdb", _id, key)
                     elif id_type == "show":
                         if len(main_id) > 1:
                             for _id in main_id:
@@ -448,15 +594,11 @@ class Library(ABC):
                                     pass
                         else:
                             self.show_rating_key_map[key] = main_id[0]
-                        util.add_dict_list(main_id, key, self.show_map)
+                        for _id in main_id:
+                            self.map_id("tvdb", _id, key)
                 if imdb_id:
                     self.imdb_rating_key_map[key] = imdb_id[0]
-                    util.add_dict_list(imdb_id, key, self.imdb_map)
-        self.reverse_anidb = {}
-        for k, v in self.anidb_map.items():
-            self.reverse_anidb[v] = k
-        self.reverse_mal = {}
-        for k, v in self.mal_map.items():
-            self.reverse_mal[v] = k
+                    for _id in imdb_id:
+                        self.map_id("imdb", _id, key)
         logger.info("")
         logger.info(f"Processed {len(items)} {self.type}s")
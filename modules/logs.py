@@ -1,4 +1,4 @@
-import io, logging, os, re, sys, traceback
+import io, logging, os, re, sys, threading, traceback
 from logging.handlers import RotatingFileHandler
 
 LOG_DIR = "logs"
@@ -57,6 +57,7 @@ class MyLogger:
         self.secrets = []
         self.spacing = 0
         self.playlists_log = os.path.join(self.playlists_dir, PLAYLISTS_LOG)
+        self._local = threading.local()
         if not os.path.exists(self.log_dir):
             os.makedirs(self.log_dir, exist_ok=True)
         self._logger = logging.getLogger(None if self.log_requests else self.logger_name)
@@ -233,11 +234,29 @@ class MyLogger:
             print(self._space(" "), end="\r")
             self.spacing = 0
 
+    def start_buffer(self):
+        self._local.buffer = []
+
+    def end_buffer(self):
+        buffer = getattr(self._local, "buffer", None)
+        self._local.buffer = None
+        return buffer if buffer else []
+
+    def replay(self, buffer):
+        for level, msg, args, exc_info, extra, caller in buffer:
+            self._log(level, msg, args, exc_info=exc_info, extra=extra, caller=caller)
+
     def secret(self, text):
         if text and str(text) not in self.secrets:
             self.secrets.append(str(text))
 
-    def _log(self, level, msg, args, exc_info=None, extra=None, stack_info=False, stacklevel=1):
+    def _log(self, level, msg, args, exc_info=None, extra=None, stack_info=False, stacklevel=1, caller=None):
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is not None:
+            if exc_info and not isinstance(exc_info, (BaseException, tuple)):
+                exc_info = sys.exc_info()
+            buffer.append((level, msg, args, exc_info, extra, self.findCaller(stack_info, stacklevel)))
+            return
         trace = level == TRACE
         log_only = False
         if trace:
@@ -248,7 +267,7 @@ class MyLogger:
             self.exorcise()
         if "\n" in msg:
             for i, line in enumerate(msg.split("\n")):
-                self._log(level, line, args, exc_info=exc_info, extra=extra, stack_info=stack_info, stacklevel=stacklevel)
+                self._log(level, line, args, exc_info=exc_info, extra=extra, stack_info=stack_info, stacklevel=stacklevel, caller=caller)
                 if i == 0:
                     self._formatter(log_only=True, space=True)
             log_only = True
@@ -261,9 +280,12 @@ class MyLogger:
             if "HTTPSConnectionPool" in msg:
                 msg = re.sub("HTTPSConnectionPool\\((.*?)\\)", "HTTPSConnectionPool(redacted)", msg)
             try:
-                if not _srcfile:
+                if caller:
+                    fn, lno, func, sinfo = caller
+                elif not _srcfile:
                     raise ValueError
-                fn, lno, func, sinfo = self.findCaller(stack_info, stacklevel)
+                else:
+                    fn, lno, func, sinfo = self.findCaller(stack_info, stacklevel)
             except ValueError:
                 fn, lno, func, sinfo = "(unknown file)", 0, "(unknown function)", None
             if exc_info:
@@ -1615,12 +1615,9 @@ class MetadataFile(DataFile):
                         id_type = "TMDb" if self.library.is_movie else "TVDb"
                     logger.info("")
                     logger.info(f"{id_type} ID Mapping: {mapping_id}")
-                    if self.library.is_movie and mapping_id in self.library.movie_map:
-                        item.extend([self.library.fetch_item(i) for i in self.library.movie_map[mapping_id]])
-                    elif self.library.is_show and mapping_id in self.library.show_map:
-                        item.extend([self.library.fetch_item(i) for i in self.library.show_map[mapping_id]])
-                    elif mapping_id in self.library.imdb_map:
-                        item.extend([self.library.fetch_item(i) for i in self.library.imdb_map[mapping_id]])
+                    rating_keys = self.library.rating_keys_from_id(id_type.lower(), mapping_id)
+                    if rating_keys:
+                        item.extend([self.library.fetch_item(i) for i in rating_keys])
                     else:
                         logger.error(f"{self.type_str} Error: {id_type} ID not mapped")
                         continue
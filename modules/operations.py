@@ -3,7 +3,6 @@ from datetime import datetime, timedelta, timezone
 from modules import plex, util, anidb
 from modules.util import Failed, LimitReached
 from plexapi.exceptions import NotFound
-from plexapi.video import Movie, Show
 
 logger = util.logger
 
@@ -115,6 +114,9 @@ class Operations:
                 logger.error("Asset Error: No Asset Directory for Assets For All")
 
             items = self.library.get_all()
+            if self.library.incremental_keys is not None:
+                items = [i for i in items if i.ratingKey in self.library.incremental_keys]
+                logger.info(f"Incremental Run: Processing {len(items)} Changed Items")
             total_items = len(items)
 
 
@@ -136,7 +138,7 @@ class Operations:
             ep_lock_edits = {}
             ep_unlock_edits = {}
 
-            for i, item in enumerate(items, 1):
+            for i, item in enumerate(self.library.prefetch(items), 1):
                 logger.info("")
                 logger.info(f"({i}/{total_items}) {item.title}")
                 try:
@@ -324,8 +326,9 @@ class Operations:
                         if anidb_id is None:
                             anidb_id = get_anidb_id()
                         mal_id = None
-                        if item.ratingKey in self.library.reverse_mal:
-                            mal_id = self.library.reverse_mal[item.ratingKey]
+                        mal_ids = self.library.ids_from_rating_key(item.ratingKey, "mal")
+                        if mal_ids:
+                            mal_id = mal_ids[0]
                         elif not anidb_id:
                             logger.warning(f"Convert Warning: No AniDB ID to Convert to MyAnimeList ID for Guid: {item.guid}")
                         else:
@@ -957,6 +960,7 @@ class Operations:
                         if len(item_edits) > 0:
                             logger.info(f"{item_edits[1:]}")
 
+            self.library.uploads.wait()
             logger.info("")
             logger.separator("Plex Updates", space=False, border=False)
             logger.info("")
@@ -979,6 +983,7 @@ class Operations:
                     for batch_num, batch_items in enumerate(_item_batches(update_items, batch_size), 1):
                         if num_batches > 1:
                             logger.info(f"    Processing Batch {batch_num}/{num_batches} {len(batch_items)} {item_type_name}")
+                        self.library.mark_edited(batch_items)
                         self.library.Plex.batchMultiEdits(batch_items)
                         if display_attr == "addedAt":
                             update_date = datetime.strptime(update_value, "%Y-%m-%d")
@@ -995,6 +1000,7 @@ class Operations:
                             else:
                                 self.library.Plex._edit(**{f"{update_value}.locked": 1 if out_type == "lock" else 0})
                         elif tag_type is not None:
+                            self.library.clear_tags(display_attr)
                             self.library.Plex.editTags(display_attr, update_value, remove=tag_type == "remove")
                         else:
                             self.library.Plex.editField(display_attr, update_value)
@@ -1169,7 +1175,7 @@ class Operations:
             year_titles = []
             for item in items:
                 titles.append(item.title)
-                if isinstance(item, (Movie, Show)):
+                if item.type in ["movie", "show"]:
                     year_titles.append(f"{item.title} ({item.year})")
             for i, item in enumerate(items, 1):
                 logger.ghost(f"({i}/{total_items}) {item.title}")
@@ -1194,6 +1200,7 @@ class Operations:
             yaml.save()
             logger.info(f"{len(yaml.data['metadata'])} {self.library.type}{'s' if len(yaml.data['metadata']) > 1 else ''} Backed Up")
 
+        self.library.operations_ran = True
         operation_run_time = str(datetime.now() - operation_start).split('.')[0]
         logger.info("")
         logger.separator(f"Finished {self.library.name} Library Operations\nOperations Run Time: {operation_run_time}")
@@ -1,8 +1,9 @@
-import os, re, time
+import math, os, re, time
 from datetime import datetime
 from modules import util
+from modules.poster import get_font, kometa_fonts, text_bbox
 from modules.util import Failed
-from PIL import Image, ImageColor, ImageDraw, ImageFont
+from PIL import Image, ImageColor, ImageDraw
 from plexapi.audio import Album
 from plexapi.video import Episode
 
@@ -118,6 +119,7 @@ class Overlay:
         self.path = None
         self.font = None
         self.font_name = None
+        self.font_style = None
         self.font_size = 36
         self.font_color = None
         self.stroke_color = None
@@ -127,6 +129,7 @@ class Overlay:
         self.back_width = None
         self.back_height = None
         self.special_text = None
+        self.layers = {}
 
         logger.debug("")
         logger.debug("Validating Method: overlay")
@@ -290,19 +293,19 @@ class Overlay:
                 if not os.path.exists(font) and os.path.exists(os.path.join(code_base, font)):
                     font = os.path.join(code_base, font)
                 if not os.path.exists(font):
-                    kometa_fonts = os.listdir(font_base)
-                    fonts = util.get_system_fonts() + kometa_fonts
+                    fonts = util.get_system_fonts() + list(kometa_fonts(font_base))
                     if font not in fonts:
                         raise Failed(f"Overlay Error: font: {os.path.abspath(font)} not found. Options: {', '.join(fonts)}")
-                    if font in kometa_fonts:
+                    if font in kometa_fonts(font_base):
                         font = os.path.join(font_base, font)
                 self.font_name = font
-            self.font = ImageFont.truetype(self.font_name, self.font_size)
+            self.font = get_font(self.font_name, self.font_size)
             if "font_style" in self.data and self.data["font_style"]:
                 try:
                     variation_names = [n.decode("utf-8") for n in self.font.get_variation_names()]
                     if self.data["font_style"] in variation_names:
-                        self.font.set_variation_by_name(self.data["font_style"])
+                        self.font_style = self.data["font_style"]
+                        self.font = get_font(self.font_name, self.font_size, self.font_style)
                     else:
                         raise Failed(f"Overlay Error: Font Style {self.data['font_style']} not found. Options: {','.join(variation_names)}")
                 except OSError:
@@ -371,6 +374,17 @@ class Overlay:
             except OSError:
                 raise Failed(f"Overlay Error: overlay image {self.path} failed to load")
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for attr in ["config", "requests", "cache", "library", "overlay_file", "data", "font"]:
+            state.pop(attr, None)
+        state["layers"] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.font = get_font(self.font_name, self.font_size, self.font_style) if self.font_name else None
+
     def get_backdrop(self, canvas_box, box=None, text=None, new_cords=None):
         overlay_image = None
         text_width = None
@@ -393,9 +407,10 @@ class Overlay:
         start_x, start_y = self.get_coordinates(canvas_box, box, new_cords=new_cords)
         main_x = start_x
         main_y = start_y
+        layer_offset = (0, 0)
         if text is not None or self.has_back:
-            overlay_image = Image.new("RGBA", canvas_box, (255, 255, 255, 0))
-            drawing = ImageDraw.Draw(overlay_image)
+            regions = []
+            cords = None
             if self.has_back:
                 cords = (
                     start_x - self.back_padding,
@@ -403,10 +418,7 @@ class Overlay:
                     start_x + (back_width if self.back_box else box_width) + self.back_padding,
                     start_y + (back_height if self.back_box else box_height) + self.back_padding
                 )
-                if self.back_radius:
-                    drawing.rounded_rectangle(cords, fill=self.back_color, outline=self.back_line_color, width=self.back_line_width, radius=self.back_radius)
-                else:
-                    drawing.rectangle(cords, fill=self.back_color, outline=self.back_line_color, width=self.back_line_width)
+                regions.append(cords)
 
             if self.back_box:
                 if self.back_align in ["left", "right", "center", "bottom"]:
@@ -437,13 +449,32 @@ class Overlay:
                 elif text_height > image_height:
                     addon_y = main_y + ((text_height - image_height) / 2)
 
+            text_cords = None
             if text is not None:
-                drawing.text((int(main_x), int(main_y)), text, font=self.font, fill=self.font_color,
-                             stroke_fill=self.stroke_color, stroke_width=self.stroke_width, anchor="lt")
+                text_cords = (int(main_x), int(main_y))
+                regions.append(self.get_text_size(text, xy=text_cords, stroke=True))
+
+            left = max(0, math.floor(min(r[0] for r in regions)) - 1)
+            top = max(0, math.floor(min(r[1] for r in regions)) - 1)
+            right = min(canvas_box[0], math.ceil(max(r[2] for r in regions)) + 2)
+            bottom = min(canvas_box[1], math.ceil(max(r[3] for r in regions)) + 2)
+            if right > left and bottom > top:
+                overlay_image = Image.new("RGBA", (right - left, bottom - top), (255, 255, 255, 0))
+                layer_offset = (left, top)
+                drawing = ImageDraw.Draw(overlay_image)
+                if cords:
+                    cords = (cords[0] - left, cords[1] - top, cords[2] - left, cords[3] - top)
+                    if self.back_radius:
+                        drawing.rounded_rectangle(cords, fill=self.back_color, outline=self.back_line_color, width=self.back_line_width, radius=self.back_radius)
+                    else:
+                        drawing.rectangle(cords, fill=self.back_color, outline=self.back_line_color, width=self.back_line_width)
+                if text_cords:
+                    drawing.text((text_cords[0] - left, text_cords[1] - top), text, font=self.font, fill=self.font_color,
+                                 stroke_fill=self.stroke_color, stroke_width=self.stroke_width, anchor="lt")
             if addon_x is not None:
                 main_x = addon_x
                 main_y = addon_y
-        return overlay_image, (int(main_x), int(main_y))
+        return overlay_image, (int(main_x), int(main_y)), layer_offset
 
     def get_overlay_compare(self):
         output = f"{self.name}"
@@ -466,8 +497,9 @@ class Overlay:
     def has_coordinates(self):
         return self.horizontal_offset is not None and self.vertical_offset is not None
 
-    def get_text_size(self, text):
-        return ImageDraw.Draw(Image.new("RGBA", (0, 0))).textbbox((0, 0), text, font=self.font, anchor='lt')
+    def get_text_size(self, text, xy=(0, 0), stroke=False):
+        left, top, right, bottom = text_bbox(self.font_name, self.font_size, self.font_style, text, stroke_width=self.stroke_width if stroke else 0)
+        return left + xy[0], top + xy[1], right + xy[0], bottom + xy[1]
 
     def get_coordinates(self, canvas_box, box, new_cords=None):
         if new_cords is None and not self.has_coordinates():
@@ -493,11 +525,15 @@ class Overlay:
 
         return get_cord(ho, canvas_box[0], box[0], ha), get_cord(vo, canvas_box[1], box[1], va)
 
-    def get_canvas(self, item):
-        if isinstance(item, Episode):
-            canvas_size = landscape_dim
-        elif isinstance(item, Album):
-            canvas_size = square_dim
-        else:
-            canvas_size = portrait_dim
-        return self.get_backdrop(canvas_size, box=self.backdrop_box, text=self.backdrop_text)
+    def get_scaled(self, canvas_size):
+        key = (canvas_size, "scaled")
+        if key not in self.layers:
+            self.layers[key] = self.image if self.image.size == canvas_size else self.image.resize(canvas_size, Image.Resampling.LANCZOS)
+        return self.layers[key]
+
+    def get_canvas(self, canvas_size, new_cords=None):
+        key = (canvas_size, tuple(new_cords) if new_cords else None)
+        if key not in self.layers:
+            box = self.backdrop_box if self.backdrop_box or not self.image else self.image.size
+            self.layers[key] = self.get_backdrop(canvas_size, box=box, text=self.backdrop_text, new_cords=new_cords)
+        return self.layers[key]
@@ -1,4 +1,7 @@
-import os, re
+import hashlib, io, os, re, threading, time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
 from datetime import datetime
 from modules import plex, util, overlay
 from modules.builder import CollectionBuilder
@@ -10,12 +13,92 @@ from PIL import Image, ImageFilter
 
 logger = util.logger
 
+fingerprint_skip_vars = ["bitrate", "versions", "total_runtime"] + overlay.rating_sources
+
+_render_properties = None
+
+def init_render_worker(properties):
+    global _render_properties
+    _render_properties = properties
+
+def render_overlay(job, properties=None):
+    properties = properties if properties is not None else _render_properties
+    canvas_width, canvas_height = job["canvas"]
+    with Image.open(job["source"]) as new_poster:
+        exif_tags = new_poster.getexif()
+        exif_tags[0x04bc] = "overlay"
+        new_poster.draft("RGB", (canvas_width, canvas_height))
+        new_poster = new_poster.convert("RGB")
+        if new_poster.size != (canvas_width, canvas_height):
+            new_poster = new_poster.resize((canvas_width, canvas_height), Image.Resampling.LANCZOS)
+
+    if job["blur"] > 0:
+        new_poster = new_poster.filter(ImageFilter.GaussianBlur(job["blur"]))
+
+    def paste(layer, box):
+        if layer is not None:
+            new_poster.paste(layer, box, layer)
+
+    for over_name, text in job["applied"]:
+        current_overlay = properties[over_name]
+        if current_overlay.name.startswith("text"):
+            if text is not None:
+                image_box = current_overlay.image.size if current_overlay.image else None
+                overlay_image, addon_box, layer_box = current_overlay.get_backdrop((canvas_width, canvas_height), box=image_box, text=text)
+            else:
+                overlay_image, addon_box, layer_box = current_overlay.get_canvas((canvas_width, canvas_height))
+            paste(overlay_image, layer_box)
+            if current_overlay.image:
+                paste(current_overlay.image, addon_box)
+        elif current_overlay.name == "backdrop":
+            overlay_image, _, layer_box = current_overlay.get_canvas((canvas_width, canvas_height))
+            paste(overlay_image, layer_box)
+        else:
+            if current_overlay.has_coordinates():
+                overlay_image, overlay_box, layer_box = current_overlay.get_canvas((canvas_width, canvas_height))
+                paste(overlay_image, layer_box)
+                paste(current_overlay.image, overlay_box)
+            else:
+                paste(current_overlay.get_scaled((canvas_width, canvas_height)), (0, 0))
+
+    for over_name, text, cord in job["queued"]:
+        current_overlay = properties[over_name]
+        if current_overlay.name.startswith("text"):
+            image_box = current_overlay.image.size if current_overlay.image else None
+            overlay_image, addon_box, layer_box = current_overlay.get_backdrop((canvas_width, canvas_height), box=image_box, text=text, new_cords=cord)
+            paste(overlay_image, layer_box)
+            if current_overlay.image:
+                paste(current_overlay.image, addon_box)
+        else:
+            if current_overlay.has_back:
+                overlay_image, overlay_box, layer_box = current_overlay.get_canvas((canvas_width, canvas_height), new_cords=cord)
+                paste(overlay_image, layer_box)
+            else:
+                overlay_box = current_overlay.get_coordinates((canvas_width, canvas_height), box=current_overlay.image.size, new_cords=cord)
+            paste(current_overlay.image, overlay_box)
+
+    buffer = io.BytesIO()
+    image_format = "JPEG" if job["filetype"] == "jpg" else "WEBP" if job["filetype"].startswith("webp") else "PNG"
+    if job["quality"] and job["filetype"] in ["jpg", "webp_lossy"]:
+        new_poster.save(buffer, format=image_format, exif=exif_tags, quality=job["quality"])
+    elif job["filetype"] == "webp_lossless":
+        new_poster.save(buffer, format=image_format, exif=exif_tags, lossless=True)
+    else:
+        new_poster.save(buffer, format=image_format, exif=exif_tags)
+    data = buffer.getvalue()
+    if job["debug"]:
+        with open(job["debug"], "wb") as f:
+            f.write(data)
+    return data
+
 class Overlays:
     def __init__(self, config, library):
         self.config = config
         self.cache = self.config.Cache
         self.library = library
         self.overlays = []
+        self.ratings = {}
+        self.ratings_lock = threading.Lock()
 
     def run_overlays(self):
         overlay_start = datetime.now()
@@ -23,6 +106,9 @@ class Overlays:
         logger.separator(f"{self.library.name} Library Overlays")
         logger.info("")
         os.makedirs(self.library.overlay_backup, exist_ok=True)
+        self.library.overlay_backups.load()
+        if self.library.save_rendered_artwork:
+            os.makedirs(self.library.overlay_rendered, exist_ok=True)
 
         key_to_overlays = {}
         properties = {}
@@ -60,11 +146,7 @@ class Overlays:
             for i, item in enumerate(remove_overlays, 1):
                 item_title = self.library.get_item_display_title(item)
                 logger.ghost(f"Restoring: {i}/{len(remove_overlays)} {item_title}")
-                self.remove_overlay(item, item_title, "Overlay", [
-                    os.path.join(self.library.overlay_backup, f"{item.ratingKey}.png"),
-                    os.path.join(self.library.overlay_backup, f"{item.ratingKey}.jpg"),
-                    os.path.join(self.library.overlay_backup, f"{item.ratingKey}.webp")
-                ])
+                self.remove_overlay(item, item_title, "Overlay")
             logger.exorcise()
         else:
             logger.separator(f"No Overlays to Remove for the {self.library.name} Library")
@@ -73,501 +155,656 @@ class Overlays:
             logger.separator(f"{'Re-' if self.library.reapply_overlays else ''}Applying Overlays for the {self.library.name} Library")
             logger.info("")
 
+            trakt_lock = threading.Lock()
             _trakt_ratings = None
             def trakt_ratings():
                 nonlocal _trakt_ratings
-                if _trakt_ratings is None:
-                    _trakt_ratings = self.config.Trakt.user_ratings(self.library.is_movie)
+                with trakt_lock:
+                    if _trakt_ratings is None:
+                        _trakt_ratings = self.config.Trakt.user_ratings(self.library.is_movie)
                 if not _trakt_ratings:
                     raise Failed
                 return _trakt_ratings
 
-            total_keys = len(key_to_overlays)
-            for i, (over_key, (item, over_names)) in enumerate(sorted(key_to_overlays.items(), key=lambda io: self.library.get_item_display_title(io[1][0], sort=True)), 1):
-                item_title = self.library.get_item_display_title(item)
+            unchanged = self.skip_unchanged(key_to_overlays, properties)
+            if unchanged:
+                logger.info(f"Overlays Unchanged Since Last Run: {len(unchanged)} Items Skipped")
+                logger.info("")
+
+            with self.ratings_lock:
+                self.ratings.clear()
 
+            total_keys = len(key_to_overlays)
+            sorted_keys = sorted(key_to_overlays.items(), key=lambda io: self.library.get_item_display_title(io[1][0], sort=True))
+            render_start = time.perf_counter()
+            rendered = 0
+            pending = deque()
+
+            def finish():
+                nonlocal rendered
+                buffer, item, item_title, over_names, compare_names, poster_compare, future = pending.popleft()
+                logger.replay(buffer)
+                if future is None:
+                    return
                 try:
+                    data = future.result()
+                except (OSError, SyntaxError, Failed) as e:
+                    logger.error(f"  Overlay Error: {e}\n  Overlays Attempted on {item_title}: {', '.join(over_names)}")
+                    return
+                except Exception as e:
+                    logger.error(f"  Overlay Error: {type(e).__name__}: {e}\n  Overlays Attempted on {item_title}: {', '.join(over_names)}")
+                    return
+                rendered += 1
+                logger.info(f"  Overlays Applied: {', '.join(over_names)}")
+                self.library.uploads.submit(self.upload_overlay, item, item_title, data, poster_compare, compare_names, over_names)
+
+            render_workers = self.library.overlay_workers
+            logger.debug(f"Overlay Workers: {render_workers}")
+            with ThreadPoolExecutor(max_workers=self.library.page_workers) as fetch_pool, \
+                    ThreadPoolExecutor(max_workers=self.library.page_workers) as rating_pool, \
+                    (ProcessPoolExecutor(max_workers=render_workers, initializer=init_render_worker, initargs=(properties,)) if render_workers > 1 else nullcontext()) as render_pool:
+                self.rating_pool = rating_pool
+                prepare_limit = self.library.page_workers * 2
+                to_prepare = iter(enumerate(sorted_keys, 1))
+                prepared = deque()
+
+                def prepare_next():
+                    while len(prepared) < prepare_limit:
+                        entry = next(to_prepare, None)
+                        if entry is None:
+                            return
+                        n, (_, (next_item, next_names)) = entry
+                        prepared.append(fetch_pool.submit(self.prepare_overlay, n, total_keys, next_item, next_names, properties, trakt_ratings))
+
+                prepare_next()
+                i = 0
+                while prepared:
+                    buffer, item, item_title, over_names, compare_names, poster_compare, job = prepared.popleft().result()
+                    prepare_next()
+                    i += 1
                     logger.ghost(f"Overlaying: ({i}/{total_keys}) {item_title}")
-                    image_compare = None
-                    overlay_compare = None
-                    poster = None
-                    if self.cache:
-                        image, image_compare, overlay_compare = self.cache.query_image_map(item.ratingKey, f"{self.library.image_table_name}_overlays")
-                    self.library.reload(item, force=True)
-
-                    overlay_compare = [] if overlay_compare is None else util.get_list(overlay_compare, split="|")
-                    has_overlay = any([item_tag.tag.lower() == "overlay" for item_tag in self.library.item_labels(item)])
-
-                    compare_names = {properties[ov].get_overlay_compare(): ov for ov in over_names}
-                    blur_num = 0
-                    applied_names = []
-                    queue_overlays = {}
-                    for over_name in over_names:
-                        current_overlay = properties[over_name]
-                        if current_overlay.name.startswith("blur"):
-                            logger.info(over_name)
-                            blur_test = int(re.search("\\(([^)]+)\\)", current_overlay.name).group(1))
-                            if blur_test > blur_num:
-                                blur_num = blur_test
-                        elif current_overlay.queue_name:
-                            if current_overlay.queue not in queue_overlays:
-                                queue_overlays[current_overlay.queue] = {}
-                            if current_overlay.weight in queue_overlays[current_overlay.queue]:
-                                raise Failed("Overlay Error: Overlays in a queue cannot have the same weight")
-                            queue_overlays[current_overlay.queue][current_overlay.weight] = over_name
-                        else:
-                            applied_names.append(over_name)
-
-                    overlay_change = "" if has_overlay else "No Overlay Label"
-                    if not overlay_change:
-                        for oc in overlay_compare:
-                            if oc not in compare_names:
-                                overlay_change = f"{oc} not in {compare_names}"
-
-                    if not overlay_change:
-                        for compare_name, original_name in compare_names.items():
-                            if compare_name not in overlay_compare or properties[original_name].updated:
-                                overlay_change = f"{compare_name} not in {overlay_compare} or {properties[original_name].updated}"
-
-                    if self.cache:
-                        for over_name in over_names:
-                            if properties[over_name].name.startswith("text"):
-                                for cache_key, cache_value in self.cache.query_overlay_special_text(item.ratingKey).items():
-                                    actual = plex.attribute_translation[cache_key] if cache_key in plex.attribute_translation else cache_key
-                                    if actual == "total_runtime":
-                                        sub_items = item.episodes() if current_overlay.level in ["show", "season"] else item.tracks()
-                                        sub_items = [ep.duration for ep in sub_items if hasattr(ep, "duration") and ep.duration]
-                                        real_value = sum(sub_items)
-                                    else:
-                                        if not hasattr(item, actual):
-                                            continue
-                                        real_value = getattr(item, actual)
-                                    if cache_value is None or real_value is None:
-                                        continue
-                                    if cache_key in overlay.float_vars:
-                                        cache_value = float(cache_value)
-                                    if cache_key in overlay.int_vars:
-                                        cache_value = int(cache_value)
-                                    if cache_key in overlay.date_vars:
-                                        real_value = real_value.strftime("%Y-%m-%d") # noqa
-                                    if real_value != cache_value:
-                                        overlay_change = f"Special Text Changed from {cache_value} to {real_value}"
-                    try:
-                        poster, background, _, item_dir, name = self.library.find_item_assets(item)
-                        if not poster and self.library.assets_for_all:
-                            if (isinstance(item, Episode) and self.library.show_missing_episode_assets) or \
-                                    (isinstance(item, Season) and self.library.show_missing_season_assets) or \
-                                    (not isinstance(item, (Episode, Season)) and self.library.show_missing_assets):
-                                if self.library.asset_folders:
-                                    logger.warning(f"Asset Warning: No poster found for '{item_title}' in the assets folder '{item_dir}'")
-                                else:
-                                    logger.warning(f"Asset Warning: No poster '{name}' found in the assets folders")
-                        if background:
-                            self.library.upload_images(item, background=background)
-                    except Failed as e:
-                        if self.library.assets_for_all and self.library.show_missing_assets:
-                            logger.warning(e)
-
-                    has_original = None
-                    new_backup = None
-                    changed_image = False
-                    if poster:
-                        if image_compare and str(poster.compare) != str(image_compare):
-                            changed_image = True
-                        if os.path.exists(os.path.join(self.library.overlay_backup, f"{item.ratingKey}.png")):
-                            os.remove(os.path.join(self.library.overlay_backup, f"{item.ratingKey}.png"))
-                        if os.path.exists(os.path.join(self.library.overlay_backup, f"{item.ratingKey}.jpg")):
-                            os.remove(os.path.join(self.library.overlay_backup, f"{item.ratingKey}.jpg"))
-                        if os.path.exists(os.path.join(self.library.overlay_backup, f"{item.ratingKey}.webp")):
-                            os.remove(os.path.join(self.library.overlay_backup, f"{item.ratingKey}.webp"))
-                    elif has_overlay:
-                        if os.path.exists(os.path.join(self.library.overlay_backup, f"{item.ratingKey}.png")):
-                            has_original = os.path.join(self.library.overlay_backup, f"{item.ratingKey}.png")
-                        elif os.path.exists(os.path.join(self.library.overlay_backup, f"{item.ratingKey}.jpg")):
-                            has_original = os.path.join(self.library.overlay_backup, f"{item.ratingKey}.jpg")
-                        elif os.path.exists(os.path.join(self.library.overlay_backup, f"{item.ratingKey}.webp")):
-                            has_original = os.path.join(self.library.overlay_backup, f"{item.ratingKey}.webp")
-                        if self.library.reset_overlays:
-                            reset_list = self.library.reset_overlays
-                        elif has_original is None and not self.library.reset_overlays:
-                            reset_list = ["plex", "tmdb"]
+                    future = None
+                    if job:
+                        if render_pool:
+                            future = render_pool.submit(render_overlay, job)
                         else:
-                            reset_list = []
-                        try:
-                            new_backup = self.library.item_posters(item, providers=reset_list)
-                        except Failed as e:
-                            if any(r in reset_list for r in ["plex", "tmdb"]):
-                                logger.error(e)
-                    else:
-                        new_backup = item.posterUrl
-                    logger.info("")
-                    logger.info(f"({i}/{len(key_to_overlays)}) {item_title}")
-                    if new_backup:
-                        try:
-                            has_original = self.library.check_image_for_overlay(new_backup, os.path.join(self.library.overlay_backup, f"{item.ratingKey}"))
-                        except Failed as e:
-                            raise Failed(f"  Overlay Error: {e}")
-                    poster_compare = None
-                    if poster is None and has_original is None:
-                        logger.error(f"  Overlay Error: No poster found")
-                    elif self.library.reapply_overlays or new_backup or overlay_change or changed_image:
-                        try:
-                            if not self.library.reapply_overlays and new_backup:
-                                logger.trace("  Overlay Reason: New image detected")
-                            elif not self.library.reapply_overlays and overlay_change:
-                                logger.trace(f"  Overlay Reason: Overlay changed {overlay_change}")
-                            canvas_width, canvas_height = overlay.get_canvas_size(item)
-                            with Image.open(poster.location if poster else has_original) as new_poster:
-                                exif_tags = new_poster.getexif()
-                                exif_tags[0x04bc] = "overlay"
-                                new_poster = new_poster.convert("RGB").resize((canvas_width, canvas_height), Image.Resampling.LANCZOS)
-
-                                if blur_num > 0:
-                                    new_poster = new_poster.filter(ImageFilter.GaussianBlur(blur_num))
-
-                                def get_text(text_overlay):
-                                    full_text = text_overlay.name[5:-1]
-                                    for format_var in overlay.vars_by_type[text_overlay.level]:
-                                        if f"<<{format_var}" in full_text and format_var == "originally_available[":
-                                            mod = re.search("<<originally_available\\[(.+)]>>", full_text).group(1)
-                                            format_var = "originally_available"
-                                        elif f"<<{format_var}>>" in full_text and format_var.endswith(tuple(m for m in overlay.double_mods)):
-                                            mod = format_var[-2:]
-                                            format_var = format_var[:-2]
-                                        elif f"<<{format_var}>>" in full_text and format_var.endswith(tuple(m for m in overlay.single_mods)):
-                                            mod = format_var[-1]
-                                            format_var = format_var[:-1]
-                                        elif f"<<{format_var}>>" in full_text:
-                                            mod = ""
-                                        else:
-                                            continue
-                                        if format_var == "show_title":
-                                            actual_attr = "parentTitle" if text_overlay.level == "season" else "grandparentTitle"
-                                        elif format_var in plex.attribute_translation:
-                                            actual_attr = plex.attribute_translation[format_var]
-                                        else:
-                                            actual_attr = format_var
-                                        if format_var == "bitrate":
-                                            actual_value = None
-                                            for media in item.media:
-                                                current = int(media.bitrate)
-                                                if actual_value is None:
-                                                    actual_value = current
-                                                    if mod == "":
-                                                        break
-                                                elif mod == "H" and current > actual_value:
-                                                    actual_value = current
-                                                elif mod == "L" and current < actual_value:
-                                                    actual_value = current
-                                        elif format_var in overlay.rating_sources:
-                                            found_rating = None
-                                            try:
-                                                item_to_id = item.show() if isinstance(item, (Season, Episode)) else item
-                                                tmdb_id, tvdb_id, imdb_id = self.library.get_ids(item_to_id)
-                                                if format_var == "tmdb_rating":
-                                                    _item = self.config.TMDb.get_item(item_to_id, tmdb_id, tvdb_id, imdb_id, is_movie=self.library.is_movie)
-                                                    if _item:
-                                                        if isinstance(item, Episode):
-                                                            found_rating = self.config.TMDb.get_episode(_item.tmdb_id, item.seasonNumber, item.episodeNumber).vote_average
-                                                        elif isinstance(item, Season):
-                                                            for season in _item.seasons:
-                                                                if item.seasonNumber == season.season_number:
-                                                                    found_rating = season.average
-                                                                    break
-                                                        else:
-                                                            found_rating = _item.vote_average
-                                                    else:
-                                                        raise Failed(f"No TMDb ID for Guid: {item.guid}")
-                                                elif format_var == "imdb_rating":
-                                                    if isinstance(item, Episode):
-                                                        found_rating = self.config.IMDb.get_episode_rating(imdb_id, item.seasonNumber, item.episodeNumber)
-                                                    else:
-                                                        found_rating = self.config.IMDb.get_rating(imdb_id)
-                                                elif format_var == "trakt_user_rating":
-                                                    _ratings = trakt_ratings()
-                                                    _id = tmdb_id if self.library.is_movie else tvdb_id
-                                                    if _id in _ratings:
-                                                        found_rating = _ratings[_id]
-                                                    else:
-                                                        raise Failed("No Trakt User Rating Found")
-                                                elif format_var == "trakt_rating":
-                                                    if self.config.Trakt:
-                                                        found_rating = self.config.Trakt.get_rating(imdb_id, self.library.is_movie)
-                                                    else:
-                                                        raise Failed("No Trakt Rating Found")
-                                                elif str(format_var).startswith("mdb"):
-                                                    mdb_item = None
-                                                    if self.config.MDBList.limit is False:
-                                                        if self.library.is_show and tvdb_id:
-                                                            try:
-                                                                mdb_item = self.config.MDBList.get_series(tvdb_id)
-                                                            except LimitReached as err:
-                                                                logger.debug(err)
-                                                            except Failed as err:
-                                                                logger.error(str(err))
-                                                            except Exception:
-                                                                logger.trace(f"TVDb ID: {tvdb_id}")
-                                                                raise
-                                                        if self.library.is_movie and tmdb_id:
-                                                            try:
-                                                                mdb_item = self.config.MDBList.get_movie(tmdb_id)
-                                                            except LimitReached as err:
-                                                                logger.debug(err)
-                                                            except Failed as err:
-                                                                logger.error(str(err))
-                                                            except Exception:
-                                                                logger.trace(f"TMDb ID: {tmdb_id}")
-                                                                raise
-                                                        if imdb_id and not mdb_item:
-                                                            try:
-                                                                mdb_item = self.config.MDBList.get_imdb(imdb_id)
-                                                            except LimitReached as err:
-                                                                logger.debug(err)
-                                                            except Failed as err:
-                                                                logger.error(str(err))
-                                                            except Exception:
-                                                                logger.trace(f"IMDb ID: {imdb_id}")
-                                                                raise
-                                                        if not mdb_item:
-                                                            raise Failed(f"No MdbItem for {item.title} (Guid: {item.guid})")
-                                                    if format_var == "mdb_average_rating":
-                                                        found_rating = mdb_item.average / 10 if mdb_item.average else None
-                                                    elif format_var == "mdb_imdb_rating":
-                                                        found_rating = mdb_item.imdb_rating if mdb_item.imdb_rating else None
-                                                    elif format_var == "mdb_metacritic_rating":
-                                                        found_rating = mdb_item.metacritic_rating / 10 if mdb_item.metacritic_rating else None
-                                                    elif format_var == "mdb_metacriticuser_rating":
-                                                        found_rating = mdb_item.metacriticuser_rating if mdb_item.metacriticuser_rating else None
-                                                    elif format_var == "mdb_trakt_rating":
-                                                        found_rating = mdb_item.trakt_rating / 10 if mdb_item.trakt_rating else None
-                                                    elif format_var == "mdb_tomatoes_rating":
-                                                        found_rating = mdb_item.tomatoes_rating / 10 if mdb_item.tomatoes_rating else None
-                                                    elif format_var == "mdb_tomatoesaudience_rating":
-                                                        found_rating = mdb_item.tomatoesaudience_rating / 10 if mdb_item.tomatoesaudience_rating else None
-                                                    elif format_var == "mdb_tmdb_rating":
-                                                        found_rating = mdb_item.tmdb_rating / 10 if mdb_item.tmdb_rating else None
-                                                    elif format_var == "mdb_letterboxd_rating":
-                                                        found_rating = mdb_item.letterboxd_rating * 2 if mdb_item.letterboxd_rating else None
-                                                    elif format_var == "mdb_myanimelist_rating":
-                                                        found_rating = mdb_item.myanimelist_rating if mdb_item.myanimelist_rating else None
-                                                    else:
-                                                        found_rating = mdb_item.score / 10 if mdb_item.score else None
-                                                elif str(format_var).startswith("omdb"):
-                                                    if self.config.OMDb.limit is not False:
-                                                        raise Failed("Daily OMDb Limit Reached")
-                                                    elif not imdb_id:
-                                                        raise Failed(f"No IMDb ID for Guid: {item.guid}")
-                                                    else:
-                                                        try:
-                                                            omdb_obj = self.config.OMDb.get_omdb(imdb_id, True)
-                                                            if format_var == "omdb_metascore_rating":
-                                                                found_rating = omdb_obj.metacritic_rating / 10 if omdb_obj.metacritic_rating else None
-                                                            elif format_var == "omdb_tomatoes_rating":
-                                                                found_rating = omdb_obj.rotten_tomatoes / 10 if omdb_obj.rotten_tomatoes else None
-                                                            else:
-                                                                found_rating = omdb_obj.imdb_rating if omdb_obj.imdb_rating else None
-                                                        except Exception:
-                                                            logger.error(f"Cannot retrieve {format_var} for: {imdb_id}")
-                                                            raise
-                                                elif str(format_var).startswith(("anidb", "mal")):
-                                                    anidb_id = self.config.Convert.ids_to_anidb(self.library, item.ratingKey, tvdb_id, imdb_id, tmdb_id)
-
-                                                    if str(format_var).startswith("anidb"):
-                                                        if anidb_id:
-                                                            anidb_obj = self.config.AniDB.get_anime(anidb_id)
-                                                            if format_var == "anidb_rating_rating":
-                                                                found_rating = anidb_obj.rating
-                                                            elif format_var == "anidb_average_rating":
-                                                                found_rating = anidb_obj.average
-                                                            elif format_var == "anidb_score_rating":
-                                                                found_rating = anidb_obj.score
-                                                        else:
-                                                            raise Failed(f"No AniDB ID for Guid: {item.guid}")
-                                                    else:
-                                                        if item.ratingKey in self.library.reverse_mal:
-                                                            mal_id = self.library.reverse_mal[item.ratingKey]
-                                                        elif not anidb_id:
-                                                            raise Failed(f"Convert Warning: No AniDB ID to Convert to MyAnimeList ID for Guid: {item.guid}")
-                                                        else:
-                                                            try:
-                                                                mal_id = self.config.Convert.anidb_to_mal(anidb_id)
-                                                            except Failed as errr:
-                                                                raise Failed(f"{errr} of Guid: {item.guid}")
-                                                        if mal_id:
-                                                            found_rating = self.config.MyAnimeList.get_anime(mal_id).score
-                                                elif str(format_var).startswith("plex"):
-                                                    ratings = self.library.get_ratings(item)
-                                                    rating_key = format_var.replace("_rating", "")
-                                                    try:
-                                                        found_rating = ratings[rating_key] # noqa
-                                                    except KeyError:
-                                                        found_rating = None
-                                            except Failed as err:
-                                                logger.error(err)
-                                            if found_rating:
-                                                actual_value = found_rating
-                                                logger.trace(f"{format_var}: {actual_value}")
-                                            else:
-                                                raise Failed(f"No {format_var} found for {item_title}")
-                                        elif format_var == "runtime" and text_overlay.level in ["show", "season", "artist", "album"]:
-                                            if hasattr(item, "duration") and item.duration:
-                                                actual_value = item.duration
-                                            else:
-                                                sub_items = item.episodes() if text_overlay.level in ["show", "season"] else item.tracks()
-                                                sub_items = [ep.duration for ep in sub_items if hasattr(ep, "duration") and ep.duration]
-                                                actual_value = sum(sub_items) / len(sub_items)
-                                        elif format_var == "total_runtime":
-                                            sub_items = item.episodes() if text_overlay.level in ["show", "season"] else item.tracks()
-                                            sub_items = [ep.duration for ep in sub_items if hasattr(ep, "duration") and ep.duration]
-                                            actual_value = sum(sub_items)
-                                        else:
-                                            if not hasattr(item, actual_attr) or getattr(item, actual_attr) is None:
-                                                raise Failed(f"Overlay Warning: No {full_text} found")
-                                            actual_value = getattr(item, actual_attr)
-                                            if format_var == "versions":
-                                                actual_value = len(actual_value)
-                                        if self.cache:
-                                            cache_store = actual_value.strftime("%Y-%m-%d") if format_var in overlay.date_vars else actual_value
-                                            self.cache.update_overlay_special_text(item.ratingKey, format_var, cache_store)
-                                        sub_value = None
-                                        if format_var == "originally_available":
-                                            if mod:
-                                                sub_value = "<<originally_available\\[(.+)]>>"
-                                                final_value = actual_value.strftime(mod)
-                                            else:
-                                                final_value = actual_value.strftime("%Y-%m-%d")
-                                        elif format_var in ["runtime", "total_runtime"]:
-                                            if mod == "H":
-                                                final_value = int((actual_value / 60000) // 60)
-                                            elif mod == "M":
-                                                final_value = int((actual_value / 60000) % 60)
-                                            else:
-                                                final_value = int(actual_value / 60000)
-                                        elif mod == "%":
-                                            final_value = int(float(actual_value) * 10)
-                                        elif mod == "#":
-                                            actual_value = f"{float(actual_value):.1f}"
-                                            final_value = actual_value[:-2] if actual_value.endswith(".0") else actual_value
-                                        elif mod == "/":
-                                            final_value = f"{float(actual_value) / 2:.1f}"
-                                        elif mod == "W":
-                                            final_value = num2words(int(actual_value))
-                                        elif mod == "WU":
-                                            final_value = num2words(int(actual_value)).upper()
-                                        elif mod == "WL":
-                                            final_value = num2words(int(actual_value)).lower()
-                                        elif mod == "0":
-                                            final_value = f"{int(actual_value):02}"
-                                        elif mod == "00":
-                                            final_value = f"{int(actual_value):03}"
-                                        elif mod == "U":
-                                            final_value = str(actual_value).upper()
-                                        elif mod == "L":
-                                            final_value = str(actual_value).lower()
-                                        elif mod == "P":
-                                            final_value = str(actual_value).title()
-                                        elif format_var in overlay.rating_sources:
-                                            final_value = f"{float(actual_value):.1f}"
-                                        else:
-                                            final_value = actual_value
-                                        if sub_value:
-                                            full_text = re.sub(sub_value, str(final_value), full_text)
-                                        else:
-                                            full_text = full_text.replace(f"<<{format_var}{mod}>>", str(final_value))
-                                    return str(full_text)
-
-                                for over_name in applied_names:
-                                    current_overlay = properties[over_name]
-                                    if current_overlay.name.startswith("text"):
-                                        if "<<" in current_overlay.name:
-                                            image_box = current_overlay.image.size if current_overlay.image else None
-                                            try:
-                                                overlay_image, addon_box = current_overlay.get_backdrop((canvas_width, canvas_height), box=image_box, text=get_text(current_overlay))
-                                            except Failed as e:
-                                                logger.warning(f"  {e}")
-                                                continue
-                                            new_poster.paste(overlay_image, (0, 0), overlay_image)
-                                        else:
-                                            overlay_image, addon_box = current_overlay.get_canvas(item)
-                                            new_poster.paste(overlay_image, (0, 0), overlay_image)
-                                        if current_overlay.image:
-                                            new_poster.paste(current_overlay.image, addon_box, current_overlay.image)
-                                    elif current_overlay.name == "backdrop":
-                                        overlay_image, _ = current_overlay.get_canvas(item)
-                                        new_poster.paste(overlay_image, (0, 0), overlay_image)
-                                    else:
-                                        if current_overlay.has_coordinates():
-                                            overlay_image, overlay_box = current_overlay.get_canvas(item)
-                                            if overlay_image is not None:
-                                                new_poster.paste(overlay_image, (0, 0), overlay_image)
-                                            new_poster.paste(current_overlay.image, overlay_box, current_overlay.image)
-                                        else:
-                                            new_poster = new_poster.resize(current_overlay.image.size, Image.Resampling.LANCZOS)
-                                            new_poster.paste(current_overlay.image, (0, 0), current_overlay.image)
-                                            new_poster = new_poster.resize((canvas_width, canvas_height), Image.Resampling.LANCZOS)
-
-                                for queue, weights in queue_overlays.items():
-                                    cords = self.library.queues[queue]
-                                    sorted_weights = sorted(weights.items(), reverse=True)
-                                    for o, cord in enumerate(cords):
-                                        if len(sorted_weights) <= o:
-                                            break
-                                        over_name = sorted_weights[o][1]
-                                        current_overlay = properties[over_name]
-                                        if current_overlay.name.startswith("text"):
-                                            image_box = current_overlay.image.size if current_overlay.image else None
-                                            try:
-                                                overlay_image, addon_box = current_overlay.get_backdrop((canvas_width, canvas_height), box=image_box, text=get_text(current_overlay), new_cords=cord)
-                                            except Failed as e:
-                                                logger.warning(f"  {e}")
-                                                continue
-                                            new_poster.paste(overlay_image, (0, 0), overlay_image)
-                                            if current_overlay.image:
-                                                new_poster.paste(current_overlay.image, addon_box, current_overlay.image)
-                                        else:
-                                            if current_overlay.has_back:
-                                                overlay_image, overlay_box = current_overlay.get_backdrop((canvas_width, canvas_height), box=current_overlay.image.size, new_cords=cord)
-                                                new_poster.paste(overlay_image, (0, 0), overlay_image)
-                                            else:
-                                                overlay_box = current_overlay.get_coordinates((canvas_width, canvas_height), box=current_overlay.image.size, new_cords=cord)
-                                            new_poster.paste(current_overlay.image, overlay_box, current_overlay.image)
-                                ext = "webp" if self.library.overlay_artwork_filetype.startswith("webp") else self.library.overlay_artwork_filetype
-                                temp = os.path.join(self.library.overlay_folder, f"temp.{ext}")
-                                if self.library.overlay_artwork_quality and self.library.overlay_artwork_filetype in ["jpg", "webp_lossy"]:
-                                    new_poster.save(temp, exif=exif_tags, quality=self.library.overlay_artwork_quality)
-                                elif self.library.overlay_artwork_filetype == "webp_lossless":
-                                    new_poster.save(temp, exif=exif_tags, lossless=True)
-                                else:
-                                    new_poster.save(temp, exif=exif_tags)
-                                self.library.upload_poster(item, temp)
-                                self.library.edit_tags("label", item, add_tags=["Overlay"], do_print=False)
-                                poster_compare = poster.compare if poster else item.thumb
-                                logger.info(f"  Overlays Applied: {', '.join(over_names)}")
-                        except (OSError, BadRequest, SyntaxError) as e:
-                            logger.stacktrace()
-                            raise Failed(f"  Overlay Error: {e}")
-                    else:
-                        logger.info(f"  Overlay Update Not Needed (Current Overlays: {', '.join(over_names)})")
-
-                    if self.cache and poster_compare:
-                        self.cache.update_image_map(item.ratingKey, f"{self.library.image_table_name}_overlays", item.thumb, poster_compare, overlay='|'.join(compare_names))
-                except Failed as e:
-                    logger.error(f"  {e}\n  Overlays Attempted on {item_title}: {', '.join(over_names)}")
-                except Exception as e:
-                    logger.info(e)
-                    logger.info(type(e))
-                    logger.stacktrace()
-                    logger.info("")
-                    logger.error(f"Overlays Attempted on {item_title}: {', '.join(over_names)}")
+                            future = Future()
+                            try:
+                                future.set_result(render_overlay(job, properties=properties))
+                            except Exception as e:
+                                future.set_exception(e)
+                    pending.append((buffer, item, item_title, over_names, compare_names, poster_compare, future))
+                    while pending and (pending[0][-1] is None or pending[0][-1].done() or len(pending) > render_workers * 2):
+                        finish()
+                while pending:
+                    finish()
+            render_time = time.perf_counter() - render_start
+            if rendered:
+                logger.info("")
+                logger.info(f"Overlays Rendered: {rendered} in {render_time:.1f}s ({rendered / render_time if render_time else 0:.2f} posters/sec)")
+        self.library.uploads.wait()
+        self.library.overlay_backups.flush()
+        with self.ratings_lock:
+            self.ratings.clear()
         logger.exorcise()
         for _, over in properties.items():
             if over.image:
                 over.image.close()
+            over.layers.clear()
+        self.library.overlays_ran = True
         overlay_run_time = str(datetime.now() - overlay_start).split('.')[0]
         logger.info("")
         logger.separator(f"Finished {self.library.name} Library Overlays\nOverlays Run Time: {overlay_run_time}")
         return overlay_run_time
 
+    def prepare_overlay(self, i, total_keys, item, over_names, properties, trakt_ratings):
+        item_title = self.library.get_item_display_title(item)
+        compare_names = {}
+        poster_compare = None
+        job = None
+        logger.start_buffer()
+        try:
+            image_compare = None
+            overlay_compare = None
+            poster = None
+            fingerprint = None
+            if self.cache:
+                image, image_compare, overlay_compare = self.cache.query_image_map(item.ratingKey, f"{self.library.image_table_name}_overlays")
+                fingerprint = self.overlay_fingerprint(item, over_names, properties)
+            item = self.library.reload(item, force=True)
+
+            overlay_compare = [] if overlay_compare is None else util.get_list(overlay_compare, split="|")
+            has_overlay = any([item_tag.tag.lower() == "overlay" for item_tag in self.library.item_labels(item)])
+
+            compare_names = {properties[ov].get_overlay_compare(): ov for ov in over_names}
+            blur_num = 0
+            applied_names = []
+            queue_overlays = {}
+            for over_name in over_names:
+                current_overlay = properties[over_name]
+                if current_overlay.name.startswith("blur"):
+                    logger.info(over_name)
+                    blur_test = int(re.search("\\(([^)]+)\\)", current_overlay.name).group(1))
+                    if blur_test > blur_num:
+                        blur_num = blur_test
+                elif current_overlay.queue_name:
+                    if current_overlay.queue not in queue_overlays:
+                        queue_overlays[current_overlay.queue] = {}
+                    if current_overlay.weight in queue_overlays[current_overlay.queue]:
+                        raise Failed("Overlay Error: Overlays in a queue cannot have the same weight")
+                    queue_overlays[current_overlay.queue][current_overlay.weight] = over_name
+                else:
+                    applied_names.append(over_name)
+
+            overlay_change = "" if has_overlay else "No Overlay Label"
+            if not overlay_change:
+                for oc in overlay_compare:
+                    if oc not in compare_names:
+                        overlay_change = f"{oc} not in {compare_names}"
+
+            if not overlay_change:
+                for compare_name, original_name in compare_names.items():
+                    if compare_name not in overlay_compare or properties[original_name].updated:
+                        overlay_change = f"{compare_name} not in {overlay_compare} or {properties[original_name].updated}"
+
+            if self.cache:
+                for over_name in over_names:
+                    if properties[over_name].name.startswith("text"):
+                        for cache_key, cache_value in self.cache.query_overlay_special_text(item.ratingKey).items():
+                            actual = plex.attribute_translation[cache_key] if cache_key in plex.attribute_translation else cache_key
+                            if actual == "total_runtime":
+                                sub_items = item.episodes() if current_overlay.level in ["show", "season"] else item.tracks()
+                                sub_items = [ep.duration for ep in sub_items if hasattr(ep, "duration") and ep.duration]
+                                real_value = sum(sub_items)
+                            else:
+                                if not hasattr(item, actual):
+                                    continue
+                                real_value = getattr(item, actual)
+                            if cache_value is None or real_value is None:
+                                continue
+                            if cache_key in overlay.float_vars:
+                                cache_value = float(cache_value)
+                            if cache_key in overlay.int_vars:
+                                cache_value = int(cache_value)
+                            if cache_key in overlay.date_vars:
+                                real_value = real_value.strftime("%Y-%m-%d") # noqa
+                            if real_value != cache_value:
+                                overlay_change = f"Special Text Changed from {cache_value} to {real_value}"
+            try:
+                poster, background, _, item_dir, name = self.library.find_item_assets(item)
+                if not poster and self.library.assets_for_all:
+                    if (isinstance(item, Episode) and self.library.show_missing_episode_assets) or \
+                            (isinstance(item, Season) and self.library.show_missing_season_assets) or \
+                            (not isinstance(item, (Episode, Season)) and self.library.show_missing_assets):
+                        if self.library.asset_folders:
+                            logger.warning(f"Asset Warning: No poster found for '{item_title}' in the assets folder '{item_dir}'")
+                        else:
+                            logger.warning(f"Asset Warning: No poster '{name}' found in the assets folders")
+                if background:
+                    self.library.upload_images(item, background=background)
+            except Failed as e:
+                if self.library.assets_for_all and self.library.show_missing_assets:
+                    logger.warning(e)
+
+            has_original = None
+            new_backup = None
+            changed_image = False
+            if poster:
+                if image_compare and str(poster.compare) != str(image_compare):
+                    changed_image = True
+                self.library.overlay_backups.remove(item.ratingKey)
+            elif has_overlay:
+                has_original = self.library.overlay_backups.get(item.ratingKey)
+                if self.library.reset_overlays:
+                    reset_list = self.library.reset_overlays
+                elif has_original is None and not self.library.reset_overlays:
+                    reset_list = ["plex", "tmdb"]
+                else:
+                    reset_list = []
+                try:
+                    new_backup = self.library.item_posters(item, providers=reset_list)
+                except Failed as e:
+                    if any(r in reset_list for r in ["plex", "tmdb"]):
+                        logger.error(e)
+            else:
+                new_backup = item.posterUrl
+            logger.info("")
+            logger.info(f"({i}/{total_keys}) {item_title}")
+            if new_backup:
+                try:
+                    has_original = self.library.check_image_for_overlay(new_backup, os.path.join(self.library.overlay_backup, f"{item.ratingKey}"))
+                    has_original = self.library.overlay_backups.add(item.ratingKey, has_original)
+                except Failed as e:
+                    raise Failed(f"  Overlay Error: {e}")
+            if poster is None and has_original is None:
+                logger.error(f"  Overlay Error: No poster found")
+            elif self.library.reapply_overlays or new_backup or overlay_change or changed_image:
+                if not self.library.reapply_overlays and new_backup:
+                    logger.trace("  Overlay Reason: New image detected")
+                elif not self.library.reapply_overlays and overlay_change:
+                    logger.trace(f"  Overlay Reason: Overlay changed {overlay_change}")
+                self.prefetch_ratings(item, over_names, properties, trakt_ratings)
+                applied = []
+                for over_name in applied_names:
+                    current_overlay = properties[over_name]
+                    text = None
+                    if current_overlay.name.startswith("text") and "<<" in current_overlay.name:
+                        try:
+                            text = self.get_text(current_overlay, item, item_title, trakt_ratings)
+                        except Failed as e:
+                            logger.warning(f"  {e}")
+                            continue
+                    applied.append((over_name, text))
+                queued = []
+                for queue, weights in queue_overlays.items():
+                    cords = self.library.queues[queue]
+                    sorted_weights = sorted(weights.items(), reverse=True)
+                    for o, cord in enumerate(cords):
+                        if len(sorted_weights) <= o:
+                            break
+                        over_name = sorted_weights[o][1]
+                        current_overlay = properties[over_name]
+                        text = None
+                        if current_overlay.name.startswith("text"):
+                            try:
+                                text = self.get_text(current_overlay, item, item_title, trakt_ratings)
+                            except Failed as e:
+                                logger.warning(f"  {e}")
+                                continue
+                        queued.append((over_name, text, cord))
+                ext = "webp" if self.library.overlay_artwork_filetype.startswith("webp") else self.library.overlay_artwork_filetype
+                job = {
+                    "source": poster.location if poster else has_original,
+                    "canvas": overlay.get_canvas_size(item),
+                    "blur": blur_num,
+                    "applied": applied,
+                    "queued": queued,
+                    "debug": os.path.join(self.library.overlay_rendered, f"{item.ratingKey}.{ext}") if self.library.save_rendered_artwork else None,
+                    "filetype": self.library.overlay_artwork_filetype,
+                    "quality": self.library.overlay_artwork_quality
+                }
+                poster_compare = poster.compare if poster else item.thumb
+            else:
+                logger.info(f"  Overlay Update Not Needed (Current Overlays: {', '.join(over_names)})")
+                self.save_fingerprint(item, fingerprint)
+        except Failed as e:
+            logger.error(f"  {e}\n  Overlays Attempted on {item_title}: {', '.join(over_names)}")
+        except Exception as e:
+            logger.info(e)
+            logger.info(type(e))
+            logger.stacktrace()
+            logger.info("")
+            logger.error(f"Overlays Attempted on {item_title}: {', '.join(over_names)}")
+        with self.ratings_lock:
+            self.ratings.pop(item.ratingKey, None)
+        return logger.end_buffer(), item, item_title, over_names, compare_names, poster_compare, job
+
+    def get_text(self, text_overlay, item, item_title, trakt_ratings):
+        full_text = text_overlay.name[5:-1]
+        for format_var in overlay.vars_by_type[text_overlay.level]:
+            if f"<<{format_var}" in full_text and format_var == "originally_available[":
+                mod = re.search("<<originally_available\\[(.+)]>>", full_text).group(1)
+                format_var = "originally_available"
+            elif f"<<{format_var}>>" in full_text and format_var.endswith(tuple(m for m in overlay.double_mods)):
+                mod = format_var[-2:]
+                format_var = format_var[:-2]
+            elif f"<<{format_var}>>" in full_text and format_var.endswith(tuple(m for m in overlay.single_mods)):
+                mod = format_var[-1]
+                format_var = format_var[:-1]
+            elif f"<<{format_var}>>" in full_text:
+                mod = ""
+            else:
+                continue
+            if format_var == "show_title":
+                actual_attr = "parentTitle" if text_overlay.level == "season" else "grandparentTitle"
+            elif format_var in plex.attribute_translation:
+                actual_attr = plex.attribute_translation[format_var]
+            else:
+                actual_attr = format_var
+            if format_var == "bitrate":
+                actual_value = None
+                for media in item.media:
+                    current = int(media.bitrate)
+                    if actual_value is None:
+                        actual_value = current
+                        if mod == "":
+                            break
+                    elif mod == "H" and current > actual_value:
+                        actual_value = current
+                    elif mod == "L" and current < actual_value:
+                        actual_value = current
+            elif format_var in overlay.rating_sources:
+                found_rating = self.get_rating(format_var, item, trakt_ratings)
+                if found_rating:
+                    actual_value = found_rating
+                    logger.trace(f"{format_var}: {actual_value}")
+                else:
+                    raise Failed(f"No {format_var} found for {item_title}")
+            elif format_var == "runtime" and text_overlay.level in ["show", "season", "artist", "album"]:
+                if hasattr(item, "duration") and item.duration:
+                    actual_value = item.duration
+                else:
+                    sub_items = item.episodes() if text_overlay.level in ["show", "season"] else item.tracks()
+                    sub_items = [ep.duration for ep in sub_items if hasattr(ep, "duration") and ep.duration]
+                    actual_value = sum(sub_items) / len(sub_items)
+            elif format_var == "total_runtime":
+                sub_items = item.episodes() if text_overlay.level in ["show", "season"] else item.tracks()
+                sub_items = [ep.duration for ep in sub_items if hasattr(ep, "duration") and ep.duration]
+                actual_value = sum(sub_items)
+            else:
+                if not hasattr(item, actual_attr) or getattr(item, actual_attr) is None:
+                    raise Failed(f"Overlay Warning: No {full_text} found")
+                actual_value = getattr(item, actual_attr)
+                if format_var == "versions":
+                    actual_value = len(actual_value)
+            if self.cache:
+                cache_store = actual_value.strftime("%Y-%m-%d") if format_var in overlay.date_vars else actual_value
+                self.cache.update_overlay_special_text(item.ratingKey, format_var, cache_store)
+            sub_value = None
+            if format_var == "originally_available":
+                if mod:
+                    sub_value = "<<originally_available\\[(.+)]>>"
+                    final_value = actual_value.strftime(mod)
+                else:
+                    final_value = actual_value.strftime("%Y-%m-%d")
+            elif format_var in ["runtime", "total_runtime"]:
+                if mod == "H":
+                    final_value = int((actual_value / 60000) // 60)
+                elif mod == "M":
+                    final_value = int((actual_value / 60000) % 60)
+                else:
+                    final_value = int(actual_value / 60000)
+            elif mod == "%":
+                final_value = int(float(actual_value) * 10)
+            elif mod == "#":
+                actual_value = f"{float(actual_value):.1f}"
+                final_value = actual_value[:-2] if actual_value.endswith(".0") else actual_value
+            elif mod == "/":
+                final_value = f"{float(actual_value) / 2:.1f}"
+            elif mod == "W":
+                final_value = num2words(int(actual_value))
+            elif mod == "WU":
+                final_value = num2words(int(actual_value)).upper()
+            elif mod == "WL":
+                final_value = num2words(int(actual_value)).lower()
+            elif mod == "0":
+                final_value = f"{int(actual_value):02}"
+            elif mod == "00":
+                final_value = f"{int(actual_value):03}"
+            elif mod == "U":
+                final_value = str(actual_value).upper()
+            elif mod == "L":
+                final_value = str(actual_value).lower()
+            elif mod == "P":
+                final_value = str(actual_value).title()
+            elif format_var in overlay.rating_sources:
+                final_value = f"{float(actual_value):.1f}"
+            else:
+                final_value = actual_value
+            if sub_value:
+                full_text = re.sub(sub_value, str(final_value), full_text)
+            else:
+                full_text = full_text.replace(f"<<{format_var}{mod}>>", str(final_value))
+        return str(full_text)
+
+    def overlay_fingerprint(self, item, over_names, properties):
+        auto_reload = getattr(item, "_autoReload", None)
+        if auto_reload is not None:
+            item._autoReload = False
+        try:
+            thumb = getattr(item, "thumb", None)
+            if not thumb:
+                return None
+            labels = [la.tag.lower() for la in getattr(item, "labels", None) or []]
+            parts = [str(thumb), str("overlay" in labels)]
+            for over_name in sorted(over_names):
+                current_overlay = properties[over_name]
+                if current_overlay.updated:
+                    return None
+                parts.append(current_overlay.get_overlay_compare())
+                if not current_overlay.name.startswith("text") or "<<" not in current_overlay.name:
+                    continue
+                for format_var in overlay.vars_by_type[current_overlay.level]:
+                    if format_var == "originally_available[":
+                        if "<<originally_available[" not in current_overlay.name:
+                            continue
+                        format_var = "originally_available"
+                    elif f"<<{format_var}>>" not in current_overlay.name:
+                        continue
+                    elif format_var.endswith(tuple(overlay.double_mods)):
+                        format_var = format_var[:-2]
+                    elif format_var.endswith(tuple(overlay.single_mods)):
+                        format_var = format_var[:-1]
+                    if format_var in fingerprint_skip_vars or (format_var == "runtime" and current_overlay.level in ["show", "season", "artist", "album"]):
+                        return None
+                    if format_var == "show_title":
+                        actual_attr = "parentTitle" if current_overlay.level == "season" else "grandparentTitle"
+                    elif format_var in plex.attribute_translation:
+                        actual_attr = plex.attribute_translation[format_var]
+                    else:
+                        actual_attr = format_var
+                    parts.append(f"{format_var}:{getattr(item, actual_attr, None)}")
+            return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+        finally:
+            if auto_reload is not None:
+                item._autoReload = auto_reload
+
+    def skip_unchanged(self, key_to_overlays, properties):
+        if not self.cache or self.library.reapply_overlays or self.library.reset_overlays or (self.library.incremental_keys is None and self.library.asset_directory):
+            return []
+        fingerprints = self.cache.query_item_fingerprints(f"{self.library.image_table_name}_overlay_fingerprints")
+        unchanged = [k for k, (item, over_names) in key_to_overlays.items()
+                     if str(item.ratingKey) in fingerprints and fingerprints[str(item.ratingKey)] == self.overlay_fingerprint(item, over_names, properties)]
+        for over_key in unchanged:
+            logger.trace(f"{key_to_overlays[over_key][0].title[:60]:<60} | Overlays Unchanged Since Last Run")
+            del key_to_overlays[over_key]
+        return unchanged
+
+    def save_fingerprint(self, item, fingerprint):
+        if self.cache and fingerprint:
+            self.cache.update_item_fingerprints(f"{self.library.image_table_name}_overlay_fingerprints", {item.ratingKey: fingerprint})
+
+    def fetch_rating(self, format_var, item, trakt_ratings):
+        found_rating = None
+        try:
+            item_to_id = item.show() if isinstance(item, (Season, Episode)) else item
+            tmdb_id, tvdb_id, imdb_id = self.library.get_ids(item_to_id)
+            if format_var == "tmdb_rating":
+                _item = self.config.TMDb.get_item(item_to_id, tmdb_id, tvdb_id, imdb_id, is_movie=self.library.is_movie)
+                if _item:
+                    if isinstance(item, Episode):
+                        found_rating = self.config.TMDb.get_episode(_item.tmdb_id, item.seasonNumber, item.episodeNumber).vote_average
+                    elif isinstance(item, Season):
+                        for season in _item.seasons:
+                            if item.seasonNumber == season.season_number:
+                                found_rating = season.average
+                                break
+                    else:
+                        found_rating = _item.vote_average
+                else:
+                    raise Failed(f"No TMDb ID for Guid: {item.guid}")
+            elif format_var == "imdb_rating":
+                if isinstance(item, Episode):
+                    found_rating = self.config.IMDb.get_episode_rating(imdb_id, item.seasonNumber, item.episodeNumber)
+                else:
+                    found_rating = self.config.IMDb.get_rating(imdb_id)
+            elif format_var == "trakt_user_rating":
+                _ratings = trakt_ratings()
+                _id = tmdb_id if self.library.is_movie else tvdb_id
+                if _id in _ratings:
+                    found_rating = _ratings[_id]
+                else:
+                    raise Failed("No Trakt User Rating Found")
+            elif format_var == "trakt_rating":
+                if self.config.Trakt:
+                    found_rating = self.config.Trakt.get_rating(imdb_id, self.library.is_movie)
+                else:
+                    raise Failed("No Trakt Rating Found")
+            elif str(format_var).startswith("mdb"):
+                mdb_item = None
+                if self.config.MDBList.limit is False:
+                    if self.library.is_show and tvdb_id:
+                        try:
+                            mdb_item = self.config.MDBList.get_series(tvdb_id)
+                        except LimitReached as err:
+                            logger.debug(err)
+                        except Failed as err:
+                            logger.error(str(err))
+                        except Exception:
+                            logger.trace(f"TVDb ID: {tvdb_id}")
+                            raise
+                    if self.library.is_movie and tmdb_id:
+                        try:
+                            mdb_item = self.config.MDBList.get_movie(tmdb_id)
+                        except LimitReached as err:
+                            logger.debug(err)
+                        except Failed as err:
+                            logger.error(str(err))
+                        except Exception:
+                            logger.trace(f"TMDb ID: {tmdb_id}")
+                            raise
+                    if imdb_id and not mdb_item:
+                        try:
+                            mdb_item = self.config.MDBList.get_imdb(imdb_id)
+                        except LimitReached as err:
+                            logger.debug(err)
+                        except Failed as err:
+                            logger.error(str(err))
+                        except Exception:
+                            logger.trace(f"IMDb ID: {imdb_id}")
+                            raise
+                    if not mdb_item:
+                        raise Failed(f"No MdbItem for {item.title} (Guid: {item.guid})")
+                if format_var == "mdb_average_rating":
+                    found_rating = mdb_item.average / 10 if mdb_item.average else None
+                elif format_var == "mdb_imdb_rating":
+                    found_rating = mdb_item.imdb_rating if mdb_item.imdb_rating else None
+                elif format_var == "mdb_metacritic_rating":
+                    found_rating = mdb_item.metacritic_rating / 10 if mdb_item.metacritic_rating else None
+                elif format_var == "mdb_metacriticuser_rating":
+                    found_rating = mdb_item.metacriticuser_rating if mdb_item.metacriticuser_rating else None
+                elif format_var == "mdb_trakt_rating":
+                    found_rating = mdb_item.trakt_rating / 10 if mdb_item.trakt_rating else None
+                elif format_var == "mdb_tomatoes_rating":
+                    found_rating = mdb_item.tomatoes_rating / 10 if mdb_item.tomatoes_rating else None
+                elif format_var == "mdb_tomatoesaudience_rating":
+                    found_rating = mdb_item.tomatoesaudience_rating / 10 if mdb_item.tomatoesaudience_rating else None
+                elif format_var == "mdb_tmdb_rating":
+                    found_rating = mdb_item.tmdb_rating / 10 if mdb_item.tmdb_rating else None
+                elif format_var == "mdb_letterboxd_rating":
+                    found_rating = mdb_item.letterboxd_rating * 2 if mdb_item.letterboxd_rating else None
+                elif format_var == "mdb_myanimelist_rating":
+                    found_rating = mdb_item.myanimelist_rating if mdb_item.myanimelist_rating else None
+                else:
+                    found_rating = mdb_item.score / 10 if mdb_item.score else None
+            elif str(format_var).startswith("omdb"):
+                if self.config.OMDb.limit is not False:
+                    raise Failed("Daily OMDb Limit Reached")
+                elif not imdb_id:
+                    raise Failed(f"No IMDb ID for Guid: {item.guid}")
+                else:
+                    try:
+                        omdb_obj = self.config.OMDb.get_omdb(imdb_id, True)
+                        if format_var == "omdb_metascore_rating":
+                            found_rating = omdb_obj.metacritic_rating / 10 if omdb_obj.metacritic_rating else None
+                        elif format_var == "omdb_tomatoes_rating":
+                            found_rating = omdb_obj.rotten_tomatoes / 10 if omdb_obj.rotten_tomatoes else None
+                        else:
+                            found_rating = omdb_obj.imdb_rating if omdb_obj.imdb_rating else None
+                    except Exception:
+                        logger.error(f"Cannot retrieve {format_var} for: {imdb_id}")
+                        raise
+            elif str(format_var).startswith(("anidb", "mal")):
+                anidb_id = self.config.Convert.ids_to_anidb(self.library, item.ratingKey, tvdb_id, imdb_id, tmdb_id)
+
+                if str(format_var).startswith("anidb"):
+                    if anidb_id:
+                        anidb_obj = self.config.AniDB.get_anime(anidb_id)
+                        if format_var == "anidb_rating_rating":
+                            found_rating = anidb_obj.rating
+                        elif format_var == "anidb_average_rating":
+                            found_rating = anidb_obj.average
+                        elif format_var == "anidb_score_rating":
+                            found_rating = anidb_obj.score
+                    else:
+                        raise Failed(f"No AniDB ID for Guid: {item.guid}")
+                else:
+                    mal_ids = self.library.ids_from_rating_key(item.ratingKey, "mal")
+                    if mal_ids:
+                        mal_id = mal_ids[0]
+                    elif not anidb_id:
+                        raise Failed(f"Convert Warning: No AniDB ID to Convert to MyAnimeList ID for Guid: {item.guid}")
+                    else:
+                        try:
+                            mal_id = self.config.Convert.anidb_to_mal(anidb_id)
+                        except Failed as errr:
+                            raise Failed(f"{errr} of Guid: {item.guid}")
+                    if mal_id:
+                        found_rating = self.config.MyAnimeList.get_anime(mal_id).score
+            elif str(format_var).startswith("plex"):
+                ratings = self.library.get_ratings(item)
+                rating_key = format_var.replace("_rating", "")
+                try:
+                    found_rating = ratings[rating_key] # noqa
+                except KeyError:
+                    found_rating = None
+        except Failed as err:
+            logger.error(err)
+        return found_rating
+
+    def get_rating(self, format_var, item, trakt_ratings):
+        with self.ratings_lock:
+            item_ratings = self.ratings.get(item.ratingKey)
+        if not item_ratings or format_var not in item_ratings:
+            return self.fetch_rating(format_var, item, trakt_ratings)
+        buffer, found_rating, error = item_ratings[format_var]
+        logger.replay(buffer)
+        if error:
+            raise error
+        return found_rating
+
+    def prefetch_ratings(self, item, over_names, properties, trakt_ratings):
+        sources = {}
+        for over_name in over_names:
+            current_overlay = properties[over_name]
+            if not current_overlay.name.startswith("text") or "<<" not in current_overlay.name:
+                continue
+            for format_var in overlay.rating_sources:
+                if format_var in overlay.vars_by_type[current_overlay.level] and any(f"<<{format_var}{m}>>" in current_overlay.name for m in overlay.var_mods[format_var]):
+                    source = sources.setdefault(format_var.split("_")[0], [])
+                    if format_var not in source:
+                        source.append(format_var)
+        if len(sources) < 2:
+            return
+
+        item_ratings = {}
+        def fetch_source(format_vars):
+            for format_var in format_vars:
+                logger.start_buffer()
+                found_rating = None
+                error = None
+                try:
+                    found_rating = self.fetch_rating(format_var, item, trakt_ratings)
+                except Exception as e:
+                    error = e
+                item_ratings[format_var] = (logger.end_buffer(), found_rating, error)
+
+        for future in [self.rating_pool.submit(fetch_source, format_vars) for format_vars in sources.values()]:
+            future.result()
+        with self.ratings_lock:
+            self.ratings[item.ratingKey] = item_ratings
+
+    def upload_overlay(self, item, item_title, data, poster_compare, compare_names, over_names):
+        thumb = item.thumb
+        try:
+            self.library.upload_poster(item, data)
+            self.library.edit_tags("label", item, add_tags=["Overlay"], do_print=False)
+            if self.cache and poster_compare:
+                self.cache.update_image_map(item.ratingKey, f"{self.library.image_table_name}_overlays", thumb, poster_compare, overlay='|'.join(compare_names))
+        except (OSError, BadRequest, Failed) as e:
+            logger.stacktrace()
+            logger.error(f"  Overlay Error: {e}\n  Overlays Attempted on {item_title}: {', '.join(over_names)}")
+
     def compile_overlays(self):
         key_to_item = {}
         properties = {}
@@ -687,7 +924,7 @@ class Overlays:
         items = self.library.search(label=label, libtype=libtype)
         return items if not ignore else [o for o in items if o.ratingKey not in ignore]
 
-    def remove_overlay(self, item, item_title, label, locations):
+    def remove_overlay(self, item, item_title, label, locations=None):
         try:
             poster, _, _, _, _ = self.library.find_item_assets(item)
         except Failed:
@@ -696,6 +933,8 @@ class Overlays:
         poster_location = None
         if poster:
             poster_location = poster.location
+        elif locations is None:
+            poster_location = self.library.overlay_backups.get(item.ratingKey)
         elif any([os.path.exists(loc) for loc in locations]):
             poster_location = next((loc for loc in locations if os.path.exists(loc)))
         if not poster_location:
@@ -707,7 +946,9 @@ class Overlays:
         if poster_location:
             self.library.upload_poster(item, poster_location, url=is_url)
             self.library.edit_tags("label", item, remove_tags=[label], do_print=False)
-            for loc in locations:
+            if locations is None:
+                self.library.overlay_backups.remove(item.ratingKey)
+            for loc in locations or []:
                 if os.path.exists(loc):
                     os.remove(loc)
         else:
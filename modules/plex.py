@@ -1,9 +1,12 @@
-import os, plexapi, re, time
+import io, os, plexapi, re, threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from modules import util
-from modules.library import Library
+from modules.library import ItemRecord, Library
 from modules.poster import ImageData
 from modules.request import parse_qs, quote_plus, urlparse
+from modules.upload import UploadPool
 from modules.util import Failed
 from PIL import Image
 from plexapi import utils
@@ -320,6 +323,7 @@ tag_attributes = [
 ]
 tag_modifiers = ["", ".not", ".regex"]
 no_not_mods = ["resolution", "decade", "album_decade"]
+pushdown_filters = ["actor", "collection", "content_rating", "country", "director", "genre", "label", "producer", "writer"]
 searches = boolean_attributes + \
                [f"{f}{m}" for f in string_attributes for m in string_modifiers] + \
                [f"{f}{m}" for f in tag_attributes + year_attributes for m in tag_modifiers if f not in no_not_mods or m != ".not"] + \
@@ -445,6 +449,22 @@ watchlist_sorts = {
 }
 
 MAX_IMAGE_SIZE = 10480000  # a little less than 10MB
+FULL_ITEM_CACHE_SIZE = 1000
+
+class CompiledFilter:
+    __slots__ = ["attr", "modifier", "final", "data", "actual", "kind", "item_types", "force", "pushdown", "keys"]
+
+    def __init__(self, attr, modifier, final, data, actual, kind, item_types, force, pushdown):
+        self.attr = attr
+        self.modifier = modifier
+        self.final = final
+        self.data = data
+        self.actual = actual
+        self.kind = kind
+        self.item_types = item_types
+        self.force = force
+        self.pushdown = pushdown
+        self.keys = None
 
 class Plex(Library):
     def __init__(self, config, params):
@@ -454,61 +474,73 @@ class Plex(Library):
         self.clean_bundles = params["plex"]["clean_bundles"]
         self.empty_trash = params["plex"]["empty_trash"]
         self.optimize = params["plex"]["optimize"]
-        self.session = self.config.Requests.session
-        if self.plex["verify_ssl"] is False and self.config.Requests.global_ssl is True:
-            logger.debug("Overriding verify_ssl to False for Plex connection")
-            self.session = self.config.Requests.create_session(verify_ssl=False)
-        if self.plex["verify_ssl"] is True and self.config.Requests.global_ssl is False:
-            logger.debug("Overriding verify_ssl to True for Plex connection")
-            self.session = self.config.Requests.create_session()
         self.token = self.plex["token"]
         self.timeout = self.plex["timeout"]
+        self.page_size = self.plex["page_size"] if self.plex["page_size"] else plexapi.X_PLEX_CONTAINER_SIZE
+        self.page_workers = self.plex["page_workers"]
+        self.user_workers = self.plex["user_workers"]
+        self.uploads = UploadPool(self.plex["upload_workers"])
         logger.secret(self.url)
         logger.secret(self.token)
-        try:
-            self.PlexServer = PlexServer(baseurl=self.url, token=self.token, session=self.session, timeout=self.timeout)
-            plexapi.server.TIMEOUT = self.timeout
-            os.environ["PLEXAPI_PLEXAPI_TIMEOUT"] = str(self.timeout)
-            logger.info(f"Connected to server {self.PlexServer.friendlyName} version {self.PlexServer.version}")
-            logger.info(f"Running on {self.PlexServer.platform} version {self.PlexServer.platformVersion}")
-            srv_settings = self.PlexServer.settings
-            try:
-                db_cache = srv_settings.get("DatabaseCacheSize")
-                logger.info(f"Plex DB cache setting: {db_cache.value} MB")
-                if self.plex["db_cache"] and self.plex["db_cache"] != db_cache.value:
-                    db_cache.set(self.plex["db_cache"])
-                    self.PlexServer.settings.save()
-                    logger.info(f"Plex DB Cache updated to {self.plex['db_cache']} MB")
-            except NotFound:
-                logger.info(f"Plex DB cache setting: Unknown")
-            try:
-                chl_num = srv_settings.get("butlerUpdateChannel").value
-                if chl_num == "16":
-                    uc_str = f"Public update channel."
-                elif chl_num == "8":
-                    uc_str = f"PlexPass update channel."
-                else:
-                    uc_str = f"Unknown update channel: {chl_num}."
-            except NotFound:
-                uc_str = f"Unknown update channel."
-            logger.info(f"PlexPass: {self.PlexServer.myPlexSubscription} on {uc_str}")
+        server_key = (self.url, self.token, self.plex["verify_ssl"])
+        if server_key in self.config.plex_servers:
+            self.PlexServer, self.session, self._user_servers, self._user_servers_lock = self.config.plex_servers[server_key]
+            logger.info(f"Using existing connection to server {self.PlexServer.friendlyName} version {self.PlexServer.version}")
+        else:
+            self.session = self.config.Requests.session
+            if self.plex["verify_ssl"] is False and self.config.Requests.global_ssl is True:
+                logger.debug("Overriding verify_ssl to False for Plex connection")
+                self.session = self.config.Requests.create_session(verify_ssl=False)
+            if self.plex["verify_ssl"] is True and self.config.Requests.global_ssl is False:
+                logger.debug("Overriding verify_ssl to True for Plex connection")
+                self.session = self.config.Requests.create_session()
             try:
-                logger.info(f"Scheduled maintenance running between {srv_settings.get('butlerStartHour').value}:00 and {srv_settings.get('butlerEndHour').value}:00")
-            except NotFound:
-                logger.info("Scheduled maintenance times could not be found")
-        except Unauthorized:
-            logger.info(f"Plex Error: Plex connection attempt returned 'Unauthorized'")
-            raise Failed("Plex Error: Plex token is invalid")
-        except ConnectTimeout:
-            raise Failed(f"Plex Error: Plex did not respond within the {self.timeout}-second timeout.")
-        except ValueError as e:
-            logger.info(f"Plex Error: Plex connection attempt returned 'ValueError'")
-            logger.stacktrace()
-            raise Failed(f"Plex Error: {e}")
-        except (ConnectionError, ParseError):
-            logger.info(f"Plex Error: Plex connection attempt returned 'ConnectionError' or 'ParseError'")
-            logger.stacktrace()
-            raise Failed("Plex Error: Plex URL is probably invalid")
+                self.PlexServer = PlexServer(baseurl=self.url, token=self.token, session=self.session, timeout=self.timeout)
+                plexapi.server.TIMEOUT = self.timeout
+                os.environ["PLEXAPI_PLEXAPI_TIMEOUT"] = str(self.timeout)
+                logger.info(f"Connected to server {self.PlexServer.friendlyName} version {self.PlexServer.version}")
+                logger.info(f"Running on {self.PlexServer.platform} version {self.PlexServer.platformVersion}")
+                srv_settings = self.PlexServer.settings
+                try:
+                    db_cache = srv_settings.get("DatabaseCacheSize")
+                    logger.info(f"Plex DB cache setting: {db_cache.value} MB")
+                    if self.plex["db_cache"] and self.plex["db_cache"] != db_cache.value:
+                        db_cache.set(self.plex["db_cache"])
+                        self.PlexServer.settings.save()
+                        logger.info(f"Plex DB Cache updated to {self.plex['db_cache']} MB")
+                except NotFound:
+                    logger.info(f"Plex DB cache setting: Unknown")
+                try:
+                    chl_num = srv_settings.get("butlerUpdateChannel").value
+                    if chl_num == "16":
+                        uc_str = f"Public update channel."
+                    elif chl_num == "8":
+                        uc_str = f"PlexPass update channel."
+                    else:
+                        uc_str = f"Unknown update channel: {chl_num}."
+                except NotFound:
+                    uc_str = f"Unknown update channel."
+                logger.info(f"PlexPass: {self.PlexServer.myPlexSubscription} on {uc_str}")
+                try:
+                    logger.info(f"Scheduled maintenance running between {srv_settings.get('butlerStartHour').value}:00 and {srv_settings.get('butlerEndHour').value}:00")
+                except NotFound:
+                    logger.info("Scheduled maintenance times could not be found")
+            except Unauthorized:
+                logger.info(f"Plex Error: Plex connection attempt returned 'Unauthorized'")
+                raise Failed("Plex Error: Plex token is invalid")
+            except ConnectTimeout:
+                raise Failed(f"Plex Error: Plex did not respond within the {self.timeout}-second timeout.")
+            except ValueError as e:
+                logger.info(f"Plex Error: Plex connection attempt returned 'ValueError'")
+                logger.stacktrace()
+                raise Failed(f"Plex Error: {e}")
+            except (ConnectionError, ParseError):
+                logger.info(f"Plex Error: Plex connection attempt returned 'ConnectionError' or 'ParseError'")
+                logger.stacktrace()
+                raise Failed("Plex Error: Plex URL is probably invalid")
+            self._user_servers = {}
+            self._user_servers_lock = threading.Lock()
+            self.config.plex_servers[server_key] = (self.PlexServer, self.session, self._user_servers, self._user_servers_lock)
         self.Plex = None
         library_names = []
         for s in self.PlexServer.library.sections():
@@ -526,8 +558,14 @@ class Plex(Library):
         self.type = self.Plex.type.capitalize()
         self.plex_pass = self.PlexServer.myPlexSubscription
         self._users = []
+        self._tags = {}
+        self._search_choices = {}
+        self._actor_ids = {}
         self._all_items = []
+        self._full_items = OrderedDict()
+        self._full_items_lock = threading.RLock()
         self._account = None
+        self._account_lock = threading.Lock()
         self.agent = self.Plex.agent
         self.scanner = self.Plex.scanner
         source_setting = next((s for s in self.Plex.settings() if s.id in ["ratingsSource"]), None)
@@ -579,15 +617,19 @@ class Plex(Library):
         return self.Plex.search(libtype=libtype, **terms)
 
     def fetch_item(self, item):
-        if isinstance(item, (Movie, Show, Season, Episode, Artist, Album, Track)):
+        if isinstance(item, (Movie, Show, Season, Episode, Artist, Album, Track, ItemRecord)):
             return self.reload(item)
         key = int(item)
+        current = self._get_full_item(key)
+        if current is not None:
+            return current
         if key in self.cached_items:
-            return self.reload(self.cached_items[key][0])
+            return self.reload(self.cached_items[key])
         try:
             current = self.fetchItem(key)
             if isinstance(current, (Movie, Show, Season, Episode, Artist, Album, Track)):
-                return self.reload(current)
+                current._autoReload = False
+                return self._cache_full_item(current)
         except (BadRequest, NotFound) as e:
             logger.trace(e)
         raise Failed(f"Plex Error: Item {item} not found")
@@ -600,36 +642,41 @@ class Plex(Library):
     def fetchItems(self, uri_args):
         return self.Plex.fetchItems(f"/library/sections/{self.Plex.key}/all{'' if uri_args is None else uri_args}")
 
+    @retry(stop=stop_after_attempt(6), wait=wait_fixed(10), retry=retry_if_not_exception_type((BadRequest, NotFound, Unauthorized)))
+    def fetch_page(self, key, container_start):
+        data = self.Plex._server.query(key, headers={"X-Plex-Container-Start": str(container_start), "X-Plex-Container-Size": str(self.page_size)})
+        subresults = self.Plex.findItems(data, initpath=key)
+        librarySectionID = utils.cast(int, data.attrib.get('librarySectionID'))
+        if librarySectionID:
+            for item in subresults:
+                item.librarySectionID = librarySectionID
+        return utils.cast(int, data.attrib.get('totalSize') or data.attrib.get('size')) or len(subresults), subresults
+
     def get_all(self, builder_level=None, load=False):
-        if load and builder_level in [None, "show", "artist", "movie"]:
+        top_level = builder_level in [None, "show", "artist", "movie"]
+        if load and top_level:
             self._all_items = []
-        if self._all_items and builder_level in [None, "show", "artist", "movie"]:
+        if self._all_items and top_level:
             return self._all_items
         builder_type = builder_level if builder_level else self.Plex.TYPE
         if not builder_level:
             builder_level = self.type
         logger.info(f"Loading All {builder_level.capitalize()}s from Library: {self.name}")
         key = f"/library/sections/{self.Plex.key}/all?includeGuids=1&type={utils.searchType(builder_type)}"
-        container_start = 0
-        container_size = plexapi.X_PLEX_CONTAINER_SIZE
-        results = []
-        total_size = 1
-        while total_size > len(results) and container_start <= total_size:
-            data = self.Plex._server.query(key, headers={"X-Plex-Container-Start": str(container_start), "X-Plex-Container-Size": str(container_size)})
-            subresults = self.Plex.findItems(data, initpath=key)
-            total_size = utils.cast(int, data.attrib.get('totalSize') or data.attrib.get('size')) or len(subresults)
-
-            librarySectionID = utils.cast(int, data.attrib.get('librarySectionID'))
-            if librarySectionID:
-                for item in subresults:
-                    item.librarySectionID = librarySectionID
-
-            results.extend(subresults)
-            container_start += container_size
-            logger.ghost(f"Loaded: {total_size if container_start > total_size else container_start}/{total_size}")
+        def load_page(container_start):
+            page_size, page = self.fetch_page(key, container_start)
+            return page_size, [ItemRecord(i, self) for i in page] if top_level else page
+        total_size, results = load_page(0)
+        logger.ghost(f"Loaded: {min(self.page_size, total_size)}/{total_size}")
+        container_starts = range(self.page_size, total_size, self.page_size)
+        if container_starts:
+            with ThreadPoolExecutor(max_workers=self.page_workers) as executor:
+                for container_start, (_, subresults) in zip(container_starts, executor.map(load_page, container_starts)):
+                    results.extend(subresults)
+                    logger.ghost(f"Loaded: {min(container_start + self.page_size, total_size)}/{total_size}")
 
         logger.info(f"Loaded {total_size} {builder_level.capitalize()}s")
-        if builder_level in [None, "show", "artist", "movie"]:
+        if top_level:
             self._all_items = results
         return results
 
@@ -658,6 +705,8 @@ class Plex(Library):
 
     def delete(self, obj):
         try:
+            if isinstance(obj, Collection):
+                self.clear_tags("collection")
             return self.query(obj.delete)
         except Exception:
             logger.stacktrace()
@@ -669,10 +718,14 @@ class Plex(Library):
 
     @retry(stop=stop_after_attempt(6), wait=wait_fixed(10), retry=retry_if_not_exception_type((BadRequest, NotFound, Unauthorized)))
     def tag_edit(self, item, attribute, data, locked=True, remove=False):
+        self.clear_tags(attribute)
+        self.mark_edited(item)
         return item.editTags(attribute, data, locked=locked, remove=remove)
 
     @retry(stop=stop_after_attempt(6), wait=wait_fixed(10), retry=retry_if_not_exception_type(Failed))
     def query_collection(self, item, collection, locked=True, add=True):
+        self.clear_tags("collection")
+        self.mark_edited(item)
         if add:
             item.addCollection(collection, locked=locked)
         else:
@@ -719,7 +772,7 @@ class Plex(Library):
                         image_url = f"{self.url}{poster.key}&X-Plex-Token={self.token}"
                         if poster.ratingKey.startswith("upload"):
                             try:
-                                self.check_image_for_overlay(image_url, os.path.join(self.overlay_backup, "temp"), remove=True)
+                                self.check_image_for_overlay(image_url, os.path.join(self.overlay_backup, f"temp-{item.ratingKey}"), remove=True)
                             except Failed as e:
                                 logger.trace(f"Plex Error: {e}")
                                 continue
@@ -740,7 +793,7 @@ class Plex(Library):
                     image_url = f"{self.url}{poster.key}&X-Plex-Token={self.token}"
                     if poster.ratingKey.startswith("upload"):
                         try:
-                            self.check_image_for_overlay(image_url, os.path.join(self.overlay_backup, "temp"), remove=True)
+                            self.check_image_for_overlay(image_url, os.path.join(self.overlay_backup, f"temp-{item.ratingKey}"), remove=True)
                         except Failed as e:
                             logger.trace(f"Plex Error: {e}")
                             continue
@@ -762,8 +815,7 @@ class Plex(Library):
 
     def load_from_cache(self, rating_key):
         if rating_key in self.cached_items:
-            item, _ = self.cached_items[rating_key]
-            return item
+            return self.cached_items[rating_key]
 
     def load_list_from_cache(self, rating_keys):
         item_list = []
@@ -774,28 +826,68 @@ class Plex(Library):
         return item_list
 
     def validate_image_size(self, image):
-        if image.compare < MAX_IMAGE_SIZE:
+        if image.size < MAX_IMAGE_SIZE:
             return True
         else:
-            logger.error(f"Image too large: {image.location}, bytes {image.compare}, MAX {MAX_IMAGE_SIZE}")
+            logger.error(f"Image too large: {image.location}, bytes {image.size}, MAX {MAX_IMAGE_SIZE}")
             return False
 
     @retry(stop=stop_after_attempt(6), wait=wait_fixed(10), retry=retry_if_not_exception_type((BadRequest, NotFound, Unauthorized)))
     def reload(self, item, force=False):
-        is_full = False
-        if not force and item.ratingKey in self.cached_items:
-            item, is_full = self.cached_items[item.ratingKey]
+        if not force:
+            current = self._get_full_item(item.ratingKey)
+            if current is not None:
+                return current
         try:
-            if not is_full or force:
+            if force and not isinstance(item, ItemRecord):
                 self.item_reload(item)
-                self.cached_items[item.ratingKey] = (item, True)
+            else:
+                item = self.fetchItem(item.ratingKey)
+                item._autoReload = False
         except (BadRequest, NotFound) as e:
             logger.stacktrace()
             raise Failed(f"Item Failed to Load: {e}")
+        return self._cache_full_item(item)
+
+    @retry(stop=stop_after_attempt(6), wait=wait_fixed(10), retry=retry_if_not_exception_type((BadRequest, NotFound, Unauthorized)))
+    def fetch_metadata(self, rating_keys):
+        return self.PlexServer.fetchItems(f"/library/metadata/{','.join([str(k) for k in rating_keys])}")
+
+    def reload_many(self, items, chunk_size=None, force=False):
+        chunk_size = min(chunk_size if chunk_size else self.page_size, FULL_ITEM_CACHE_SIZE)
+        rating_keys = [i if isinstance(i, int) else getattr(i, "ratingKey", None) for i in items]
+        rating_keys = list(dict.fromkeys([k for k in rating_keys if k is not None and (force or k not in self._full_items)]))
+        for i in range(0, len(rating_keys), chunk_size):
+            try:
+                for item in self.fetch_metadata(rating_keys[i:i + chunk_size]):
+                    item._autoReload = False
+                    self._cache_full_item(item)
+            except (BadRequest, NotFound) as e:
+                logger.trace(e)
+
+    def _cache_full_item(self, item):
+        with self._full_items_lock:
+            self._full_items[item.ratingKey] = item
+            if item.ratingKey in self.cached_items:
+                self.cached_items[item.ratingKey].update(item)
+            self._full_items.move_to_end(item.ratingKey)
+            while len(self._full_items) > FULL_ITEM_CACHE_SIZE:
+                self._full_items.popitem(last=False)
         return item
 
+    def _get_full_item(self, rating_key):
+        with self._full_items_lock:
+            if rating_key in self._full_items:
+                self._full_items.move_to_end(rating_key)
+                return self._full_items[rating_key]
+
+    def _evict_full_item(self, rating_key):
+        with self._full_items_lock:
+            self._full_items.pop(rating_key, None)
+
     @retry(stop=stop_after_attempt(6), wait=wait_fixed(10), retry=retry_if_not_exception_type((BadRequest, NotFound, Unauthorized)))
     def edit_query(self, item, edits, advanced=False):
+        self.mark_edited(item)
         if advanced:
             item.editAdvanced(**edits)
         else:
@@ -804,31 +896,27 @@ class Plex(Library):
     @retry(stop=stop_after_attempt(6), wait=wait_fixed(10), retry=retry_if_not_exception_type((BadRequest, NotFound, Unauthorized)))
     def _upload_image(self, item, image):
         upload_success = True
+        self.mark_edited(item)
         try:
-            if image.is_url and "theposterdb.com" in image.location:
-                now = datetime.now()
-                if self.config.tpdb_timer is not None:
-                    while self.config.tpdb_timer + timedelta(seconds=6) > now:
-                        time.sleep(1)
-                        now = datetime.now()
-                self.config.tpdb_timer = now
+            if image.is_url:
+                self.config.HostLimiter.wait(image.location)
             if image.is_poster and image.is_url:
                 item.uploadPoster(url=image.location)
             elif image.is_poster:
                 upload_success = self.validate_image_size(image)
                 if upload_success:
-                    item.uploadPoster(filepath=image.location)
+                    item.uploadPoster(filepath=image.source())
             elif image.is_background and image.is_url:
                 item.uploadArt(url=image.location)
             elif image.is_background:
                 upload_success = self.validate_image_size(image)
                 if upload_success:
-                    item.uploadArt(filepath=image.location)
+                    item.uploadArt(filepath=image.source())
             elif image.is_url:
                 item.uploadLogo(url=image.location)
             else:
-                item.uploadLogo(filepath=image.location)
-            self.reload(item, force=True)
+                item.uploadLogo(filepath=image.source())
+            item = self.reload(item, force=True)
             return upload_success
         except BadRequest as e:
             item.refresh()
@@ -836,36 +924,59 @@ class Plex(Library):
 
     @retry(stop=stop_after_attempt(6), wait=wait_fixed(10), retry=retry_if_not_exception_type((BadRequest, NotFound, Unauthorized)))
     def upload_poster(self, item, image, url=False):
+        self.mark_edited(item)
         if url:
+            self.config.HostLimiter.wait(image)
             item.uploadPoster(url=image)
         else:
-            item.uploadPoster(filepath=image)
+            item.uploadPoster(filepath=io.BytesIO(image) if isinstance(image, bytes) else image)
 
     @retry(stop=stop_after_attempt(6), wait=wait_fixed(10), retry=retry_if_not_exception_type((BadRequest, NotFound, Unauthorized)))
     def upload_background(self, item, image, url=False):
+        self.mark_edited(item)
         if url:
+            self.config.HostLimiter.wait(image)
             item.uploadArt(url=image)
         else:
             item.uploadArt(filepath=image)
 
     @retry(stop=stop_after_attempt(6), wait=wait_fixed(10), retry=retry_if_not_exception_type((BadRequest, NotFound, Unauthorized)))
     def upload_logo(self, item, image, url=False):
+        self.mark_edited(item)
         if url:
+            self.config.HostLimiter.wait(image)
             item.uploadLogo(url=image)
         else:
             item.uploadLogo(filepath=image)
 
-    @retry(stop=stop_after_attempt(6), wait=wait_fixed(10), retry=retry_if_not_exception_type(Failed))
     def get_actor_id(self, name):
+        if name not in self._actor_ids:
+            self._actor_ids[name] = self._get_actor_id(name)
+        return self._actor_ids[name]
+
+    @retry(stop=stop_after_attempt(6), wait=wait_fixed(10), retry=retry_if_not_exception_type(Failed))
+    def _get_actor_id(self, name):
         results = self.Plex.hubSearch(name)
         for result in results:
             if isinstance(result, Role) and result.librarySectionID == self.Plex.key and result.tag == name:
                 return result.id
 
+    def clear_tags(self, attr):
+        field = attr.split(".")[-1]
+        self._tags.pop(field, None)
+        self._search_choices.pop(field, None)
+
     def get_search_choices(self, search_name, title=True, name_pairs=False):
         final_search = search_translation[search_name] if search_name in search_translation else search_name
         final_search = show_translation[final_search] if self.is_show and final_search in show_translation else final_search
         final_search = get_tags_translation[final_search] if final_search in get_tags_translation else final_search
+        cache_key = (final_search, title, name_pairs)
+        field_choices = self._search_choices.setdefault(final_search.split(".")[-1], {})
+        if cache_key not in field_choices:
+            field_choices[cache_key] = self._get_search_choices(search_name, final_search, title, name_pairs)
+        return field_choices[cache_key]
+
+    def _get_search_choices(self, search_name, final_search, title, name_pairs):
         try:
             names = []
             choices = {}
@@ -882,8 +993,20 @@ class Plex(Library):
             logger.debug(f"Search Attribute: {final_search}")
             raise Failed(f"Plex Error: plex_search attribute: {search_name} not supported")
 
-    @retry(stop=stop_after_attempt(6), wait=wait_fixed(10), retry=retry_if_not_exception_type((BadRequest, NotFound, Unauthorized)))
     def get_tags(self, tag):
+        if isinstance(tag, str):
+            cache_key = tag
+            field = tag.split(".")[-1]
+        else:
+            cache_key = tag.key
+            field = tag.filter
+        field_tags = self._tags.setdefault(field, {})
+        if cache_key not in field_tags:
+            field_tags[cache_key] = self._get_tags(tag)
+        return field_tags[cache_key]
+
+    @retry(stop=stop_after_attempt(6), wait=wait_fixed(10), retry=retry_if_not_exception_type((BadRequest, NotFound, Unauthorized)))
+    def _get_tags(self, tag):
         if isinstance(tag, str):
             match = re.match(r'(?:([a-zA-Z]*)\.)?([a-zA-Z]+)', tag)
             if not match:
@@ -920,32 +1043,52 @@ class Plex(Library):
             self._users = users
         return self._users
 
+    def user_server(self, user):
+        with self._user_servers_lock:
+            if user in self._user_servers:
+                return self._user_servers[user]
+        server = self.PlexServer.switchUser(user)
+        with self._user_servers_lock:
+            return self._user_servers.setdefault(user, server)
+
+    def user_playlists(self, user=None):
+        try:
+            return [p for p in (self.user_server(user) if user else self.PlexServer).playlists() if isinstance(p, Playlist)]
+        except ConnectionError:
+            return []
+
     def delete_user_playlist(self, title, user):
         try:
-            self.delete(self.PlexServer.switchUser(user).playlist(title))
+            self.delete(self.user_server(user).playlist(title))
         except NotFound as e:
             raise Failed(e)
 
+    def sync_user_playlist(self, playlist, items, user):
+        try:
+            self.delete_user_playlist(playlist.title, user)
+        except Failed:
+            pass
+        if user != self.account.username:
+            Playlist.create(server=self.user_server(user), title=playlist.title, items=items).editSummary(summary=playlist.summary).reload()
+            return True
+        return False
+
     @property
     def account(self):
-        if self._account is None:
-            self._account = self.PlexServer.myPlexAccount()
-        return self._account
+        with self._account_lock:
+            if self._account is None:
+                self._account = self.PlexServer.myPlexAccount()
+            return self._account
 
     def playlist_report(self):
         playlists = {}
-        def scan_user(server, username):
-            try:
-                for playlist in server.playlists():
-                    if isinstance(playlist, Playlist):
-                        if playlist.title not in playlists:
-                            playlists[playlist.title] = []
-                        playlists[playlist.title].append(username)
-            except ConnectionError:
-                pass
-        scan_user(self.PlexServer, self.account.title)
-        for user in self.users:
-            scan_user(self.PlexServer.switchUser(user), user)
+        users = [None] + self.users
+        with ThreadPoolExecutor(max_workers=self.user_workers) as executor:
+            for user, user_playlists in zip(users, executor.map(self.user_playlists, users)):
+                for playlist in user_playlists:
+                    if playlist.title not in playlists:
+                        playlists[playlist.title] = []
+                    playlists[playlist.title].append(user if user else self.account.title)
         return playlists
 
     def manage_recommendations(self):
@@ -958,7 +1101,7 @@ class Plex(Library):
         locked_items = []
         unlocked_items = []
         if not smart_label_collection and maintain_status and self.agent in ["tv.plex.agents.movie", "tv.plex.agents.series"]:
-            for item in items:
+            for item in self.prefetch(items):
                 item = self.reload(item)
                 if next((f for f in item.fields if f.name == "collection"), None) is not None:
                     locked_items.append(item)
@@ -967,6 +1110,8 @@ class Plex(Library):
         else:
             locked_items = items
 
+        self.clear_tags("label" if smart_label_collection else "collection")
+        self.mark_edited(items)
         for _items, locked in [(locked_items, True), (unlocked_items, False)]:
             if _items:
                 self.Plex.batchMultiEdits(_items)
@@ -1062,13 +1207,11 @@ class Plex(Library):
             raise Failed(f"Plex Error: Playlist {title} not found")
 
     def get_playlist_from_users(self, playlist_title):
-        for user in self.users:
-            try:
-                for playlist in self.PlexServer.switchUser(user).playlists():
-                    if isinstance(playlist, Playlist) and playlist.title == playlist_title:
+        with ThreadPoolExecutor(max_workers=self.user_workers) as executor:
+            for user_playlists in executor.map(self.user_playlists, self.users):
+                for playlist in user_playlists:
+                    if playlist.title == playlist_title:
                         return playlist
-            except ConnectionError:
-                pass
         raise Failed(f"Plex Error: Playlist {playlist_title} not found")
 
     def get_collection(self, data, force_search=False, debug=True):
@@ -1130,11 +1273,10 @@ class Plex(Library):
             tmdb_id = []
             tvdb_id = []
             imdb_id = []
-            if self.config.Cache:
-                cache_id, _, media_type, _ = self.config.Cache.query_guid_map(item.guid)
-                if cache_id:
-                    ids.extend([(t_id, "tmdb" if "movie" in media_type else "tvdb") for t_id in cache_id])
-                    continue
+            cache_id, _, media_type, _ = self.config.Convert.query_guid(item.guid)
+            if cache_id:
+                ids.extend([(t_id, "tmdb" if "movie" in media_type else "tvdb") for t_id in cache_id])
+                continue
             try:
                 fin = False
                 for guid_tag in item.guids:
@@ -1185,7 +1327,7 @@ class Plex(Library):
             items = []
             for item in self.get_all():
                 try:
-                    items.append(item.episode(season=1, episode=1))
+                    items.append(self.PlexServer.fetchItem(f"{item.key}/allLeaves", Episode, parentIndex=1, index=1))
                 except NotFound:
                     logger.warning(f"Plex Warning: {item.title} has no Season 1 Episode 1 ")
         elif method == "plex_search":
@@ -1216,18 +1358,14 @@ class Plex(Library):
             for col in good_collections:
                 logger.info(col.title)
             logger.info("")
-            collection_indexes = [str(c.title).lower() for c in good_collections]
+            collected_keys = set()
+            regular_collections = [c for c in good_collections if not c.smart]
+            with ThreadPoolExecutor(max_workers=self.page_workers) as executor:
+                for i, col_items in enumerate(executor.map(lambda c: self.get_collection_items(c, False), regular_collections), 1):
+                    logger.ghost(f"Loading Collection: {i}/{len(regular_collections)}")
+                    collected_keys.update([item.ratingKey for item in col_items])
             all_items = self.get_all()
-            for i, item in enumerate(all_items, 1):
-                logger.ghost(f"Processing: {i}/{len(all_items)} {item.title}")
-                add_item = True
-                item = self.reload(item, force=True)
-                for collection in item.collections:
-                    if str(collection.tag).lower() in collection_indexes:
-                        add_item = False
-                        break
-                if add_item:
-                    items.append(item)
+            items = [item for item in all_items if item.ratingKey not in collected_keys]
             logger.info(f"Processed {len(all_items)} {self.type}s")
         else:
             raise Failed(f"Plex Error: Method {method} not supported")
@@ -1277,6 +1415,34 @@ class Plex(Library):
             logger.stacktrace()
             return False
 
+    def tag_changes(self, key, obj, add_tags=None, remove_tags=None, sync_tags=None):
+        _add_tags = add_tags if add_tags else []
+        _remove_tags = remove_tags if remove_tags else []
+        _sync_tags = sync_tags if sync_tags else []
+        try:
+            obj = self.reload(obj)
+            _item_tags = [item_tag.tag for item_tag in getattr(obj, key)]
+        except BadRequest:
+            _item_tags = []
+        _add = [t for t in _add_tags + _sync_tags if t not in _item_tags]
+        _remove = [t for t in _item_tags if (sync_tags is not None and t not in _sync_tags) or t in _remove_tags]
+        return obj, _add, _remove
+
+    def batch_edit(self, items, method, *args, **kwargs):
+        groups = {}
+        self.mark_edited(items)
+        for item in items:
+            groups.setdefault((item.librarySectionID, item.type), []).append(item)
+        for (section_id, _), group_items in groups.items():
+            section = self.Plex if not section_id or section_id == self.Plex.key else self.PlexServer.library.sectionByID(section_id)
+            batch_size = self.plex_bulk_edit_batch_size if self.plex_bulk_edit_batch_size else len(group_items)
+            for i in range(0, len(group_items), batch_size):
+                section.batchMultiEdits(group_items[i:i + batch_size])
+                getattr(section, method)(*args, **kwargs)
+                section.saveMultiEdits()
+        for item in items:
+            self._evict_full_item(item.ratingKey)
+
     def edit_tags(self, attr, obj, add_tags=None, remove_tags=None, sync_tags=None, do_print=True, locked=True, is_locked=None):
         display = ""
         final = ""
@@ -1284,16 +1450,7 @@ class Plex(Library):
         actual = "similar" if attr == "similar_artist" else attr
         attr_display = attr.replace("_", " ").title()
         if add_tags or remove_tags or sync_tags is not None:
-            _add_tags = add_tags if add_tags else []
-            _remove_tags = remove_tags if remove_tags else []
-            _sync_tags = sync_tags if sync_tags else []
-            try:
-                obj = self.reload(obj)
-                _item_tags = [item_tag.tag for item_tag in getattr(obj, key)]
-            except BadRequest:
-                _item_tags = []
-            _add = [t for t in _add_tags + _sync_tags if t not in _item_tags]
-            _remove = [t for t in _item_tags if (sync_tags is not None and t not in _sync_tags) or t in _remove_tags]
+            obj, _add, _remove = self.tag_changes(key, obj, add_tags=add_tags, remove_tags=remove_tags, sync_tags=sync_tags)
             if _add:
                 self.tag_edit(obj, actual, _add, locked=locked)
                 display += f"+{', +'.join(_add)}"
@@ -1338,23 +1495,23 @@ class Plex(Library):
                         location = "Plex"
             if image:
                 logger.info(f"{text} | Reset from {location}")
-                if poster:
-                    try:
-                        self.upload_poster(item, image, url=image_url)
-                    except BadRequest as e:
-                        logger.stacktrace()
-                        logger.error(f"Plex Error: {e}")
-                else:
-                    try:
-                        self.upload_background(item, image, url=image_url)
-                    except BadRequest as e:
-                        logger.stacktrace()
-                        logger.error(f"Plex Error: {e}")
-                if poster and "Overlay" in [la.tag for la in self.item_labels(item)]:
-                    logger.info(self.edit_tags("label", item, remove_tags="Overlay", do_print=False))
+                self.uploads.submit(self.reset_image, item, image, image_url, poster)
             else:
                 logger.warning(f"{text} | No Reset Image Found")
 
+    def reset_image(self, item, image, url, poster):
+        try:
+            if poster:
+                self.upload_poster(item, image, url=url)
+            else:
+                self.upload_background(item, image, url=url)
+        except BadRequest as e:
+            logger.stacktrace()
+            logger.error(f"Plex Error: {e}")
+        if poster and "Overlay" in [la.tag for la in self.item_labels(item)]:
+            logger.info(self.edit_tags("label", item, remove_tags="Overlay", do_print=False))
+        self._evict_full_item(item.ratingKey)
+
     def item_images(self, item, group, alias, initial=False, asset_location=None, asset_directory=None, title=None, image_name=None, folder_name=None, style_data=None):
         if title is None:
             title = item.title
@@ -1504,21 +1661,9 @@ class Plex(Library):
         if not item_asset_directory:
             for ad in asset_directory:
                 if self.asset_folders:
-                    if os.path.isdir(os.path.join(ad, folder_name)):
-                        item_asset_directory = os.path.join(ad, folder_name)
-                    else:
-                        for n in range(1, self.asset_depth + 1):
-                            new_path = ad
-                            for i in range(1, n + 1):
-                                new_path = os.path.join(new_path, "*")
-                            matches = util.glob_filter(os.path.join(new_path, folder_name))
-                            if len(matches) > 0:
-                                item_asset_directory = os.path.abspath(matches[0])
-                                break
-                else:
-                    matches = util.glob_filter(os.path.join(ad, f"{file_name}.*"))
-                    if len(matches) > 0:
-                        item_asset_directory = ad
+                    item_asset_directory = self.config.Assets.find_folder(ad, folder_name, self.asset_depth)
+                elif self.config.Assets.find_file(ad, file_name):
+                    item_asset_directory = ad
                 if item_asset_directory:
                     break
             if not item_asset_directory:
@@ -1531,24 +1676,20 @@ class Plex(Library):
                         raise Failed(f"Asset Warning: Unable to find asset folder: '{folder_name}'")
                 return None, None, None, item_asset_directory, folder_name
 
-        poster_filter = os.path.join(item_asset_directory, f"{file_name}.*")
-        background_filter = os.path.join(item_asset_directory, "background.*" if file_name == "poster" else f"{file_name}_background.*")
-        logo_filter = os.path.join(item_asset_directory, "logo.*" if file_name == "poster" else f"{file_name}_logo.*")
+        poster_match = self.config.Assets.find_file(item_asset_directory, file_name)
+        if poster_match:
+            poster = ImageData("asset_directory", os.path.abspath(poster_match), prefix=prefix, is_url=False)
 
-        poster_matches = util.glob_filter(poster_filter)
-        if len(poster_matches) > 0:
-            poster = ImageData("asset_directory", os.path.abspath(poster_matches[0]), prefix=prefix, is_url=False)
+        background_match = self.config.Assets.find_file(item_asset_directory, "background" if file_name == "poster" else f"{file_name}_background")
+        if background_match:
+            background = ImageData("asset_directory", os.path.abspath(background_match), prefix=prefix, image_type="background", is_url=False)
 
-        background_matches = util.glob_filter(background_filter)
-        if len(background_matches) > 0:
-            background = ImageData("asset_directory", os.path.abspath(background_matches[0]), prefix=prefix, image_type="background", is_url=False)
-
-        logo_matches = util.glob_filter(logo_filter)
-        if len(logo_matches) > 0:
-            logo = ImageData("asset_directory", os.path.abspath(logo_matches[0]), prefix=prefix, image_type="logo", is_url=False)
+        logo_match = self.config.Assets.find_file(item_asset_directory, "logo" if file_name == "poster" else f"{file_name}_logo")
+        if logo_match:
+            logo = ImageData("asset_directory", os.path.abspath(logo_match), prefix=prefix, image_type="logo", is_url=False)
 
         if is_top_level and self.asset_folders and self.dimensional_asset_rename and (not poster or not background):
-            for file in util.glob_filter(os.path.join(item_asset_directory, "*.*")):
+            for file in self.config.Assets.files(item_asset_directory):
                 if file.lower().endswith((".png", ".jpg", ".jpeg", "webp")) and not re.match(r"s\d+e\d+|season\d+", os.path.basename(file).lower()):
                     try:
                         with Image.open(file) as image:
@@ -1556,10 +1697,12 @@ class Plex(Library):
                         if not poster and _h >= _w:
                             new_path = os.path.join(os.path.dirname(file), f"poster{os.path.splitext(file)[1].lower()}")
                             os.rename(file, new_path)
+                            self.config.Assets.invalidate(item_asset_directory)
                             poster = ImageData("asset_directory", os.path.abspath(new_path), prefix=prefix, is_url=False)
                         elif not background and _w > _h:
                             new_path = os.path.join(os.path.dirname(file), f"background{os.path.splitext(file)[1].lower()}")
                             os.rename(file, new_path)
+                            self.config.Assets.invalidate(item_asset_directory)
                             background = ImageData("asset_directory", os.path.abspath(new_path), prefix=prefix, image_type="background", is_url=False)
                         if poster and background:
                             break
@@ -1572,15 +1715,14 @@ class Plex(Library):
         tmdb_id = None
         tvdb_id = None
         imdb_id = None
-        if self.config.Cache:
-            t_id, i_id, guid_media_type, _ = self.config.Cache.query_guid_map(item.guid)
-            if t_id:
-                if "movie" in guid_media_type:
-                    tmdb_id = t_id[0]
-                else:
-                    tvdb_id = t_id[0]
-            if i_id:
-                imdb_id = i_id[0]
+        t_id, i_id, guid_media_type, _ = self.config.Convert.query_guid(item.guid)
+        if t_id:
+            if "movie" in guid_media_type:
+                tmdb_id = t_id[0]
+            else:
+                tvdb_id = t_id[0]
+        if i_id:
+            imdb_id = i_id[0]
         if not tmdb_id and not tvdb_id:
             tmdb_id = self.get_tmdb_from_map(item)
         if not tmdb_id and not tvdb_id and self.is_show:
@@ -1747,16 +1889,77 @@ class Plex(Library):
             logger.warning(f"Collection Warning: {text} attribute will run as {final}")
         return attribute, modifier, final
 
-    def check_filters(self, item, filters_in, current_time):
+    def compile_filters(self, filters_in, pushdown=True):
+        from modules import builder
+        compiled = []
         for filter_method, filter_data in filters_in:
             filter_attr, modifier, filter_final = self.split(filter_method)
-            if self.check_filter(item, filter_attr, modifier, filter_final, filter_data, current_time) is False:
+            if filter_attr in builder.date_filters:
+                kind = "date"
+            elif filter_attr in builder.string_filters:
+                kind = "string"
+            elif filter_attr in builder.boolean_filters:
+                kind = "boolean"
+            elif filter_attr == "history":
+                kind = "history"
+            elif filter_attr in ["seasons", "episodes", "albums", "tracks"]:
+                kind = "sub"
+                percentage = 60
+                sub_filters = []
+                for sub_atr, sub_data in filter_data.items():
+                    if sub_atr == "percentage":
+                        percentage = sub_data
+                    else:
+                        sub_filters.append((sub_atr, sub_data))
+                filter_data = (percentage, self.compile_filters(sub_filters, pushdown=False))
+            elif (filter_attr != "year" and filter_attr in builder.number_filters) or modifier in [".gt", ".gte", ".lt", ".lte", ".count_gt", ".count_gte", ".count_lt", ".count_lte"]:
+                kind = "number"
+            else:
+                kind = "tag"
+                if modifier == ".regex":
+                    filter_data = [re.compile(reg) for reg in filter_data]
+                elif isinstance(filter_data, list):
+                    filter_data = set(filter_data)
+            item_types = [t for t, f in builder.filters.items() if filter_attr in f]
+            can_push = pushdown and kind == "tag" and modifier == "" and filter_attr in pushdown_filters and self.Plex.TYPE in item_types
+            compiled.append(CompiledFilter(filter_attr, modifier, filter_final, filter_data,
+                                           attribute_translation[filter_attr] if filter_attr in attribute_translation else filter_attr,
+                                           kind, item_types, filter_attr in ["genre", "label", "collection"], can_push))
+        return compiled
+
+    def pushdown_keys(self, compiled):
+        if compiled.keys is None:
+            try:
+                _, names = self.get_search_choices(compiled.attr, title=False, name_pairs=True)
+            except Failed as e:
+                logger.debug(e)
+                compiled.pushdown = False
+                return None
+            keys = {}
+            for name, key in names:
+                keys.setdefault(name, []).append(key)
+            if any(str(v) not in keys for v in compiled.data):
+                compiled.pushdown = False
+                return None
+            arg_key = search_translation[compiled.attr] if compiled.attr in search_translation else compiled.attr
+            arg_key = show_translation[arg_key] if self.is_show and arg_key in show_translation else arg_key
+            uri_args = f"?type={utils.searchType(self.Plex.TYPE)}&{arg_key}={','.join(dict.fromkeys([quote_plus(str(k)) for v in compiled.data for k in keys[str(v)]]))}"
+            logger.trace(f"Filter Pushdown: {compiled.final} {uri_args}")
+            compiled.keys = {i.ratingKey for i in self.fetchItems(uri_args)}
+        return compiled.keys
+
+    def check_filters(self, item, filters_in, current_time):
+        for compiled in filters_in:
+            if self.check_filter(item, compiled, current_time) is False:
                 return False
         return True
 
-    def check_filter(self, item, filter_attr, modifier, filter_final, filter_data, current_time):
-        from modules import builder
-        filter_actual = attribute_translation[filter_attr] if filter_attr in attribute_translation else filter_attr
+    def check_filter(self, item, compiled, current_time):
+        filter_attr = compiled.attr
+        modifier = compiled.modifier
+        filter_final = compiled.final
+        filter_data = compiled.data
+        filter_actual = compiled.actual
         if isinstance(item, Movie):
             item_type = "movie"
         elif isinstance(item, Show):
@@ -1773,13 +1976,17 @@ class Plex(Library):
             item_type = "track"
         else:
             return True
-        if filter_attr not in builder.filters[item_type]:
+        if item_type not in compiled.item_types:
             return True
-        item = self.reload(item, force=filter_attr in ["genre", "label", "collection"])
-        if filter_attr in builder.date_filters:
+        if compiled.pushdown and item_type == self.Plex.TYPE:
+            keys = self.pushdown_keys(compiled)
+            if keys is not None:
+                return item.ratingKey in keys
+        item = self.reload(item, force=compiled.force)
+        if compiled.kind == "date":
             if util.is_date_filter(getattr(item, filter_actual), modifier, filter_data, filter_final, current_time):
                 return False
-        elif filter_attr in builder.string_filters:
+        elif compiled.kind == "string":
             values = []
             if filter_attr == "audio_track_title":
                 for media in item.media:
@@ -1805,7 +2012,7 @@ class Plex(Library):
                 values = [test_value] if test_value else []
             if util.is_string_filter(values, modifier, filter_data):
                 return False
-        elif filter_attr in builder.boolean_filters:
+        elif compiled.kind == "boolean":
             filter_check = False
             if filter_attr == "has_collection":
                 filter_check = len(item.collections) > 0
@@ -1829,7 +2036,7 @@ class Plex(Library):
                                 break
             if util.is_boolean_filter(filter_data, filter_check):
                 return False
-        elif filter_attr == "history":
+        elif compiled.kind == "history":
             item_date = item.originallyAvailableAt
             if item_date is None:
                 return False
@@ -1847,7 +2054,7 @@ class Plex(Library):
                         date_match = True
                 if date_match is False:
                     return False
-        elif filter_attr in ["seasons", "episodes", "albums", "tracks"]:
+        elif compiled.kind == "sub":
             if filter_attr == "seasons":
                 sub_items = item.seasons()
             elif filter_attr == "albums":
@@ -1856,13 +2063,7 @@ class Plex(Library):
                 sub_items = item.tracks()
             else:
                 sub_items = item.episodes()
-            filters_in = []
-            percentage = 60
-            for sub_atr, sub_data in filter_data.items():
-                if sub_atr == "percentage":
-                    percentage = sub_data
-                else:
-                    filters_in.append((sub_atr, sub_data))
+            percentage, filters_in = filter_data
             failure_threshold = len(sub_items) * ((100 - percentage) / 100)
             failures = 0
             for sub_item in sub_items:
@@ -1870,7 +2071,7 @@ class Plex(Library):
                     failures += 1
                 if failures > failure_threshold:
                     return False
-        elif (filter_attr != "year" and filter_attr in builder.number_filters) or modifier in [".gt", ".gte", ".lt", ".lte", ".count_gt", ".count_gte", ".count_lt", ".count_lte"]:
+        elif compiled.kind == "number":
             test_number = []
             if filter_attr in ["channels", "height", "width", "aspect"]:
                 test_number = 0
@@ -1928,11 +2129,10 @@ class Plex(Library):
                 for reg in filter_data:
                     for name in attrs:
                         if isinstance(name, str):
-                            if re.compile(reg).search(name):
+                            if reg.search(name):
                                 has_match = True
                 if has_match is False:
                     return False
-            elif (not list(set(filter_data) & set(attrs)) and modifier == "") \
-                    or (list(set(filter_data) & set(attrs)) and modifier == ".not"):
+            elif (not set(filter_data) & set(attrs) and modifier == "") or (set(filter_data) & set(attrs) and modifier == ".not"):
                 return False
         return True
@@ -1,12 +1,49 @@
-import os, time
+import io, os, threading, time
+from functools import lru_cache
 from modules import util
 from modules.util import Failed
 from PIL import Image, ImageFont, ImageDraw, ImageColor
 
 logger = util.logger
 
+_fonts = {}
+_fonts_lock = threading.Lock()
+_measure = ImageDraw.Draw(Image.new("RGBA", (0, 0)))
+
+def get_font(font_name, font_size, font_style=None):
+    key = (font_name, font_size, font_style)
+    with _fonts_lock:
+        if key not in _fonts:
+            font = ImageFont.truetype(font_name, font_size)
+            if font_style:
+                font.set_variation_by_name(font_style)
+            _fonts[key] = font
+        return _fonts[key]
+
+@lru_cache(maxsize=4096)
+def text_bbox(font_name, font_size, font_style, text, stroke_width=0, multiline=False):
+    font = get_font(font_name, font_size, font_style)
+    if multiline:
+        return _measure.multiline_textbbox((0, 0), text, font=font, stroke_width=stroke_width)
+    return _measure.textbbox((0, 0), text, font=font, anchor="lt", stroke_width=stroke_width)
+
+@lru_cache(maxsize=4096)
+def text_length(font_name, font_size, font_style, text):
+    return _measure.textlength(text, font=get_font(font_name, font_size, font_style))
+
+@lru_cache(maxsize=None)
+def kometa_fonts(font_base):
+    return tuple(os.listdir(font_base))
+
+def recolor_image(image, color):
+    image = image.convert("RGBA")
+    alpha = image.getchannel("A")
+    recolored = Image.new("RGBA", image.size, tuple(color[:3]) + (0,))
+    recolored.putalpha(alpha)
+    return Image.composite(recolored, image, alpha.point(lambda a: 255 if a > 0 else 0))
+
 class ImageData:
-    def __init__(self, attribute, location, prefix="", image_type="poster", is_url=True, compare=None):
+    def __init__(self, attribute, location, prefix="", image_type="poster", is_url=True, compare=None, data=None):
         self.attribute = attribute
         self.location = location
         self.prefix = prefix
@@ -14,11 +51,16 @@ class ImageData:
         self.is_background = image_type == "background"
         self.is_logo = image_type == "logo"
         self.is_url = is_url
-        self.compare = compare if compare else location if is_url else os.stat(location).st_size
-        self.message = f"{prefix}{image_type} to [{'URL' if is_url else 'File'}] {location}"
+        self.data = data
+        self.size = None if is_url else len(data) if data is not None else os.stat(location).st_size
+        self.compare = compare if compare else location if is_url else self.size
+        self.message = f"{prefix}{image_type} to [{'URL' if is_url else 'Memory' if data is not None else 'File'}] {location}"
+
+    def source(self):
+        return io.BytesIO(self.data) if self.data is not None else self.location
 
     def __str__(self):
-        return str(self.__dict__)
+        return str({k: v for k, v in self.__dict__.items() if k != "data"})
 
 
 class ImageBase:
@@ -97,7 +139,6 @@ class ImageBase:
 class Component(ImageBase):
     def __init__(self, config, data):
         super().__init__(config, data)
-        self.draw = ImageDraw.Draw(Image.new("RGBA", (0, 0)))
         self.back_color = self.check_color("back_color")
         self.back_radius = util.parse("Posters", "back_radius", self.data, datatype="int", methods=self.methods, default=0, minimum=0) if "back_radius" in self.methods else 0
         self.back_line_width = util.parse("Posters", "back_line_width", self.data, datatype="int", methods=self.methods, default=0, minimum=0) if "back_line_width" in self.methods else 0
@@ -139,21 +180,20 @@ class Component(ImageBase):
         self.addon_offset = util.parse("Posters", "addon_offset", self.data, datatype="int", methods=self.methods, default=0, minimum=0) if "stroke_width" in self.methods else 0
         if "text" in self.methods:
             font_base = os.path.join(self.code_base, "fonts")
-            kometa_fonts = os.listdir(font_base)
             all_fonts = {s: s for s in util.get_system_fonts()}
-            for font_name in kometa_fonts:
+            for font_name in kometa_fonts(font_base):
                 all_fonts[font_name] = os.path.join(font_base, font_name)
             self.text = util.parse("Posters", "text", self.data, methods=self.methods, default="<<title>>")
             self.font_name, self.font_compare = self.check_file("font", all_fonts, local=True)
             if not self.font_name:
                 self.font_name = all_fonts["Roboto-Medium.ttf"]
-            self.font = ImageFont.truetype(self.font_name, self.font_size)
+            self.font = get_font(self.font_name, self.font_size)
             if "font_style" in self.methods and self.data[self.methods["font_style"]]:
                 try:
                     variation_names = [n.decode("utf-8") for n in self.font.get_variation_names()]
                     if self.data[self.methods["font_style"]] in variation_names:
-                        self.font.set_variation_by_name(self.data[self.methods["font_style"]])
                         self.font_style = self.data[self.methods["font_style"]]
+                        self.font = get_font(self.font_name, self.font_size, self.font_style)
                     else:
                         raise Failed(f"Posters Error: Font Style {self.data[self.methods['font_style']]} not found. Options: {','.join(variation_names)}")
                 except OSError:
@@ -171,13 +211,13 @@ class Component(ImageBase):
         lines = []
         for line in self.text.split("\n"):
             for word in line.split(" "):
-                word_length = self.draw.textlength(word, font=self.font)
+                word_length = text_length(self.font_name, self.font_size, self.font_style, word)
                 while word_length > max_width:
                     self.font_size -= 1
-                    self.font = ImageFont.truetype(self.font_name, self.font_size)
-                    word_length = self.draw.textlength(word, font=self.font)
+                    self.font = get_font(self.font_name, self.font_size, self.font_style)
+                    word_length = text_length(self.font_name, self.font_size, self.font_style, word)
         for line in self.text.split("\n"):
-            line_length = self.draw.textlength(line, font=self.font)
+            line_length = text_length(self.font_name, self.font_size, self.font_style, line)
             if line_length <= max_width:
                 lines.append(line)
                 continue
@@ -186,7 +226,7 @@ class Component(ImageBase):
             for word in line.split(" "):
                 if current_line:
                     word = f" {word}"
-                word_length = self.draw.textlength(word, font=self.font)
+                word_length = text_length(self.font_name, self.font_size, self.font_style, word)
                 if line_length + word_length <= max_width:
                     current_line += word
                     line_length += word_length
@@ -194,7 +234,7 @@ class Component(ImageBase):
                     if current_line:
                         lines.append(current_line)
                     word = word.strip()
-                    word_length = self.draw.textlength(word, font=self.font)
+                    word_length = text_length(self.font_name, self.font_size, self.font_style, word)
                     current_line = word
                     line_length = word_length
             if current_line:
@@ -227,7 +267,7 @@ class Component(ImageBase):
         return output
 
     def get_text_size(self, text):
-        return self.draw.multiline_textbbox((0, 0), text, font=self.font)
+        return text_bbox(self.font_name, self.font_size, self.font_style, text, multiline=True)
 
     def get_coordinates(self, canvas_box, box, new_cords=None):
         canvas_width, canvas_height = canvas_box
@@ -260,12 +300,7 @@ class Component(ImageBase):
                 image_width = self.image_width
                 image = image.resize((image_width, image_height), Image.Resampling.LANCZOS) # noqa
             if self.image_color:
-                r, g, b = self.image_color
-                pixels = image.load()
-                for x in range(image_width):
-                    for y in range(image_height):
-                        if pixels[x, y][3] > 0: # noqa
-                            pixels[x, y] = (r, g, b, pixels[x, y][3]) # noqa
+                image = recolor_image(image, self.image_color)
         else:
             image, image_width, image_height = None, 0, 0
         if self.text is not None:
@@ -362,10 +397,7 @@ class KometaImage(ImageBase):
             output += component.get_compare_string()
         return output
 
-    def save(self, item_vars):
-        image_path = os.path.join(self.images_dir, "temp_poster.png")
-        if os.path.exists(image_path):
-            os.remove(image_path)
+    def save(self, item_vars, debug=False):
         canvas_width = 1000
         canvas_height = 1000 if self.playlist else 1500
         canvas_box = (canvas_width, canvas_height)
@@ -392,7 +424,14 @@ class KometaImage(ImageBase):
             if image:
                 pmm_image.paste(image, image_point, image)
 
-        pmm_image.save(image_path)
+        buffer = io.BytesIO()
+        pmm_image.save(buffer, format="PNG")
+        data = buffer.getvalue()
+        location = self.image_attr
+        if debug:
+            location = os.path.join(self.images_dir, "temp_poster.png")
+            with open(location, "wb") as f:
+                f.write(data)
 
-        return ImageData(self.image_attr, image_path, is_url=False, image_type="poster", compare=self.get_compare_string())
+        return ImageData(self.image_attr, location, is_url=False, image_type="poster", compare=self.get_compare_string(), data=data)
 
@@ -0,0 +1,49 @@
+import threading, time
+from concurrent.futures import ThreadPoolExecutor
+from modules import util
+
+logger = util.logger
+
+host_intervals = {"theposterdb.com": 6}
+
+class HostLimiter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last = {}
+
+    def wait(self, location):
+        host = next((h for h in host_intervals if h in str(location)), None)
+        if host is None:
+            return
+        with self._lock:
+            if host in self._last:
+                remaining = self._last[host] + host_intervals[host] - time.monotonic()
+                if remaining > 0:
+                    time.sleep(remaining)
+            self._last[host] = time.monotonic()
+
+class UploadPool:
+    def __init__(self, workers):
+        self.workers = workers
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(workers * 2)
+
+    def _done(self, future):
+        self._slots.release()
+        e = future.exception()
+        if e is not None:
+            logger.error(f"Upload Error: {e}")
+
+    def submit(self, func, *args, **kwargs):
+        if self.workers <= 1:
+            func(*args, **kwargs)
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        self._slots.acquire()
+        self._executor.submit(func, *args, **kwargs).add_done_callback(self._done)
+
+    def wait(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
@@ -200,6 +200,9 @@ def validate_date(date_text, return_as=None):
             raise Failed(f"{date_text} must match pattern YYYY-MM-DD (e.g. 2020-12-25) or MM/DD/YYYY (e.g. 12/25/2020)")
     return datetime.strftime(date_obg, return_as) if return_as else date_obg
 
+def timestamp(date_obj):
+    return int(date_obj.timestamp()) if date_obj else 0
+
 def validate_regex(data, col_type, validate=True):
     regex_list = get_list(data, split=False)
     valid_regex = []
@@ -287,7 +290,7 @@ def item_title(item):
         show_title = item.grandparentTitle if item.grandparentTitle else ""
         season_title = f"{item.parentTitle}: " if item.parentTitle and f"Season {season}" == item.parentTitle else ""
         return f"{show_title} S{season:02}E{episode:02}: {season_title}{item.title if item.title else ''}"
-    elif isinstance(item, Movie) and item.year:
+    elif (isinstance(item, Movie) or getattr(item, "type", None) == "movie") and item.year:
         return f"{item.title} ({item.year})"
     elif isinstance(item, Album):
         return f"{item.parentTitle}: {item.title}"
@@ -296,6 +299,35 @@ def item_title(item):
     else:
         return item.title
 
+def longest_increasing_subsequence(values):
+    tails = []
+    tail_indexes = []
+    previous = [-1] * len(values)
+    for i, value in enumerate(values):
+        if value is None:
+            continue
+        low, high = 0, len(tails)
+        while low < high:
+            mid = (low + high) // 2
+            if tails[mid] < value:
+                low = mid + 1
+            else:
+                high = mid
+        if low > 0:
+            previous[i] = tail_indexes[low - 1]
+        if low == len(tails):
+            tails.append(value)
+            tail_indexes.append(i)
+        else:
+            tails[low] = value
+            tail_indexes[low] = i
+    indexes = set()
+    i = tail_indexes[-1] if tail_indexes else -1
+    while i >= 0:
+        indexes.add(i)
+        i = previous[i]
+    return indexes
+
 def item_set(item, item_id):
     return {"title": item_title(item), "tmdb" if isinstance(item, Movie) else "tvdb": item_id}
 
@@ -0,0 +1,34 @@
+import os, random, sys, timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.poster import recolor_image
+from PIL import Image
+
+def loop_recolor(image, color):
+    image = image.copy()
+    r, g, b = color[:3]
+    pixels = image.load()
+    for x in range(image.width):
+        for y in range(image.height):
+            if pixels[x, y][3] > 0:
+                pixels[x, y] = (r, g, b, pixels[x, y][3])
+    return image
+
+def sample_image(size):
+    rng = random.Random(0)
+    data = bytearray(rng.getrandbits(8) for _ in range(size * size * 4))
+    for i in range(3, len(data), 4):
+        data[i] = (0, 0, 128, 255)[data[i] % 4]
+    return Image.frombytes("RGBA", (size, size), bytes(data))
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    image = sample_image(size)
+    color = (255, 64, 0, 255)
+    assert loop_recolor(image, color).tobytes() == recolor_image(image, color).tobytes()
+    loop_time = min(timeit.repeat(lambda: loop_recolor(image, color), number=1, repeat=3))
+    fast_time = min(timeit.repeat(lambda: recolor_image(image, color), number=1, repeat=10))
+    print(f"{size}x{size} RGBA")
+    print(f"per-pixel loop: {loop_time * 1000:.1f} ms")
+    print(f"recolor_image:  {fast_time * 1000:.1f} ms ({loop_time / fast_time:.0f}x)")
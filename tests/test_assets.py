@@ -0,0 +1,70 @@
+import os
+import pytest
+from modules import util
+from modules.assets import AssetIndex
+
+
+def touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write("x")
+
+
+def glob_folder(asset_directory, folder_name, depth):
+    if os.path.isdir(os.path.join(asset_directory, folder_name)):
+        return os.path.join(asset_directory, folder_name)
+    for n in range(1, depth + 1):
+        matches = util.glob_filter(os.path.join(asset_directory, *(["*"] * n), folder_name))
+        if matches:
+            return os.path.abspath(matches[0])
+
+
+@pytest.fixture
+def assets(tmp_path):
+    root = str(tmp_path)
+    for folder in ["Top Movie (2020)", "A/Nested Movie (2019)", "A/B/Deep Movie [2018]", "A/B/C/Too Deep (2017)", ".hidden/Hidden Movie (2016)"]:
+        os.makedirs(os.path.join(root, folder))
+    for file in ["Top Movie (2020)/poster.jpg", "Top Movie (2020)/background.png", "Top Movie (2020)/S01E01.tar.gz",
+                 "Top Movie (2020)/logo", "Flat Movie [2015].png", "Flat Movie [2015]_background.jpg", ".poster.jpg"]:
+        touch(os.path.join(root, file))
+    return root
+
+
+@pytest.mark.parametrize("folder_name", ["Top Movie (2020)", "Nested Movie (2019)", "Deep Movie [2018]", "Too Deep (2017)", "Hidden Movie (2016)", "Missing"])
+@pytest.mark.parametrize("depth", [0, 1, 2])
+def test_find_folder_matches_glob(assets, folder_name, depth):
+    assert AssetIndex().find_folder(assets, folder_name, depth) == glob_folder(assets, folder_name, depth)
+
+
+@pytest.mark.parametrize("directory, file_name", [
+    ("Top Movie (2020)", "poster"), ("Top Movie (2020)", "background"), ("Top Movie (2020)", "logo"),
+    ("Top Movie (2020)", "S01E01"), ("Top Movie (2020)", "S01E01.tar"), ("", "Flat Movie [2015]"),
+    ("", "Flat Movie [2015]_background"), ("", "poster"), ("", "Missing"),
+])
+def test_find_file_matches_glob(assets, directory, file_name):
+    directory = os.path.join(assets, directory) if directory else assets
+    matches = util.glob_filter(os.path.join(directory, f"{file_name}.*"))
+    found = AssetIndex().find_file(directory, file_name)
+    if matches:
+        assert found in matches
+    else:
+        assert found is None
+
+
+def test_files_matches_glob(assets):
+    directory = os.path.join(assets, "Top Movie (2020)")
+    assert sorted(AssetIndex().files(directory)) == sorted(util.glob_filter(os.path.join(directory, "*.*")))
+
+
+def test_index_refreshes_on_change(assets):
+    index = AssetIndex()
+    directory = os.path.join(assets, "Top Movie (2020)")
+    assert index.find_file(directory, "poster")
+    os.rename(os.path.join(directory, "poster.jpg"), os.path.join(directory, "cover.jpg"))
+    index.invalidate(directory)
+    assert index.find_file(directory, "poster") is None
+    assert index.find_file(directory, "cover") == os.path.join(directory, "cover.jpg")
+    assert index.find_folder(assets, "New Movie (2021)", 1) is None
+    os.makedirs(os.path.join(assets, "A", "New Movie (2021)"))
+    os.utime(assets, ns=(0, os.stat(assets).st_mtime_ns + 1000))
+    assert index.find_folder(assets, "New Movie (2021)", 1) == os.path.join(assets, "A", "New Movie (2021)")
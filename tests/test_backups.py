@@ -0,0 +1,88 @@
+import json, os
+from types import SimpleNamespace
+import pytest
+from PIL import Image
+from modules.backups import BackupStore
+
+
+def make_store(directory, filetype="original"):
+    library = SimpleNamespace(config=SimpleNamespace(Cache=None), overlay_backup=directory, image_table_name="test",
+                              overlay_backup_filetype=filetype, overlay_artwork_quality=None)
+    return BackupStore(library)
+
+
+def write_image(path, color):
+    Image.new("RGB", (20, 30), color).save(path, format="PNG")
+    return path
+
+
+def blob_files(store):
+    return sorted(os.path.join(root, f) for root, _, files in os.walk(store.blobs) for f in files)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return make_store(str(tmp_path))
+
+
+def test_identical_backups_share_one_blob(store, tmp_path):
+    first = store.add(1, write_image(str(tmp_path / "temp-1.png"), "red"))
+    second = store.add(2, write_image(str(tmp_path / "temp-2.png"), "red"))
+    third = store.add(3, write_image(str(tmp_path / "temp-3.png"), "blue"))
+    assert first == second != third
+    assert blob_files(store) == sorted([first, third])
+    assert not os.path.exists(tmp_path / "temp-1.png")
+    assert not os.path.exists(tmp_path / "temp-2.png")
+    assert store.get(1) == store.get("2") == first
+
+
+def test_index_persists_without_cache(store, tmp_path):
+    path = store.add(7, write_image(str(tmp_path / "temp-7.png"), "green"))
+    store.flush()
+    assert make_store(str(tmp_path)).get(7) == path
+
+
+def test_missing_blob_drops_entry(store, tmp_path):
+    path = store.add(4, write_image(str(tmp_path / "temp-4.png"), "red"))
+    os.remove(path)
+    assert store.get(4) is None
+    assert "4" not in store.load()
+
+
+def test_clean_keeps_referenced_blobs(store, tmp_path):
+    shared = store.add(1, write_image(str(tmp_path / "temp-1.png"), "red"))
+    store.add(2, write_image(str(tmp_path / "temp-2.png"), "red"))
+    single = store.add(3, write_image(str(tmp_path / "temp-3.png"), "blue"))
+    store.remove(1)
+    store.remove(3)
+    single_size = os.path.getsize(single)
+    assert store.clean() == (1, single_size)
+    assert blob_files(store) == [shared]
+    store.remove(2)
+    assert store.clean()[0] == 1
+    assert blob_files(store) == []
+    assert os.listdir(store.blobs) == []
+
+
+def test_webp_backups(tmp_path):
+    store = make_store(str(tmp_path), filetype="webp_lossless")
+    path = store.add(5, write_image(str(tmp_path / "temp-5.png"), "red"))
+    assert path.endswith(".webp")
+    with Image.open(path) as image:
+        assert image.format == "WEBP"
+        assert image.getpixel((0, 0))[:3] == (255, 0, 0)
+
+
+def test_index_flushes_in_batches(store, tmp_path, monkeypatch):
+    monkeypatch.setattr("modules.backups.flush_every", 3)
+    index_path = tmp_path / "index.json"
+    store.add(1, write_image(str(tmp_path / "temp-1.png"), "red"))
+    store.add(2, write_image(str(tmp_path / "temp-2.png"), "blue"))
+    assert not index_path.exists()
+    store.add(3, write_image(str(tmp_path / "temp-3.png"), "green"))
+    assert set(json.loads(index_path.read_text())) == {"1", "2", "3"}
+    store.remove(1)
+    assert "1" in json.loads(index_path.read_text())
+    store.flush()
+    assert set(json.loads(index_path.read_text())) == {"2", "3"}
+    assert not os.path.exists(f"{index_path}.tmp")
@@ -0,0 +1,63 @@
+import threading
+from collections import OrderedDict
+from types import SimpleNamespace
+from modules.plex import Plex
+
+
+class FakeSection:
+    def __init__(self, key, calls):
+        self.key = key
+        self.calls = calls
+        self.pending = None
+
+    def batchMultiEdits(self, items):
+        self.pending = [i.ratingKey for i in items]
+
+    def editTags(self, tag, items, remove=False):
+        self.calls.append((self.key, tuple(self.pending), tag, tuple(items), remove))
+
+    def saveMultiEdits(self):
+        self.pending = None
+
+
+def make_plex(batch_size=None):
+    calls = []
+    sections = {1: FakeSection(1, calls), 2: FakeSection(2, calls)}
+    plex = object.__new__(Plex)
+    plex.Plex = sections[1]
+    plex.PlexServer = SimpleNamespace(library=SimpleNamespace(sectionByID=lambda key: sections[key]))
+    plex.plex_bulk_edit_batch_size = batch_size
+    plex.edited_keys = set()
+    plex._full_items = OrderedDict()
+    plex._full_items_lock = threading.RLock()
+    return plex, calls
+
+
+def item(rating_key, section_id=1, item_type="movie"):
+    return SimpleNamespace(ratingKey=rating_key, librarySectionID=section_id, type=item_type)
+
+
+def test_batch_edit_groups_by_section_and_type():
+    plex, calls = make_plex()
+    items = [item(1), item(2, section_id=2), item(3), item(4, item_type="episode"), item(5, section_id=None)]
+    plex.batch_edit(items, "editTags", "label", ["A"], remove=True)
+    assert calls == [
+        (1, (1, 3), "label", ("A",), True),
+        (2, (2,), "label", ("A",), True),
+        (1, (4,), "label", ("A",), True),
+        (1, (5,), "label", ("A",), True),
+    ]
+    assert plex.edited_keys == {1, 2, 3, 4, 5}
+
+
+def test_batch_edit_respects_batch_size():
+    plex, calls = make_plex(batch_size=2)
+    plex.batch_edit([item(k) for k in range(1, 6)], "editTags", "genre", ["Drama"])
+    assert [c[1] for c in calls] == [(1, 2), (3, 4), (5,)]
+
+
+def test_batch_edit_evicts_edited_items():
+    plex, _ = make_plex()
+    plex._full_items.update({1: "one", 2: "two", 3: "three"})
+    plex.batch_edit([item(1), item(3)], "editTags", "label", ["A"])
+    assert list(plex._full_items) == [2]
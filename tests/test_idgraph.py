@@ -0,0 +1,53 @@
+from modules.idgraph import IDGraph
+
+
+def test_add_is_bidirectional():
+    graph = IDGraph()
+    graph.add("imdb", "tt0111161", "tmdb", 278)
+    assert graph.get("imdb", "tt0111161", "tmdb") == [278]
+    assert graph.get("tmdb", 278, "imdb") == ["tt0111161"]
+    assert len(graph) == 2
+
+
+def test_digit_strings_match_integers():
+    graph = IDGraph()
+    graph.add("tvdb", "81189", "tmdb_show", "1396")
+    assert graph.first("tvdb", 81189, "tmdb_show") == 1396
+    assert graph.has("tmdb_show", "1396")
+
+
+def test_one_way_types_are_not_reversed():
+    graph = IDGraph()
+    graph.add("plex_guid", "plex://movie/5d776", "guid_type", "movie", edge="guid")
+    assert graph.first("plex_guid", "plex://movie/5d776", "guid_type") == "movie"
+    assert graph.get("guid_type", "movie", "plex_guid") == []
+    assert not graph.has("guid_type", "movie")
+
+
+def test_edge_filter():
+    graph = IDGraph()
+    graph.add("tvdb", 1, "tmdb_show", 10, edge="convert")
+    graph.add("tvdb", 1, "tmdb_show", 11, edge="anime")
+    assert sorted(graph.get("tvdb", 1, "tmdb_show")) == [10, 11]
+    assert graph.get("tvdb", 1, "tmdb_show", edge="anime") == [11]
+    assert graph.get("tvdb", 1, "tmdb_show", edge="guid") == []
+
+
+def test_duplicate_edges_keep_first_type():
+    graph = IDGraph()
+    graph.add("imdb", "tt1", "tmdb", 1, edge="guid")
+    graph.add("imdb", "tt1", "tmdb", 1, edge="convert")
+    assert graph.get("imdb", "tt1", "tmdb") == [1]
+    assert graph.get("imdb", "tt1", "tmdb", edge="guid") == [1]
+
+
+def test_find_multiple_types_and_missing():
+    graph = IDGraph()
+    graph.add("tmdb", 278, "imdb", "tt0111161")
+    graph.add("tmdb", 278, "tvdb", 190)
+    assert set(graph.find("tmdb", 278, ["imdb", "tvdb", "unknown"])) == {(190, "tvdb"), ("tt0111161", "imdb")}
+    assert graph.find("tmdb", 999, ["imdb"]) == []
+    assert graph.first("tmdb", 278, "anidb") is None
+    assert not graph.has("tmdb", 999)
+    assert graph.add("tmdb", None, "imdb", "tt2") is None
+    assert len(graph) == 3
@@ -0,0 +1,98 @@
+from datetime import datetime
+from types import SimpleNamespace
+import pytest
+from modules import plex  # noqa
+from modules.library import ItemRecord, Library
+
+
+class FakeLibrary(Library):
+    pass
+
+
+FakeLibrary.__abstractmethods__ = frozenset()
+
+
+def make_item(rating_key, updated_at, labels=()):
+    return SimpleNamespace(_autoReload=True, ratingKey=rating_key, key=f"/library/metadata/{rating_key}", guid=f"plex://movie/{rating_key}",
+                           guids=[], title=f"Movie {rating_key}", titleSort=None, year=2000, type="movie", librarySectionID=1, locations=[],
+                           labels=[SimpleNamespace(tag=t) for t in labels], thumb=None,
+                           updatedAt=datetime.fromtimestamp(updated_at), addedAt=datetime.fromtimestamp(100))
+
+
+def make_library(settings=None, overlays=None):
+    saved = {}
+    cache = SimpleNamespace(
+        update_item_fingerprints=lambda table, fingerprints, replace=False: saved.update(fingerprints=fingerprints, replace=replace),
+        update_library_watermark=lambda name, updated_at, added_at, config_hash: saved.update(watermark=(updated_at, added_at), hash=config_hash),
+    )
+    library = object.__new__(FakeLibrary)
+    library.config = SimpleNamespace(Cache=cache, data={"settings": settings or {}}, playlist_files=[])
+    library.incremental = True
+    library.incremental_hash = "library"
+    library.image_table_name = "image_map_1"
+    library.original_mapping_name = "Movies"
+    library.collection_files = []
+    library.metadata_files = []
+    library.images_files = []
+    library.overlay_files = [SimpleNamespace(get_file_name=lambda: "overlays", temp_vars={}, templates={}, overlays=overlays or {})]
+    library.cached_items = {k: ItemRecord(make_item(k, 1000)) for k in (1, 2, 3)}
+    library.edited_keys = set()
+
+    def reload_many(items, force=False):
+        for item in items:
+            library.cached_items[item.ratingKey].update(make_item(item.ratingKey, 2000, labels=["Overlay"]))
+    library.reload_many = reload_many
+    return library, saved
+
+
+def test_save_refreshes_edited_and_changed_items():
+    library, saved = make_library()
+    library.incremental_keys = {1}
+    library.mark_edited([SimpleNamespace(ratingKey=2), SimpleNamespace(ratingKey=99)])
+    library.save_incremental()
+    assert set(saved["fingerprints"]) == {1, 2}
+    assert saved["replace"] is False
+    assert saved["fingerprints"][2].endswith("|Overlay|2000")
+    assert saved["watermark"] == (2000, 100)
+
+
+def test_full_run_replaces_all_fingerprints():
+    library, saved = make_library()
+    library.incremental_keys = None
+    library.mark_edited(SimpleNamespace(ratingKey=3))
+    library.save_incremental()
+    assert set(saved["fingerprints"]) == {1, 2, 3}
+    assert saved["replace"] is True
+    assert saved["fingerprints"][1].endswith("|1000")
+    assert saved["fingerprints"][3].endswith("|Overlay|2000")
+
+
+def test_hash_ignores_key_order_and_tracks_content():
+    first, _ = make_library(settings={"a": 1, "b": 2}, overlays={"4K": {"plex_search": {}}, 10: {"name": "x"}})
+    second, _ = make_library(settings={"b": 2, "a": 1}, overlays={10: {"name": "x"}, "4K": {"plex_search": {}}})
+    changed, _ = make_library(settings={"a": 1, "b": 3}, overlays={"4K": {"plex_search": {}}, 10: {"name": "x"}})
+    assert first.get_incremental_hash() == second.get_incremental_hash()
+    assert first.get_incremental_hash() != changed.get_incremental_hash()
+
+
+@pytest.mark.parametrize("configured, skipped, ran, complete", [
+    (False, False, False, True),
+    (True, False, False, False),
+    (True, False, True, True),
+    (False, True, False, False),
+    (True, True, True, True),
+])
+def test_incremental_complete(configured, skipped, ran, complete):
+    library, _ = make_library()
+    library.library_operation = configured
+    library.operations_skipped = skipped
+    library.operations_ran = ran
+    library.overlay_files = []
+    library.remove_overlays = False
+    library.overlays_skipped = False
+    library.overlays_ran = False
+    assert library.incremental_complete() is complete
+    library.overlays_skipped = True
+    assert library.incremental_complete() is False
+    library.overlays_ran = True
+    assert library.incremental_complete() is complete
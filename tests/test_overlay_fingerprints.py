@@ -0,0 +1,78 @@
+from types import SimpleNamespace
+from modules.overlays import Overlays
+
+
+class FakeCache:
+    def __init__(self, fingerprints):
+        self.fingerprints = fingerprints
+
+    def query_item_fingerprints(self, table_name):
+        return dict(self.fingerprints)
+
+
+def make_overlays(fingerprints=None, reapply=False, reset=False, incremental_keys=None, asset_directory=None):
+    overlays = object.__new__(Overlays)
+    overlays.cache = FakeCache(fingerprints or {})
+    overlays.library = SimpleNamespace(image_table_name="lib", reapply_overlays=reapply, reset_overlays=reset,
+                                       incremental_keys=incremental_keys, asset_directory=asset_directory)
+    return overlays
+
+
+def make_overlay(name, compare=None, updated=False):
+    return SimpleNamespace(name=name, level="movie", updated=updated, get_overlay_compare=lambda: compare or name)
+
+
+def item(rating_key, title="Heat", thumb="/thumb/1", labels=()):
+    return SimpleNamespace(ratingKey=rating_key, title=title, thumb=thumb, labels=[SimpleNamespace(tag=la) for la in labels])
+
+
+PROPERTIES = {
+    "4K": make_overlay("4K"),
+    "title": make_overlay("text(<<title>>)"),
+    "bitrate": make_overlay("text(<<bitrate>>)"),
+    "imdb": make_overlay("text(<<imdb_rating>>)"),
+    "new": make_overlay("New", updated=True),
+}
+
+
+def test_fingerprint_tracks_inputs():
+    overlays = make_overlays()
+    base = overlays.overlay_fingerprint(item(1), ["4K", "title"], PROPERTIES)
+    assert base is not None
+    assert base == overlays.overlay_fingerprint(item(1), ["title", "4K"], PROPERTIES)
+    assert base != overlays.overlay_fingerprint(item(1, title="Ronin"), ["4K", "title"], PROPERTIES)
+    assert base != overlays.overlay_fingerprint(item(1, thumb="/thumb/2"), ["4K", "title"], PROPERTIES)
+    assert base != overlays.overlay_fingerprint(item(1, labels=["Overlay"]), ["4K", "title"], PROPERTIES)
+    assert base != overlays.overlay_fingerprint(item(1), ["4K"], PROPERTIES)
+
+
+def test_fingerprint_disabled_for_volatile_overlays():
+    overlays = make_overlays()
+    assert overlays.overlay_fingerprint(item(1, thumb=None), ["4K"], PROPERTIES) is None
+    assert overlays.overlay_fingerprint(item(1), ["4K", "bitrate"], PROPERTIES) is None
+    assert overlays.overlay_fingerprint(item(1), ["4K", "imdb"], PROPERTIES) is None
+    assert overlays.overlay_fingerprint(item(1), ["4K", "new"], PROPERTIES) is None
+
+
+def test_skip_unchanged_items():
+    overlays = make_overlays()
+    saved = {"1": overlays.overlay_fingerprint(item(1), ["4K"], PROPERTIES),
+             "2": overlays.overlay_fingerprint(item(2), ["4K"], PROPERTIES)}
+    overlays.cache = FakeCache(saved)
+    key_to_overlays = {1: (item(1), ["4K"]), 2: (item(2, thumb="/thumb/new"), ["4K"]), 3: (item(3), ["4K"])}
+    assert overlays.skip_unchanged(key_to_overlays, PROPERTIES) == [1]
+    assert list(key_to_overlays) == [2, 3]
+
+
+def test_skip_disabled_when_forced():
+    saved = {"1": make_overlays().overlay_fingerprint(item(1), ["4K"], PROPERTIES)}
+    for kwargs in [{"reapply": True}, {"reset": True}, {"asset_directory": ["assets"]}]:
+        overlays = make_overlays(saved, **kwargs)
+        key_to_overlays = {1: (item(1), ["4K"])}
+        assert overlays.skip_unchanged(key_to_overlays, PROPERTIES) == []
+        assert list(key_to_overlays) == [1]
+    overlays = make_overlays(saved, asset_directory=["assets"], incremental_keys={1})
+    assert overlays.skip_unchanged({1: (item(1), ["4K"])}, PROPERTIES) == [1]
+    overlays = make_overlays(saved)
+    overlays.cache = None
+    assert overlays.skip_unchanged({1: (item(1), ["4K"])}, PROPERTIES) == []
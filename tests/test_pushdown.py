@@ -0,0 +1,71 @@
+from datetime import datetime
+from types import SimpleNamespace
+from urllib.parse import parse_qs
+from xml.etree import ElementTree
+from plexapi.video import Movie
+from modules.plex import Plex
+
+GENRES = [("Action", "1"), ("Sci-Fi", "5"), ("Sci-Fi", "6"), ("Drama", "9")]
+
+
+def make_movie(rating_key, genres):
+    genres_xml = "".join(f'<Genre id="{key}" tag="{name}"/>' for name, key in genres)
+    movie = Movie(None, ElementTree.fromstring(
+        f'<Video ratingKey="{rating_key}" key="/library/metadata/{rating_key}" type="movie" title="Movie {rating_key}">{genres_xml}</Video>'
+    ))
+    movie._autoReload = False
+    return movie
+
+
+MOVIES = [
+    make_movie(1, [GENRES[0]]),
+    make_movie(2, [GENRES[1]]),
+    make_movie(3, [GENRES[2]]),
+    make_movie(4, [GENRES[3]]),
+    make_movie(5, [GENRES[0], GENRES[3]]),
+    make_movie(6, []),
+]
+
+
+def make_plex():
+    plex = object.__new__(Plex)
+    plex.Plex = SimpleNamespace(TYPE="movie")
+    plex.is_show = False
+    plex.queries = []
+    plex.get_search_choices = lambda attr, title=True, name_pairs=False: ({}, list(GENRES))
+    plex.reload = lambda item, force=False: item
+
+    def fetch_items(uri_args):
+        plex.queries.append(uri_args)
+        keys = set(parse_qs(uri_args[1:])["genre"][0].split(","))
+        return [m for m in MOVIES if any(str(g.id) in keys for g in m.genres)]
+    plex.fetchItems = fetch_items
+    return plex
+
+
+def matches(plex, filters, pushdown):
+    compiled = plex.compile_filters(filters, pushdown=pushdown)
+    return [m.ratingKey for m in MOVIES if plex.check_filters(m, compiled, datetime.now())]
+
+
+def test_pushdown_matches_in_memory_filter():
+    for names in [["Action"], ["Sci-Fi"], ["Action", "Drama"], ["Sci-Fi", "Drama"]]:
+        plex = make_plex()
+        filters = [("genre", names)]
+        assert matches(plex, filters, True) == matches(plex, filters, False)
+        assert len(plex.queries) == 1
+
+
+def test_pushdown_ors_duplicate_tag_names():
+    plex = make_plex()
+    assert matches(plex, [("genre", ["Sci-Fi"])], True) == [2, 3]
+    assert parse_qs(plex.queries[0][1:])["genre"] == ["5,6"]
+
+
+def test_pushdown_falls_back_for_unknown_names():
+    plex = make_plex()
+    compiled = plex.compile_filters([("genre", ["Action", "Western"])])
+    assert compiled[0].pushdown is True
+    assert [m.ratingKey for m in MOVIES if plex.check_filters(m, compiled, datetime.now())] == [1, 5]
+    assert compiled[0].pushdown is False
+    assert plex.queries == []
@@ -0,0 +1,86 @@
+import threading
+from collections import OrderedDict
+from xml.etree import ElementTree
+import pytest
+from plexapi.video import Movie
+from modules.plex import Plex
+from modules.library import ItemRecord
+
+
+def make_movie(rating_key, title="Movie", labels=(), updated_at=100):
+    labels_xml = "".join(f'<Label tag="{label}"/>' for label in labels)
+    return Movie(None, ElementTree.fromstring(
+        f'<Video ratingKey="{rating_key}" key="/library/metadata/{rating_key}" type="movie" title="{title}" year="2000" '
+        f'guid="plex://movie/{rating_key}" updatedAt="{updated_at}" addedAt="50" librarySectionID="1">'
+        f'<Media><Part file="/movies/{title}.mkv"/></Media><Guid id="imdb://tt{rating_key}"/>{labels_xml}</Video>'
+    ))
+
+
+class FakeLibrary:
+    def __init__(self):
+        self.reloaded = []
+
+    def reload(self, item, force=False):
+        self.reloaded.append(item.ratingKey)
+        return make_movie(item.ratingKey)
+
+
+def make_plex():
+    plex = object.__new__(Plex)
+    plex._full_items = OrderedDict()
+    plex._full_items_lock = threading.Lock()
+    plex.cached_items = {}
+    return plex
+
+
+def test_record_keeps_listing_fields():
+    movie = make_movie(5, title="Heat", labels=["Overlay", "Action"])
+    record = ItemRecord(movie)
+    assert (record.ratingKey, record.key, record.title, record.year, record.type) == (5, "/library/metadata/5", "Heat", 2000, "movie")
+    assert record.locations == ("/movies/Heat.mkv",)
+    assert [g.id for g in record.guids] == ["imdb://tt5"]
+    assert [la.tag for la in record.labels] == ["Overlay", "Action"]
+    assert movie._autoReload is True
+    assert not hasattr(record, "__dict__")
+
+
+def test_other_attributes_raise_without_loading():
+    library = FakeLibrary()
+    record = ItemRecord(make_movie(5), library)
+    with pytest.raises(AttributeError):
+        record.contentRating
+    with pytest.raises(AttributeError):
+        record.removeLabel("Overlay")
+    assert library.reloaded == []
+    assert isinstance(record.full(), Movie)
+    assert library.reloaded == [5]
+
+
+def test_records_compare_by_rating_key():
+    movie = make_movie(5)
+    record = ItemRecord(movie)
+    assert record == ItemRecord(make_movie(5, title="Other"))
+    assert record != ItemRecord(make_movie(6))
+    assert record == movie and movie == record
+    assert ItemRecord(make_movie(5)) in {record}
+    assert record in [movie]
+    assert record != 5
+
+
+def test_fingerprint_tracks_labels_and_updates():
+    record = ItemRecord(make_movie(5, labels=["B", "A"]))
+    assert record.fingerprint == ItemRecord(make_movie(5, labels=["A", "B"])).fingerprint
+    assert record.fingerprint != ItemRecord(make_movie(5, labels=["A"])).fingerprint
+    assert record.fingerprint != ItemRecord(make_movie(5, labels=["A", "B"], updated_at=200)).fingerprint
+
+
+def test_cache_full_item_updates_records_in_place():
+    plex = make_plex()
+    record = ItemRecord(make_movie(5), plex)
+    all_items = [record]
+    plex.cached_items[5] = record
+    plex._cache_full_item(make_movie(5, title="Renamed", labels=["Overlay"], updated_at=200))
+    assert plex.cached_items[5] is all_items[0] is record
+    assert record.title == "Renamed"
+    assert [la.tag for la in record.labels] == ["Overlay"]
+    assert plex._full_items[5].title == "Renamed"
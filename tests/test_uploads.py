@@ -0,0 +1,61 @@
+import io
+from plexapi.utils import openOrRead
+from modules.plex import Plex, MAX_IMAGE_SIZE
+from modules.poster import ImageData
+
+
+class FakeItem:
+    ratingKey = 1
+    title = "Heat"
+
+    def __init__(self):
+        self.uploads = []
+
+    def uploadPoster(self, url=None, filepath=None):
+        self.uploads.append(url if url else openOrRead(filepath))
+
+
+def make_plex():
+    plex = object.__new__(Plex)
+    plex.edited_keys = set()
+    plex.reload = lambda item, force=False: item
+    return plex
+
+
+def test_image_data_from_memory():
+    image = ImageData("overlay", "Heat", image_type="poster", is_url=False, data=b"poster")
+    assert image.size == 6
+    assert image.compare == 6
+    assert isinstance(image.source(), io.BytesIO)
+    assert image.source().read() == b"poster"
+    assert "Memory" in image.message
+    assert "data" not in str(image)
+
+
+def test_image_data_from_file(tmp_path):
+    path = tmp_path / "poster.jpg"
+    path.write_bytes(b"file poster")
+    image = ImageData("poster", str(path), is_url=False)
+    assert image.size == 11
+    assert image.source() == str(path)
+
+
+def test_upload_poster_bytes():
+    plex, item = make_plex(), FakeItem()
+    plex.upload_poster(item, b"rendered")
+    assert item.uploads == [b"rendered"]
+    assert plex.edited_keys == {1}
+
+
+def test_upload_image_from_memory():
+    plex, item = make_plex(), FakeItem()
+    assert plex._upload_image(item, ImageData("overlay", "Heat", is_url=False, data=b"rendered")) is True
+    assert item.uploads == [b"rendered"]
+
+
+def test_upload_image_from_memory_too_large():
+    plex, item = make_plex(), FakeItem()
+    image = ImageData("overlay", "Heat", is_url=False, data=b"x")
+    image.size = MAX_IMAGE_SIZE
+    assert plex._upload_image(item, image) is False
+    assert item.uploads == []
@@ -0,0 +1,47 @@
+import itertools, random
+from modules import util
+
+
+def is_increasing(values, indexes):
+    picked = [values[i] for i in sorted(indexes)]
+    return all(a < b for a, b in zip(picked, picked[1:]))
+
+
+def brute_force_length(values):
+    present = [i for i, v in enumerate(values) if v is not None]
+    for size in range(len(present), 0, -1):
+        for combo in itertools.combinations(present, size):
+            if is_increasing(values, combo):
+                return size
+    return 0
+
+
+def test_lis_empty():
+    assert util.longest_increasing_subsequence([]) == set()
+    assert util.longest_increasing_subsequence([None, None]) == set()
+
+
+def test_lis_already_sorted_keeps_everything():
+    assert util.longest_increasing_subsequence([0, 1, 2, 3]) == {0, 1, 2, 3}
+
+
+def test_lis_single_move():
+    # Moving the last item to the front only requires that one item to move
+    assert util.longest_increasing_subsequence([3, 0, 1, 2]) == {1, 2, 3}
+
+
+def test_lis_skips_new_items():
+    indexes = util.longest_increasing_subsequence([None, 0, None, 2, 1])
+    assert len(indexes) == 2
+    assert not {0, 2} & indexes
+
+
+def test_lis_matches_brute_force():
+    rng = random.Random(35)
+    for _ in range(200):
+        values = rng.sample(range(10), rng.randint(1, 8))
+        values = [None if rng.random() < 0.2 else v for v in values]
+        indexes = util.longest_increasing_subsequence(values)
+        assert all(values[i] is not None for i in indexes)
+        assert is_increasing(values, indexes)
+        assert len(indexes) == brute_force_length(values)